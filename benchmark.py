@@ -0,0 +1,189 @@
+"""Skalierungsbenchmark für die einzelnen Phasen des RoutingProblems
+
+Misst für wachsende Instanzen getrennt daten_generieren, modell_aus_daten_aufstellen, solve_model, das Dekodieren
+der Lösung, parameter_zum_zeitpunkt und json_ausgabe. Pro Phase werden die Laufzeit (Median über mehrere
+Wiederholungen) und der Spitzenspeicher (tracemalloc, in einem eigenen Durchlauf, da tracemalloc die Laufzeit
+verfälscht) erfasst, für das Modell zusätzlich die Anzahl der Variablen und Constraints.
+
+Der Spitzenspeicher umfasst nur Python-Objekte, nicht den Speicher von CPLEX selbst.
+
+Mit --solver ersatz wird statt CPLEX die Einfügeheuristik als Lösung in das Modell übernommen. So läuft der
+Benchmark auch ohne vollständige CPLEX-Installation, die Modellgrößen und alle übrigen Phasen bleiben vergleichbar.
+
+Beispiel::
+
+    python benchmark.py --solver ersatz --speichern basis.json
+    python benchmark.py --solver ersatz --vergleich basis.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+import heuristik
+import routingproblem
+
+# (Techniker, Aufträge, Skills) in aufsteigender Größe
+GROESSEN = [(2, 5, 2), (3, 10, 3), (5, 20, 3), (8, 40, 4), (10, 80, 5)]
+PHASEN = ["daten_generieren", "modell_aufstellen", "solve_model", "dekodieren", "parameter_zum_zeitpunkt",
+          "json_ausgabe"]
+
+ZEIT_TOLERANZ = 1.5  # Faktor, ab dem eine Laufzeit im Vergleich mit der Basis als Regression gilt
+ZEIT_RAUSCHEN = 0.005  # Kleinere Abweichungen in s gelten unabhängig vom Faktor als Messrauschen
+
+
+def ersatz_loesen(problem: routingproblem.RoutingProblem):
+    """Ersatz für solve_model ohne CPLEX: übernimmt den Plan der Einfügeheuristik als Lösung des Modells"""
+    routen = heuristik.konstruieren(problem)
+    problem.solution = problem.loesung_aus_routen(
+        {m: [m + problem.ANZ_AUFTRAEGE] + r + [m + problem.ANZ_AUFTRAEGE] for m, r in routen.items() if r})
+    problem.geloest = True
+    problem.fahrten_pro_techniker_sortiert, problem.startzeiten, problem.unerledigte_auftraege = \
+        problem.loesung_dekodieren(problem.solution)
+    problem.alle_auftraege_erledigt = len(problem.unerledigte_auftraege) == 0
+
+
+def durchlauf(groesse: tuple, seed: int, solver: str, timeout: int, speicher: bool = False,
+              formulierung: str = "dreiindex") -> dict:
+    """Führt alle Phasen einmal aus
+
+    :param groesse: tuple (Techniker, Aufträge, Skills)
+    :param seed: int
+    :param solver: str ("cplex" oder "ersatz")
+    :param timeout: int (Zeitlimit für CPLEX in s)
+    :param speicher: bool (misst statt der Laufzeit den Spitzenspeicher der während der Phase angelegten Objekte)
+    :param formulierung: str (siehe RoutingProblem.FORMULIERUNGEN)
+    :return: dict (Laufzeit in s bzw. Spitzenspeicher in Bytes pro Phase sowie Modellgrößen)
+    """
+    anz_techniker, anz_auftraege, anz_skills = groesse
+    problem = routingproblem.RoutingProblem()
+    messwerte = {}
+
+    def messen(phase, funktion, *args, **kwargs):
+        if speicher:
+            tracemalloc.start()
+            ergebnis = funktion(*args, **kwargs)
+            messwerte[phase] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            start = time.perf_counter()
+            ergebnis = funktion(*args, **kwargs)
+            messwerte[phase] = time.perf_counter() - start
+        return ergebnis
+
+    messen("daten_generieren", problem.daten_generieren, anz_techniker, anz_auftraege, anz_skills, 400, 500, seed)
+    messen("modell_aufstellen", problem.modell_aus_daten_aufstellen, formulierung=formulierung)
+    if solver == "ersatz":
+        messen("solve_model", ersatz_loesen, problem)
+    else:
+        messen("solve_model", problem.solve_model, timeout=timeout)
+    if problem.solution:
+        messen("dekodieren", problem.loesung_dekodieren, problem.solution)
+        messen("parameter_zum_zeitpunkt", problem.parameter_zum_zeitpunkt, problem.H // 2)
+    messen("json_ausgabe", problem.json_ausgabe)
+
+    return {
+        "messwerte": messwerte,
+        "variablen": problem.mdl.number_of_variables,
+        "constraints": problem.mdl.number_of_constraints,
+        "geloest": problem.geloest
+    }
+
+
+def messen(groessen, seed: int = 1, solver: str = "ersatz", timeout: int = 5, wiederholungen: int = 3,
+           formulierung: str = "dreiindex") -> list:
+    """Misst alle Größen
+
+    :return: list (pro Größe ein dict mit Laufzeiten, Spitzenspeicher und Modellgrößen)
+    """
+    # Aufwärmen, damit Importe und Caches nicht in die Messung der ersten Größe fallen
+    durchlauf(groessen[0], seed, solver, timeout, formulierung=formulierung)
+
+    ergebnisse = []
+    for groesse in groessen:
+        laeufe = [durchlauf(groesse, seed, solver, timeout, formulierung=formulierung) for _ in range(wiederholungen)]
+        speicher = durchlauf(groesse, seed, solver, timeout, speicher=True, formulierung=formulierung)
+        ergebnisse.append({
+            "groesse": list(groesse),
+            "zeit": {phase: statistics.median(lauf["messwerte"][phase] for lauf in laeufe)
+                     for phase in PHASEN if phase in laeufe[0]["messwerte"]},
+            "speicher": speicher["messwerte"],
+            "variablen": laeufe[0]["variablen"],
+            "constraints": laeufe[0]["constraints"],
+            "geloest": laeufe[0]["geloest"]
+        })
+    return ergebnisse
+
+
+def ausgeben(ergebnisse: list):
+    """Gibt die Messwerte als Tabelle aus, Zeiten in ms und Speicher in KiB"""
+    print("{:>12} {:>8} {:>8}  ".format("T/A/S", "Vars", "Cons") +
+          " ".join("{:>24}".format(phase) for phase in PHASEN))
+    for e in ergebnisse:
+        zellen = []
+        for phase in PHASEN:
+            if phase in e["zeit"]:
+                zellen.append("{:>24}".format("{:.1f} ms / {:.0f} KiB".format(1000 * e["zeit"][phase],
+                                                                             e["speicher"][phase] / 1024)))
+            else:
+                zellen.append("{:>24}".format("-"))
+        print("{:>12} {:>8} {:>8}  ".format("/".join(str(g) for g in e["groesse"]), e["variablen"],
+                                            e["constraints"]) + " ".join(zellen))
+
+
+def vergleichen(ergebnisse: list, basis: list) -> list:
+    """Vergleicht mit einer gespeicherten Basis
+
+    Als Regression gelten geänderte Modellgrößen und Laufzeiten über ZEIT_TOLERANZ mal der Basis (plus
+    ZEIT_RAUSCHEN).
+
+    :return: list (Beschreibungen der gefundenen Regressionen)
+    """
+    basis = {tuple(e["groesse"]): e for e in basis}
+    regressionen = []
+    for e in ergebnisse:
+        b = basis.get(tuple(e["groesse"]))
+        if b is None:
+            continue
+        name = "/".join(str(g) for g in e["groesse"])
+        for groesse in ("variablen", "constraints"):
+            if e[groesse] != b[groesse]:
+                regressionen.append("{}: {} {} statt {}".format(name, groesse, e[groesse], b[groesse]))
+        for phase, zeit in e["zeit"].items():
+            if phase in b["zeit"] and zeit > ZEIT_TOLERANZ * b["zeit"][phase] + ZEIT_RAUSCHEN:
+                regressionen.append("{}: {} {:.1f} ms statt {:.1f} ms".format(
+                    name, phase, 1000 * zeit, 1000 * b["zeit"][phase]))
+    return regressionen
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Skalierungsbenchmark für Aufbau, Lösung und Ausgabe")
+    parser.add_argument("--solver", default="ersatz", choices=["ersatz", "cplex"],
+                        help="ersatz übernimmt die Heuristik als Lösung, cplex löst mit --timeout")
+    parser.add_argument("--timeout", type=int, default=5, help="Zeitlimit für CPLEX in s")
+    parser.add_argument("--formulierung", default="dreiindex", choices=routingproblem.RoutingProblem.FORMULIERUNGEN)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--wiederholungen", type=int, default=3)
+    parser.add_argument("--groessen", default=None,
+                        help="JSON-Liste von [Techniker, Aufträge, Skills], Standard siehe GROESSEN")
+    parser.add_argument("--speichern", default=None, help="Ergebnisse als JSON-Basis speichern")
+    parser.add_argument("--vergleich", default=None, help="Mit einer gespeicherten JSON-Basis vergleichen")
+    argumente = parser.parse_args()
+
+    groessen = [tuple(g) for g in json.loads(argumente.groessen)] if argumente.groessen else GROESSEN
+    ergebnisse = messen(groessen, argumente.seed, argumente.solver, argumente.timeout, argumente.wiederholungen,
+                        argumente.formulierung)
+    ausgeben(ergebnisse)
+
+    if argumente.speichern:
+        with open(argumente.speichern, 'w', encoding='utf-8') as datei:
+            json.dump(ergebnisse, datei, indent=2)
+
+    if argumente.vergleich:
+        with open(argumente.vergleich, encoding='utf-8') as datei:
+            regressionen = vergleichen(ergebnisse, json.load(datei))
+        for regression in regressionen:
+            print("Regression - " + regression)
+        sys.exit(1 if regressionen else 0)
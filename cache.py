@@ -0,0 +1,88 @@
+"""Ergebniscache für deterministische Anfragen an websolve.py
+
+Mit gegebenem Seed liefert eine Anfrage bei gleichen Parametern immer dasselbe Problem. Das Ergebnis wird daher unter
+einem Schlüssel aus den normalisierten Parametern abgelegt. Der Cache verdrängt den am längsten nicht genutzten
+Eintrag (LRU), sobald die Größengrenze erreicht ist. Optional werden die Einträge als Dateien in einem Verzeichnis
+gespiegelt und beim Start wieder geladen, so dass sie einen Neustart des Webservers überstehen.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class ErgebnisCache:
+    """LRU-Cache für JSON-Ergebnisse mit optionaler Ablage auf der Festplatte"""
+
+    def __init__(self, max_eintraege: int = 128, verzeichnis: str = None):
+        """
+        :param max_eintraege: int (Größengrenze, darüber wird der älteste Eintrag verdrängt)
+        :param verzeichnis: str (optional, Verzeichnis für die Ablage auf der Festplatte)
+        """
+        self.max_eintraege = max_eintraege
+        self.verzeichnis = verzeichnis
+        self.eintraege = OrderedDict()
+        self.sperre = threading.Lock()
+
+        if verzeichnis:
+            os.makedirs(verzeichnis, exist_ok=True)
+            self.laden()
+
+    @staticmethod
+    def schluessel(*teile) -> str:
+        """Bildet einen Schlüssel aus beliebigen JSON-serialisierbaren Daten, unabhängig von der Reihenfolge in dicts
+
+        :return: str (SHA-256 der normalisierten Daten)
+        """
+        normalisiert = json.dumps(teile, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(normalisiert.encode('utf-8')).hexdigest()
+
+    def holen(self, schluessel: str):
+        """
+        :param schluessel: str (aus schluessel)
+        :return: str (abgelegtes Ergebnis) oder None
+        """
+        with self.sperre:
+            ergebnis = self.eintraege.get(schluessel)
+            if ergebnis is not None:
+                self.eintraege.move_to_end(schluessel)
+            return ergebnis
+
+    def ablegen(self, schluessel: str, ergebnis: str):
+        """
+        :param schluessel: str (aus schluessel)
+        :param ergebnis: str (JSON-Ergebnis)
+        """
+        with self.sperre:
+            self.eintraege[schluessel] = ergebnis
+            self.eintraege.move_to_end(schluessel)
+            if self.verzeichnis:
+                self.datei_schreiben(schluessel, ergebnis)
+
+            while len(self.eintraege) > self.max_eintraege:
+                verdraengt, _ = self.eintraege.popitem(last=False)
+                if self.verzeichnis:
+                    try:
+                        os.remove(self.dateiname(verdraengt))
+                    except OSError:
+                        pass
+
+    def dateiname(self, schluessel: str) -> str:
+        return os.path.join(self.verzeichnis, schluessel + ".json")
+
+    def datei_schreiben(self, schluessel: str, ergebnis: str):
+        """Schreibt atomar über eine temporäre Datei, damit parallel laufende Server keine halben Dateien lesen"""
+        temporaer = self.dateiname(schluessel) + ".tmp"
+        with open(temporaer, 'w', encoding='utf-8') as datei:
+            datei.write(ergebnis)
+        os.replace(temporaer, self.dateiname(schluessel))
+
+    def laden(self):
+        """Lädt die zuletzt geschriebenen Einträge aus dem Verzeichnis, höchstens max_eintraege"""
+        dateien = [os.path.join(self.verzeichnis, name) for name in os.listdir(self.verzeichnis)
+                   if name.endswith(".json")]
+        dateien.sort(key=os.path.getmtime)
+        for pfad in dateien[-self.max_eintraege:]:
+            with open(pfad, encoding='utf-8') as datei:
+                self.eintraege[os.path.basename(pfad)[:-len(".json")]] = datei.read()
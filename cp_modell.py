@@ -0,0 +1,190 @@
+"""Constraint-Programming-Formulierung mit Intervallvariablen (docplex.cp)
+
+Alternative zum MIP in routingproblem.py für Tage mit engen Zeitfenstern. Statt Startzeiten über Big-M-Bedingungen an
+die Fahrten zu koppeln, wird der Tag als Scheduling-Problem formuliert:
+
+* jeder Auftrag ist eine optionale Intervallvariable mit seinem Zeitfenster, fehlt sie, bleibt er unerledigt
+* pro Techniker, der den Auftrag übernehmen kann, gibt es eine optionale Zuteilung, genau eine davon ist vorhanden,
+  wenn der Auftrag erledigt wird (alternative)
+* die Zuteilungen eines Technikers bilden eine Sequenzvariable zwischen Abfahrt und Rückkehr im Depot, die
+  DISTANZMATRIX ist die Übergangszeit zwischen zwei Intervallen (no_overlap)
+
+Die Zielfunktion entspricht heuristik.Bewertung. Das Ergebnis wird wie bei den Heuristiken als Routen ohne Depots
+zurückgegeben und mit RoutingProblem.plan_uebernehmen in das Format von solve_model übersetzt. Benötigt eine lokale
+Installation von cpoptimizer (siehe readme).
+"""
+from typing import Dict, List
+
+import numpy as np
+from docplex.cp.model import CpoModel
+from docplex.cp.solution import CpoModelSolution
+from docplex.cp import modeler
+from docplex.cp.expression import transition_matrix
+
+import heuristik
+
+
+class CpModell:
+    """CP-Modell eines RoutingProblems, einschließlich der Fixierungen eines Replannings"""
+
+    def __init__(self, problem):
+        """
+        :param problem: RoutingProblem (mit Daten, ein MIP-Modell wird nicht benötigt)
+        """
+        self.problem = problem
+        self.mdl = None
+        self.auftrag = {}  # k -> Intervall des Auftrags
+        self.zuteilung = {}  # (k, m) -> Intervall des Auftrags beim Techniker m
+        self.abfahrt = {}  # m -> Intervall der Abfahrt im Depot
+        self.rueckkehr = {}  # m -> Intervall der Rückkehr ins Depot
+        self.sequenz = {}  # m -> Sequenzvariable der Route
+        self.details = {}
+
+    def aufstellen(self):
+        """Legt Variablen, Constraints und Zielfunktion an"""
+        p = self.problem
+        mdl = self.mdl = CpoModel(name="TDP_CP")
+        a = p.ANZ_AUFTRAEGE
+        dauer = p.AUFTRAGSDAUER.tolist()
+        fixiert = p.fixierte_startzeiten
+        bewertung = heuristik.Bewertung(p)
+
+        for k in range(a):
+            if k in fixiert:
+                # Bereits begonnene Aufträge liegen fest
+                start = (int(fixiert[k]), int(fixiert[k]))
+            else:
+                start = (max(int(p.FRUESTER_START[k]), 1), max(int(p.H_max) - dauer[k], 0))
+            self.auftrag[k] = mdl.interval_var(start=start, size=dauer[k], optional=k not in fixiert,
+                                               name="Auftrag_{}".format(k))
+
+        for m in range(p.ANZ_TECHNIKER):
+            depot = a + m
+            self.abfahrt[m] = mdl.interval_var(start=0, size=dauer[depot], name="Abfahrt_{}".format(m))
+            self.rueckkehr[m] = mdl.interval_var(end=(0, int(p.H_max)), size=0, name="Rueckkehr_{}".format(m))
+            for k in np.flatnonzero(p.KOMPATIBEL[m]).tolist():
+                self.zuteilung[(k, m)] = mdl.interval_var(size=dauer[k], optional=True,
+                                                          name="Zuteilung_{}_{}".format(k, m))
+
+        # Ein erledigter Auftrag wird von genau einem passenden Techniker übernommen
+        for k in range(a):
+            kandidaten = [self.zuteilung[(k, m)] for m in range(p.ANZ_TECHNIKER) if (k, m) in self.zuteilung]
+            if kandidaten:
+                mdl.add(modeler.alternative(self.auftrag[k], kandidaten))
+            else:
+                mdl.add(modeler.logical_not(modeler.presence_of(self.auftrag[k])))
+
+        # Routen als Sequenzen mit Fahrzeiten als Übergangszeiten, die Typen sind die Wegpunktindizes
+        fahrzeiten = transition_matrix(p.DISTANZMATRIX.tolist())
+        for m in range(p.ANZ_TECHNIKER):
+            depot = a + m
+            auftraege = [k for k in range(a) if (k, m) in self.zuteilung]
+            intervalle = [self.abfahrt[m]] + [self.zuteilung[(k, m)] for k in auftraege] + [self.rueckkehr[m]]
+            self.sequenz[m] = mdl.sequence_var(intervalle, types=[depot] + auftraege + [depot],
+                                               name="Route_{}".format(m))
+            mdl.add(modeler.no_overlap(self.sequenz[m], fahrzeiten, True))
+            mdl.add(modeler.first(self.sequenz[m], self.abfahrt[m]))
+            mdl.add(modeler.last(self.sequenz[m], self.rueckkehr[m]))
+            self.fixierung_hinzufuegen(m, auftraege)
+
+        # Zielfunktion wie heuristik.Bewertung
+        kosten = []
+        for k in range(a):
+            kosten.append(bewertung.gewicht_verspaetet * int(p.STRAFE_AUFTRAG[k]) *
+                          modeler.max(0, modeler.end_of(self.auftrag[k]) - int(p.SPAETESTES_ENDE[k])))
+            if k not in fixiert:
+                kosten.append(bewertung.strafe_unerledigt[k] * (1 - modeler.presence_of(self.auftrag[k])))
+        for m in range(p.ANZ_TECHNIKER):
+            kosten.append(bewertung.gewicht_techniker * int(p.STRAFE_TECHNIKER[m]) *
+                          modeler.max(0, modeler.end_of(self.rueckkehr[m]) - int(p.H)))
+            kosten.append(bewertung.gewicht_transport * self.fahrzeit(m))
+        mdl.add(modeler.minimize(modeler.sum(kosten)))
+
+    def fahrzeit(self, m: int):
+        """Ausdruck für die gesamte Fahrzeit des Technikers m
+
+        :param m: int (Techniker)
+        """
+        p = self.problem
+        depot = p.ANZ_AUFTRAEGE + m
+        zeilen = p.DISTANZMATRIX.tolist()
+        terme = [modeler.element(zeilen[depot], modeler.type_of_next(self.sequenz[m], self.abfahrt[m], depot, depot))]
+        for (k, techniker), intervall in self.zuteilung.items():
+            if techniker == m:
+                # Fehlt die Zuteilung, ist der Nachfolger der Auftrag selbst und die Fahrzeit 0
+                terme.append(modeler.element(zeilen[k], modeler.type_of_next(self.sequenz[m], intervall, depot, k)))
+        return modeler.sum(terme)
+
+    def fixierung_hinzufuegen(self, m: int, auftraege: List[int]):
+        """Hält die bereits gefahrene Route des Technikers m fest, neue Aufträge folgen erst danach
+
+        :param m: int (Techniker)
+        :param auftraege: List[int] (Aufträge, die m übernehmen kann)
+        """
+        route = self.problem.fixierte_routen.get(m, [])
+        if not route:
+            return
+        mdl = self.mdl
+        vorher = self.abfahrt[m]
+        for k in route:
+            mdl.add(modeler.presence_of(self.zuteilung[(k, m)]))
+            mdl.add(modeler.previous(self.sequenz[m], vorher, self.zuteilung[(k, m)]))
+            vorher = self.zuteilung[(k, m)]
+        for k in auftraege:
+            if k not in route:
+                mdl.add(modeler.before(self.sequenz[m], vorher, self.zuteilung[(k, m)]))
+
+    def startpunkt_setzen(self, routen: Dict[int, List[int]]):
+        """Übergibt Routen (z.B. aus der Einfügeheuristik) als Startlösung
+
+        :param routen: Dict[int, List[int]] (Aufträge pro Techniker in Fahrtreihenfolge, ohne Depots)
+        """
+        p = self.problem
+        start = CpoModelSolution()
+        for m, auftraege in routen.items():
+            depot = p.ANZ_AUFTRAEGE + m
+            startzeiten = p.route_terminieren([depot] + list(auftraege) + [depot], p.fixierte_startzeiten)[0]
+            for k in auftraege:
+                ende = startzeiten[k] + int(p.AUFTRAGSDAUER[k])
+                start.add_interval_var_solution(self.auftrag[k], presence=True, start=startzeiten[k], end=ende)
+                start.add_interval_var_solution(self.zuteilung[(k, m)], presence=True, start=startzeiten[k],
+                                                end=ende)
+        for (k, m), intervall in self.zuteilung.items():
+            if k not in routen.get(m, []):
+                start.add_interval_var_solution(intervall, presence=False)
+        self.mdl.set_starting_point(start)
+
+    def loesen(self, timeout: float) -> Dict[int, List[int]]:
+        """Löst das Modell und liest die Routen aus den Sequenzvariablen
+
+        :param timeout: float (Zeitbudget in s)
+        :return: Dict[int, List[int]] (Aufträge pro Techniker, None, wenn keine Lösung gefunden wurde)
+        """
+        loesung = self.mdl.solve(TimeLimit=timeout, LogVerbosity="Quiet")
+        self.details = {"status": loesung.get_solve_status(), "solverzeit": loesung.get_solve_time(),
+                        "variablen": len(self.zuteilung) + len(self.auftrag) + 2 * len(self.abfahrt),
+                        "zielfunktion": loesung.get_objective_values()[0] if loesung else None}
+        if not loesung:
+            return None
+
+        routen = {}
+        namen = {intervall.get_name(): k for (k, _), intervall in self.zuteilung.items()}
+        for m, sequenz in self.sequenz.items():
+            auftraege = [namen[intervall.get_name()] for intervall in loesung.get_var_solution(sequenz).get_value()
+                         if intervall.get_name() in namen]
+            if auftraege:
+                routen[m] = auftraege
+        return routen
+
+
+def loesen(problem, timeout: float) -> tuple:
+    """Stellt das CP-Modell auf, startet mit der Einfügeheuristik und löst
+
+    :param problem: RoutingProblem
+    :param timeout: float (Zeitbudget in s)
+    :return: tuple (Routen ohne Depots oder None, Kennzahlen des Lösungslaufs)
+    """
+    modell = CpModell(problem)
+    modell.aufstellen()
+    modell.startpunkt_setzen(heuristik.konstruieren(problem, heuristik.Bewertung(problem)))
+    return modell.loesen(timeout), modell.details
@@ -0,0 +1,215 @@
+"""Speichern und Laden von Instanzen und Lösungen, Import von Solomon-Instanzen
+
+Instanzen werden als .npz mit allen Datenarrays des RoutingProblems und den Metadaten als JSON abgelegt. Auch
+Instanzen nach einem Replanning (mit angefügten Aufträgen und fixierten Startzeiten) lassen sich so exakt
+wiederherstellen, ohne den Generator erneut laufen zu lassen.
+
+Lösungen werden als dünne Liste der angetretenen Fahrten (Techniker, von, nach) mit den Startzeiten der Aufträge
+gespeichert, die Dateigröße wächst also mit der Anzahl der Aufträge und nicht mit ANZ_TECHNIKER * ANZ_WEGPUNKTE².
+
+Beispiel::
+
+    python dateiformat.py solomon C101.txt --techniker 5 --kunden 25 --ausgabe c101_25.npz
+"""
+import argparse
+import json
+
+import numpy as np
+
+import routingproblem
+
+FORMAT_VERSION = 1
+ARRAYS = ["DISTANZMATRIX", "KOORDINATEN", "AUFTRAGSDAUER", "FRUESTER_START", "SPAETESTES_ENDE",
+          "AUFTRAG_BRAUCHT_SKILL", "TECHNIKER_HAT_SKILL", "STRAFE_AUFTRAG", "STRAFE_TECHNIKER"]
+METADATEN = ["H", "H_max", "SEED", "ANZ_TECHNIKER", "ANZ_AUFTRAEGE", "ANZ_WEGPUNKTE", "ANZ_SKILLS", "METRIK",
+             "GESCHWINDIGKEIT", "FAHRZEIT_AUFSCHLAG", "REPLANNED"]
+
+
+def metadaten_schreiben(werte: dict) -> np.ndarray:
+    """Metadaten als JSON-String, damit die Datei ohne Pickle gelesen werden kann"""
+    return np.array(json.dumps(dict(werte, format=FORMAT_VERSION), default=lambda wert: wert.item()))
+
+
+def metadaten_lesen(daten) -> dict:
+    """
+    :param daten: NpzFile
+    :return: dict
+    """
+    meta = json.loads(str(daten["meta"]))
+    if meta.get("format", 0) > FORMAT_VERSION:
+        raise ValueError("Dateiformat {} ist neuer als die unterstützte Version {}".format(meta["format"],
+                                                                                       FORMAT_VERSION))
+    return meta
+
+
+def instanz_speichern(problem: routingproblem.RoutingProblem, pfad: str, komprimiert: bool = False):
+    """Speichert alle Daten eines RoutingProblems, einschließlich der Fixierungen eines Replannings
+
+    :param problem: RoutingProblem
+    :param pfad: str (.npz-Datei)
+    :param komprimiert: bool (kleinere Datei, dafür langsameres Laden)
+    """
+    arrays = {name: np.asarray(getattr(problem, name)) for name in ARRAYS if getattr(problem, name) is not None}
+    meta = {name: getattr(problem, name) for name in METADATEN}
+    meta["SEED"] = int(meta["SEED"]) if meta["SEED"] is not None else None
+
+    # Fixierte Aufträge als (Techniker, Auftrag, Startzeit) in Reihenfolge der Routen
+    arrays["fixiert"] = np.array([(m, k, problem.fixierte_startzeiten[k])
+                                  for m, route in sorted(problem.fixierte_routen.items()) for k in route],
+                                 dtype=np.int32).reshape(-1, 3)
+
+    speichern = np.savez_compressed if komprimiert else np.savez
+    speichern(pfad, meta=metadaten_schreiben(meta), **arrays)
+
+
+def instanz_laden(pfad: str) -> routingproblem.RoutingProblem:
+    """Lädt ein mit instanz_speichern abgelegtes RoutingProblem, das Modell muss danach neu aufgestellt werden
+
+    :param pfad: str
+    :return: RoutingProblem
+    """
+    problem = routingproblem.RoutingProblem()
+    with np.load(pfad) as daten:
+        meta = metadaten_lesen(daten)
+        for name in METADATEN:
+            setattr(problem, name, meta[name])
+        for name in ARRAYS:
+            if name in daten.files:
+                setattr(problem, name, daten[name])
+        fixiert = daten["fixiert"]
+
+    problem.zufall = np.random.RandomState(problem.SEED)
+    problem.skill_index_aufbauen()
+    for m, k, start in fixiert.tolist():
+        problem.fixierte_startzeiten[k] = start
+        problem.fixierte_routen.setdefault(m, []).append(k)
+    return problem
+
+
+def loesung_speichern(problem: routingproblem.RoutingProblem, pfad: str):
+    """Speichert den aktuellen Plan als Liste der angetretenen Fahrten mit Startzeiten
+
+    :param problem: RoutingProblem (gelöst)
+    :param pfad: str (.npz-Datei)
+    """
+    if not problem.geloest:
+        raise ValueError("Das Problem ist nicht gelöst")
+    boegen = [(m, i, j) for m, route in sorted(problem.fahrten_pro_techniker_sortiert.items())
+              for i, j in zip(route[:-1], route[1:])]
+    startzeiten = [problem.startzeiten.get(k, 0) for k in range(problem.ANZ_AUFTRAEGE)]
+    meta = {"engine": problem.engine, "ANZ_TECHNIKER": problem.ANZ_TECHNIKER,
+            "ANZ_AUFTRAEGE": problem.ANZ_AUFTRAEGE}
+    np.savez(pfad, meta=metadaten_schreiben(meta), boegen=np.array(boegen, dtype=np.int32).reshape(-1, 3),
+             startzeiten=np.array(startzeiten, dtype=np.int32))
+
+
+def loesung_laden(problem: routingproblem.RoutingProblem, pfad: str):
+    """Übernimmt einen mit loesung_speichern abgelegten Plan in ein passendes Problem
+
+    Das Ergebnis steht wie nach solve_model in fahrten_pro_techniker_sortiert, startzeiten und
+    unerledigte_auftraege.
+
+    :param problem: RoutingProblem (dieselbe Instanz, z.B. aus instanz_laden)
+    :param pfad: str
+    """
+    with np.load(pfad) as daten:
+        meta = metadaten_lesen(daten)
+        boegen = daten["boegen"].tolist()
+        startzeiten = daten["startzeiten"].tolist()
+    if (meta["ANZ_TECHNIKER"], meta["ANZ_AUFTRAEGE"]) != (problem.ANZ_TECHNIKER, problem.ANZ_AUFTRAEGE):
+        raise ValueError("Die Lösung gehört zu einer Instanz mit {} Technikern und {} Aufträgen".format(
+            meta["ANZ_TECHNIKER"], meta["ANZ_AUFTRAEGE"]))
+
+    # Routen entlang der Fahrten ab dem Depot jedes Technikers zusammensetzen
+    nachfolger = {(m, i): j for m, i, j in boegen}
+    routen = {}
+    for m in sorted({m for m, _, _ in boegen}):
+        depot = m + problem.ANZ_AUFTRAEGE
+        route = [depot]
+        while len(route) == 1 or route[-1] != depot:
+            route.append(nachfolger[(m, route[-1])])
+        routen[m] = route
+
+    problem.solution = None
+    problem.engine = meta["engine"]
+    problem.fahrten_pro_techniker_sortiert = routen
+    problem.startzeiten = dict(enumerate(startzeiten))
+    problem.unerledigte_auftraege = [k for k, zeit in enumerate(startzeiten) if zeit < 1]
+    problem.alle_auftraege_erledigt = len(problem.unerledigte_auftraege) == 0
+    problem.geloest = True
+
+
+def solomon_lesen(pfad: str, anz_techniker: int = None, anz_kunden: int = None, strafe_auftrag: int = 100,
+                  strafe_techniker: int = 100) -> routingproblem.RoutingProblem:
+    """Importiert eine VRPTW-Instanz im Format von Solomon (z.B. C101, R201)
+
+    Kunde 0 ist das Depot aller Techniker, seine späteste Zeit bestimmt H und H_max. Ready Time wird zum
+    frühesten Start, Due Date (späteste Ankunft) plus Service Time zum spätesten Ende. Kapazitäten und Nachfragen
+    haben im Modell keine Entsprechung und werden ignoriert, Skills werden nicht benötigt. Fahrzeiten sind die
+    euklidischen Abstände, auf ganze Minuten gerundet.
+
+    :param pfad: str
+    :param anz_techniker: int (Standard ist die Fahrzeuganzahl der Datei)
+    :param anz_kunden: int (nur die ersten Kunden verwenden, z.B. 25 oder 50)
+    :param strafe_auftrag: int (Strafe pro Minute Verspätung, die Zeitfenster der Vorlage sind hart)
+    :param strafe_techniker: int (Strafe pro Minute Überstunden)
+    :return: RoutingProblem
+    """
+    fahrzeuge = None
+    kunden = []
+    with open(pfad, encoding='utf-8') as datei:
+        abschnitt = None
+        for zeile in datei:
+            teile = zeile.split()
+            if not teile:
+                continue
+            if teile[0] in ("VEHICLE", "CUSTOMER"):
+                abschnitt = teile[0]
+            elif all(t.replace('.', '', 1).isdigit() for t in teile):
+                if abschnitt == "VEHICLE" and len(teile) == 2:
+                    fahrzeuge = int(teile[0])
+                elif abschnitt == "CUSTOMER" and len(teile) == 7:
+                    kunden.append([float(t) for t in teile])
+    if not kunden:
+        raise ValueError("Keine Kunden in {} gefunden".format(pfad))
+
+    kunden = np.array(kunden)
+    depot, auftraege = kunden[0], kunden[1:anz_kunden + 1 if anz_kunden else None]
+    anz_techniker = anz_techniker or fahrzeuge or 1
+    anz_auftraege = len(auftraege)
+
+    problem = routingproblem.RoutingProblem()
+    problem.SEED = None
+    problem.ANZ_TECHNIKER = anz_techniker
+    problem.ANZ_AUFTRAEGE = anz_auftraege
+    problem.ANZ_WEGPUNKTE = anz_auftraege + anz_techniker
+    problem.ANZ_SKILLS = 1
+    problem.H = problem.H_max = int(depot[5])
+
+    problem.FRUESTER_START = auftraege[:, 4].astype(int)
+    problem.AUFTRAGSDAUER = np.concatenate((auftraege[:, 6], np.zeros(anz_techniker))).astype(int)
+    problem.SPAETESTES_ENDE = (auftraege[:, 5] + auftraege[:, 6]).astype(int)
+    problem.STRAFE_AUFTRAG = np.full(anz_auftraege, strafe_auftrag, dtype=int)
+    problem.STRAFE_TECHNIKER = np.full(anz_techniker, strafe_techniker, dtype=int)
+    problem.AUFTRAG_BRAUCHT_SKILL = np.zeros((anz_auftraege, 1), dtype=int)
+    problem.TECHNIKER_HAT_SKILL = np.ones((anz_techniker, 1), dtype=int)
+    problem.skill_index_aufbauen()
+
+    koordinaten = np.vstack((auftraege[:, 1:3], np.tile(depot[1:3], (anz_techniker, 1))))
+    problem.koordinaten_setzen(koordinaten)
+    return problem
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Instanzen importieren und als .npz speichern")
+    parser.add_argument("format", choices=["solomon"])
+    parser.add_argument("eingabe")
+    parser.add_argument("--techniker", type=int, default=None)
+    parser.add_argument("--kunden", type=int, default=None)
+    parser.add_argument("--ausgabe", required=True)
+    argumente = parser.parse_args()
+
+    instanz = solomon_lesen(argumente.eingabe, argumente.techniker, argumente.kunden)
+    instanz_speichern(instanz, argumente.ausgabe)
+    print("{} Aufträge und {} Techniker nach {} geschrieben".format(instanz.ANZ_AUFTRAEGE, instanz.ANZ_TECHNIKER,
+                                                                  argumente.ausgabe))
@@ -0,0 +1,93 @@
+"""Fahrzeiten aus Koordinaten
+
+Die Wegpunkte eines RoutingProblems tragen Koordinaten, aus denen die Fahrzeitmatrix vektorisiert berechnet wird:
+
+* euklidisch: ebene Koordinaten (x, y), die Entfernung wird durch die Geschwindigkeit geteilt
+* haversine: geografische Koordinaten (Breite, Länge) in Grad, Entfernung in km auf der Erdkugel
+
+Fahrzeiten werden auf ganze Minuten gerundet und als int32 abgelegt. Große Matrizen können in eine .npy-Datei
+geschrieben und als Memory-Map geöffnet werden, Worker-Prozesse greifen dann über das Betriebssystem auf dieselben
+Seiten zu, statt die Matrix zu kopieren (siehe matrix_laden und RoutingProblem.__getstate__).
+"""
+import numpy as np
+
+METRIKEN = ["euklidisch", "haversine"]
+ERDRADIUS = 6371.0  # km
+BLOCKZEILEN = 256  # Zeilen pro Block bei der Berechnung großer Matrizen, begrenzt den Zwischenspeicher
+DTYPE = np.int32
+
+
+def entfernungen(von: np.ndarray, nach: np.ndarray, metrik: str = "euklidisch") -> np.ndarray:
+    """Paarweise Entfernungen zwischen zwei Punktmengen
+
+    :param von: np.ndarray (n x 2)
+    :param nach: np.ndarray (m x 2)
+    :param metrik: str (siehe METRIKEN)
+    :return: np.ndarray (float64, n x m)
+    """
+    von = np.atleast_2d(np.asarray(von, dtype=float))
+    nach = np.atleast_2d(np.asarray(nach, dtype=float))
+    if metrik == "euklidisch":
+        return np.hypot(von[:, 0, np.newaxis] - nach[np.newaxis, :, 0], von[:, 1, np.newaxis] - nach[np.newaxis, :, 1])
+    if metrik == "haversine":
+        breite_von, laenge_von = np.radians(von[:, 0])[:, np.newaxis], np.radians(von[:, 1])[:, np.newaxis]
+        breite_nach, laenge_nach = np.radians(nach[:, 0])[np.newaxis, :], np.radians(nach[:, 1])[np.newaxis, :]
+        a = np.sin((breite_nach - breite_von) / 2) ** 2 + \
+            np.cos(breite_von) * np.cos(breite_nach) * np.sin((laenge_nach - laenge_von) / 2) ** 2
+        return 2 * ERDRADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    raise ValueError("Unbekannte Metrik '{}', erlaubt sind {}".format(metrik, METRIKEN))
+
+
+def fahrzeiten(von: np.ndarray, nach: np.ndarray, metrik: str = "euklidisch", geschwindigkeit: float = 1.0,
+               aufschlag: int = 0) -> np.ndarray:
+    """Fahrzeiten in ganzen Minuten zwischen zwei Punktmengen
+
+    :param von: np.ndarray (n x 2)
+    :param nach: np.ndarray (m x 2)
+    :param metrik: str (siehe METRIKEN)
+    :param geschwindigkeit: float (Strecke pro Minute in der Einheit der Metrik)
+    :param aufschlag: int (feste Zeit für jede Fahrt, z.B. Parken, nicht für Punkte mit Entfernung 0)
+    :return: np.ndarray (int32, n x m)
+    """
+    entfernung = entfernungen(von, nach, metrik)
+    zeit = np.rint(entfernung / geschwindigkeit) + np.where(entfernung > 0, aufschlag, 0)
+    return zeit.astype(DTYPE)
+
+
+def matrix_berechnen(koordinaten: np.ndarray, metrik: str = "euklidisch", geschwindigkeit: float = 1.0,
+                     aufschlag: int = 0, datei: str = None) -> np.ndarray:
+    """Berechnet die Fahrzeitmatrix aller Wegpunkte blockweise
+
+    :param koordinaten: np.ndarray (Anzahl Wegpunkte x 2)
+    :param metrik: str (siehe METRIKEN)
+    :param geschwindigkeit: float (Strecke pro Minute)
+    :param aufschlag: int (feste Zeit für jede Fahrt zwischen verschiedenen Orten)
+    :param datei: str (optional, die Matrix wird als .npy-Datei geschrieben und schreibgeschützt gemappt)
+    :return: np.ndarray (int32, bei datei eine np.memmap)
+    """
+    anz = len(koordinaten)
+    if datei:
+        matrix = np.lib.format.open_memmap(datei, mode='w+', dtype=DTYPE, shape=(anz, anz))
+    else:
+        matrix = np.empty((anz, anz), dtype=DTYPE)
+
+    for start in range(0, anz, BLOCKZEILEN):
+        ende = min(start + BLOCKZEILEN, anz)
+        matrix[start:ende] = fahrzeiten(koordinaten[start:ende], koordinaten, metrik, geschwindigkeit, aufschlag)
+    np.fill_diagonal(matrix, 0)
+
+    if datei:
+        matrix.flush()
+        del matrix
+        return matrix_laden(datei)
+    return matrix
+
+
+def matrix_laden(datei: str) -> np.ndarray:
+    """Öffnet eine mit matrix_berechnen geschriebene Matrix schreibgeschützt als Memory-Map
+
+    :param datei: str
+    :return: np.memmap
+    """
+    return np.load(datei, mmap_mode='r')
+
@@ -0,0 +1,490 @@
+"""Konstruktionsheuristik für das Technician Dispatch Problem
+
+Die Heuristik kommt ohne CPLEX aus und liefert in Millisekunden einen vollständigen Plan. Sie fügt die Aufträge nach
+dem Regret-Prinzip ein: Es wird immer der Auftrag eingeplant, der am meisten verliert, wenn er nicht an seiner besten
+Stelle landet. Bewertet wird mit Bewertung, die sich an den KPIs von modell_aus_daten_aufstellen orientiert, aber
+nicht dessen Zielfunktion ist: Die Strafkosten der Techniker sind die Minuten der Rückkehr nach H (das Modell bestraft
+Startzeit plus Dauer des letzten Auftrags bzw. die Fahrzeit über H), und die Transportkosten gehen mit ihrem Gewicht
+ein (im Modell nur als KPI). Zielfunktionswerte des MIP sind daher nicht mit diesen Kosten vergleichbar. Um Pläne
+verschiedener Lösungsverfahren zu vergleichen, werden alle mit Bewertung bewertet (siehe RoutingProblem.plan_kosten).
+
+Aufbauend auf einem konstruierten Plan verbessert ALNS den Plan innerhalb eines Zeitbudgets durch wiederholtes
+Zerstören und Neueinfügen sowie durch lokale Suche (Relocate, Swap zwischen Technikern, 2-opt).
+
+Routen werden hier ohne Depots als Liste von Aufträgen pro Techniker geführt.
+"""
+import math
+import random
+import time
+from typing import Dict, List
+
+UNZULAESSIG = float('inf')
+
+
+class Bewertung:
+    """Einheitliche Kostenbewertung von Routen für alle Lösungsverfahren (Abweichungen zum Modell siehe oben)"""
+
+    def __init__(self, problem):
+        """Übernimmt die Daten des Problems als Python-Listen, damit der Zugriff in den Schleifen schnell bleibt
+
+        :param problem: RoutingProblem
+        """
+        self.anz_auftraege = problem.ANZ_AUFTRAEGE
+        self.anz_techniker = problem.ANZ_TECHNIKER
+        self.distanz = problem.DISTANZMATRIX.tolist()
+        self.dauer = problem.AUFTRAGSDAUER.tolist()
+        self.fruester_start = problem.FRUESTER_START.tolist()
+        self.spaetestes_ende = problem.SPAETESTES_ENDE.tolist()
+        self.strafe_auftrag = problem.STRAFE_AUFTRAG.tolist()
+        self.strafe_techniker = problem.STRAFE_TECHNIKER.tolist()
+        self.kompatibel = problem.KOMPATIBEL.tolist()
+        self.h = problem.H
+        self.h_max = problem.H_max
+        self.fixiert = dict(problem.fixierte_startzeiten)
+
+        self.gewicht_verspaetet = problem.GEWICHT_STRAFE_AUFTRAG
+        self.gewicht_techniker = problem.GEWICHT_STRAFE_TECHNIKER
+        self.transport_kosten = problem.TRANSPORT_KOSTEN
+        self.gewicht_transport = problem.GEWICHT_TRANSPORT_KOSTEN * problem.TRANSPORT_KOSTEN
+
+        # Strafe für einen unerledigten Auftrag entspricht dem Modell bei Startzeit 0
+        self.strafe_unerledigt = [problem.GEWICHT_STRAFE_AUFTRAG_UNERFUELLT * 10000 * s for s in self.strafe_auftrag]
+
+    def verspaetung(self, k: int, start: int) -> float:
+        """Gewichtete Strafkosten für einen verspätet beendeten Auftrag"""
+        return self.gewicht_verspaetet * max(0, start + self.dauer[k] - self.spaetestes_ende[k]) * self.strafe_auftrag[k]
+
+    def ueberstunden(self, m: int, rueckkehr: int) -> float:
+        """Gewichtete Strafkosten für eine Rückkehr des Technikers nach H"""
+        return self.gewicht_techniker * max(0, rueckkehr - self.h) * self.strafe_techniker[m]
+
+    def terminieren(self, m: int, auftraege: List[int]):
+        """Berechnet Startzeiten und Kosten einer Route
+
+        :param m: int (Techniker)
+        :param auftraege: List[int] (Aufträge in Fahrtreihenfolge, ohne Depot)
+        :return: tuple (Startzeiten, Rückkehrzeit ins Depot, gewichtete Kosten oder UNZULAESSIG)
+        """
+        depot = self.anz_auftraege + m
+        startzeiten = []
+        vorher = depot
+        zeit = 0
+        kosten = 0.0
+        for k in auftraege:
+            ankunft = zeit + self.dauer[vorher] + self.distanz[vorher][k]
+            zeit = self.fixiert.get(k, max(ankunft, self.fruester_start[k], 1))
+            if zeit < ankunft or zeit + self.dauer[k] > self.h_max:
+                kosten = UNZULAESSIG
+            kosten += self.verspaetung(k, zeit) + self.gewicht_transport * self.distanz[vorher][k]
+            startzeiten.append(zeit)
+            vorher = k
+        rueckkehr = zeit + self.dauer[vorher] + self.distanz[vorher][depot]
+        if rueckkehr > self.h_max:
+            kosten = UNZULAESSIG
+        kosten += self.ueberstunden(m, rueckkehr) + self.gewicht_transport * self.distanz[vorher][depot]
+        return startzeiten, rueckkehr, kosten
+
+    def nachlauf_bewerten(self, m: int, auftraege: List[int], startzeiten: List[int], rueckkehr: int, q: int,
+                          vorher: int, zeit: int) -> float:
+        """Kostendifferenz der Aufträge ab Position q, wenn ihr Vorgänger vorher zur Zeit zeit beginnt
+
+        Die Verschiebung wird nur so weit durch die Route propagiert, bis sich eine Startzeit nicht mehr ändert.
+
+        :return: float (Kostendifferenz oder UNZULAESSIG)
+        """
+        depot = self.anz_auftraege + m
+        delta = 0.0
+        for q in range(q, len(auftraege)):
+            j = auftraege[q]
+            ankunft = zeit + self.dauer[vorher] + self.distanz[vorher][j]
+            if j in self.fixiert:
+                return delta if ankunft <= self.fixiert[j] else UNZULAESSIG
+            zeit = max(ankunft, self.fruester_start[j], 1)
+            if zeit == startzeiten[q]:
+                return delta
+            if zeit + self.dauer[j] > self.h_max:
+                return UNZULAESSIG
+            delta += self.verspaetung(j, zeit) - self.verspaetung(j, startzeiten[q])
+            vorher = j
+
+        neue_rueckkehr = zeit + self.dauer[vorher] + self.distanz[vorher][depot]
+        if neue_rueckkehr > self.h_max:
+            return UNZULAESSIG
+        return delta + self.ueberstunden(m, neue_rueckkehr) - self.ueberstunden(m, rueckkehr)
+
+    def einfuegen_bewerten(self, m: int, auftraege: List[int], startzeiten: List[int], rueckkehr: int, p: int,
+                           k: int) -> float:
+        """Kostendifferenz, wenn Auftrag k an Position p der Route eingefügt wird
+
+        :return: float (Kostendifferenz oder UNZULAESSIG)
+        """
+        depot = self.anz_auftraege + m
+        vorher = auftraege[p - 1] if p > 0 else depot
+        nachher = auftraege[p] if p < len(auftraege) else depot
+        zeit = startzeiten[p - 1] if p > 0 else 0
+
+        ankunft = zeit + self.dauer[vorher] + self.distanz[vorher][k]
+        zeit = max(ankunft, self.fruester_start[k], 1)
+        if zeit + self.dauer[k] > self.h_max:
+            return UNZULAESSIG
+        delta = self.verspaetung(k, zeit) + self.gewicht_transport * (
+            self.distanz[vorher][k] + self.distanz[k][nachher] - self.distanz[vorher][nachher])
+        return delta + self.nachlauf_bewerten(m, auftraege, startzeiten, rueckkehr, p, k, zeit)
+
+    def entfernen_bewerten(self, m: int, auftraege: List[int], startzeiten: List[int], rueckkehr: int,
+                           p: int) -> float:
+        """Kostendifferenz, wenn der Auftrag an Position p aus der Route entfernt wird
+
+        :return: float (Kostendifferenz, ohne die Strafe für den dann unerledigten Auftrag)
+        """
+        depot = self.anz_auftraege + m
+        k = auftraege[p]
+        vorher = auftraege[p - 1] if p > 0 else depot
+        nachher = auftraege[p + 1] if p + 1 < len(auftraege) else depot
+        zeit = startzeiten[p - 1] if p > 0 else 0
+
+        delta = -self.verspaetung(k, startzeiten[p]) + self.gewicht_transport * (
+            self.distanz[vorher][nachher] - self.distanz[vorher][k] - self.distanz[k][nachher])
+        return delta + self.nachlauf_bewerten(m, auftraege, startzeiten, rueckkehr, p + 1, vorher, zeit)
+
+    def gesamtkosten(self, routen: Dict[int, List[int]]) -> float:
+        """Gewichtete Kosten eines Plans einschließlich der Strafen für nicht eingeplante Aufträge
+
+        :param routen: Dict[int, List[int]] (Aufträge pro Techniker, ohne Depot)
+        :return: float
+        """
+        eingeplant = set()
+        kosten = 0.0
+        for m, auftraege in routen.items():
+            kosten += self.terminieren(m, auftraege)[2]
+            eingeplant.update(auftraege)
+        return kosten + sum(self.strafe_unerledigt[k] for k in range(self.anz_auftraege) if k not in eingeplant)
+
+    def kpis(self, routen: Dict[int, List[int]], unerledigt: List[int]) -> Dict[str, float]:
+        """Ungewichtete KPI-Werte eines Plans
+
+        :param routen: Dict[int, List[int]] (Aufträge pro Techniker, ohne Depot)
+        :param unerledigt: List[int] (nicht eingeplante Aufträge)
+        :return: Dict[str, float] (Werte mit den KPI-Namen des Modells)
+        """
+        verspaetet = techniker = transport = 0.0
+        for m, auftraege in routen.items():
+            if not auftraege:
+                continue
+            startzeiten, rueckkehr, _ = self.terminieren(m, auftraege)
+            depot = self.anz_auftraege + m
+            for vorher, k, zeit in zip([depot] + auftraege[:-1], auftraege, startzeiten):
+                verspaetet += max(0, zeit + self.dauer[k] - self.spaetestes_ende[k]) * self.strafe_auftrag[k]
+                transport += self.distanz[vorher][k]
+            transport += self.distanz[auftraege[-1]][depot]
+            techniker += max(0, rueckkehr - self.h) * self.strafe_techniker[m]
+        return {
+            "Strafkosten Auftrag verspätet": verspaetet,
+            "Strafkosten Auftrag unerfüllter": sum(10000 * self.strafe_auftrag[k] for k in unerledigt),
+            "Strafkosten Techniker": techniker,
+            "Transportkosten": transport * self.transport_kosten,
+        }
+
+
+def startrouten(problem) -> Dict[int, List[int]]:
+    """Routen aus den bereits ausgeführten Aufträgen (beim Replanning), sonst leere Routen
+
+    :param problem: RoutingProblem
+    :return: Dict[int, List[int]] (Aufträge pro Techniker, ohne Depot)
+    """
+    return {m: list(problem.fixierte_routen.get(m, [])) for m in range(problem.ANZ_TECHNIKER)}
+
+
+def konstruieren(problem, bewertung: Bewertung = None, routen: Dict[int, List[int]] = None,
+                 auftraege: List[int] = None) -> Dict[int, List[int]]:
+    """Regret-2-Einfügeheuristik unter Beachtung von Zeitfenstern, Skills, H und H_max
+
+    :param problem: RoutingProblem
+    :param bewertung: Bewertung (optional, wird sonst aus dem Problem erzeugt)
+    :param routen: Dict[int, List[int]] (optional, Teilrouten, die ergänzt werden; werden verändert)
+    :param auftraege: List[int] (optional, einzuplanende Aufträge; sonst alle noch nicht eingeplanten)
+    :return: Dict[int, List[int]] (Aufträge pro Techniker, ohne Depot)
+    """
+    bewertung = bewertung or Bewertung(problem)
+    routen = startrouten(problem) if routen is None else routen
+    if auftraege is None:
+        eingeplant = {k for r in routen.values() for k in r}
+        auftraege = [k for k in range(problem.ANZ_AUFTRAEGE) if k not in eingeplant]
+
+    # Nicht verschiebbare Anfänge der Routen (beim Replanning bereits ausgeführt)
+    fixe_laenge = {m: sum(1 for k in r if k in bewertung.fixiert) for m, r in routen.items()}
+    plan = {m: bewertung.terminieren(m, r) for m, r in routen.items()}
+
+    def beste_position(k, m):
+        auftraege_m = routen[m]
+        startzeiten, rueckkehr, _ = plan[m]
+        bestes = (UNZULAESSIG, None)
+        for p in range(fixe_laenge[m], len(auftraege_m) + 1):
+            delta = bewertung.einfuegen_bewerten(m, auftraege_m, startzeiten, rueckkehr, p, k)
+            if delta < bestes[0]:
+                bestes = (delta, p)
+        return bestes
+
+    offen = [k for k in auftraege if any(bewertung.kompatibel[m][k] for m in routen)]
+    optionen = {k: {m: beste_position(k, m) for m in routen if bewertung.kompatibel[m][k]} for k in offen}
+
+    while offen:
+        auswahl = None
+        for k in offen:
+            deltas = sorted(delta for delta, _ in optionen[k].values())
+            if deltas[0] == UNZULAESSIG:
+                continue
+            zweitbestes = deltas[1] if len(deltas) > 1 else UNZULAESSIG
+            regret = min(zweitbestes, bewertung.strafe_unerledigt[k]) - deltas[0]
+            if auswahl is None or (regret, -deltas[0]) > auswahl[0]:
+                auswahl = ((regret, -deltas[0]), k)
+        if auswahl is None:
+            break
+
+        k = auswahl[1]
+        m = min(optionen[k], key=lambda t: optionen[k][t][0])
+        routen[m].insert(optionen[k][m][1], k)
+        plan[m] = bewertung.terminieren(m, routen[m])
+        offen.remove(k)
+        del optionen[k]
+        for j in offen:
+            if m in optionen[j]:
+                optionen[j][m] = beste_position(j, m)
+
+    return routen
+
+
+class ALNS:
+    """Adaptive Large Neighbourhood Search über Plänen aus konstruieren
+
+    Pro Iteration wird mit einem nach Erfolg gewichteten Operator ein Teil der Aufträge entfernt und per
+    Regret-Einfügung wieder eingeplant. Verschlechterungen werden nach Simulated Annealing akzeptiert. Jede neue beste
+    Lösung wird zusätzlich durch lokale Suche verbessert. Alle Züge werden über Kostendifferenzen der betroffenen
+    Routen bewertet, nie über den gesamten Plan.
+    """
+    ZERSTOERER = ["zufaellig", "teuerste", "verwandte"]
+
+    PUNKTE_NEUE_BESTE = 33  # Bewertung eines Operators nach Ropke & Pisinger
+    PUNKTE_VERBESSERT = 9
+    PUNKTE_AKZEPTIERT = 13
+    REAKTION = 0.1  # Anteil, mit dem die Punkte einer Iteration in das Gewicht eingehen
+
+    STARTTEMPERATUR = 0.05  # Relativ zu den Kosten der Startlösung
+    MAX_ENTFERNEN = 30
+    MAX_OHNE_VERBESSERUNG = 2000  # Iterationen ohne neue beste Lösung, nach denen die Suche vorzeitig endet
+    NACHBARN = 10  # Kandidaten pro Auftrag beim Swap
+
+    def __init__(self, problem, bewertung: Bewertung = None, seed: int = None):
+        """
+        :param problem: RoutingProblem
+        :param bewertung: Bewertung (optional, wird sonst aus dem Problem erzeugt)
+        :param seed: int (Initialisierung für den Zufallsgenerator der Suche)
+        """
+        self.problem = problem
+        self.bewertung = bewertung or Bewertung(problem)
+        self.zufall = random.Random(seed)
+        self.gewichte = {name: 1.0 for name in self.ZERSTOERER}
+        self.ende = 0.0
+
+        # Nächste Aufträge pro Auftrag, für die verwandte Zerstörung und den Swap
+        b = self.bewertung
+        self.nachbarn = [sorted((j for j in range(b.anz_auftraege) if j != k),
+                                key=lambda j: b.distanz[k][j] + abs(b.fruester_start[k] - b.fruester_start[j]))
+                         for k in range(b.anz_auftraege)]
+
+    def verbessern(self, routen: Dict[int, List[int]], zeitlimit: float) -> Dict[int, List[int]]:
+        """Sucht innerhalb des Zeitlimits nach einem besseren Plan
+
+        Die Suche endet vorzeitig, wenn MAX_OHNE_VERBESSERUNG Iterationen lang keine bessere Lösung gefunden wurde.
+
+        :param routen: Dict[int, List[int]] (Startlösung, z.B. aus konstruieren; wird nicht verändert)
+        :param zeitlimit: float (Zeitbudget in s)
+        :return: Dict[int, List[int]] (bester gefundener Plan)
+        """
+        self.ende = time.perf_counter() + zeitlimit
+        b = self.bewertung
+
+        aktuell = self.lokale_suche(self.kopieren(routen))
+        aktuelle_kosten = b.gesamtkosten(aktuell)
+        beste, beste_kosten = self.kopieren(aktuell), aktuelle_kosten
+        temperatur = self.STARTTEMPERATUR * aktuelle_kosten + 1
+
+        start = time.perf_counter()
+        ohne_verbesserung = 0
+        while time.perf_counter() < self.ende and ohne_verbesserung < self.MAX_OHNE_VERBESSERUNG:
+            fortschritt = (time.perf_counter() - start) / max(zeitlimit, 1e-9)
+            name = self.zufall.choices(self.ZERSTOERER, weights=[self.gewichte[n] for n in self.ZERSTOERER])[0]
+
+            kandidat = self.kopieren(aktuell)
+            getattr(self, name)(kandidat, self.anzahl_entfernen(kandidat))
+            konstruieren(self.problem, b, kandidat)  # Plant die entfernten und alle unerledigten Aufträge neu ein
+            kosten = b.gesamtkosten(kandidat)
+
+            punkte = 0
+            ohne_verbesserung += 1
+            if kosten < beste_kosten - 1e-6:
+                ohne_verbesserung = 0
+                kandidat = self.lokale_suche(kandidat)
+                kosten = b.gesamtkosten(kandidat)
+                beste, beste_kosten = self.kopieren(kandidat), kosten
+                punkte = self.PUNKTE_NEUE_BESTE
+            elif kosten < aktuelle_kosten - 1e-6:
+                punkte = self.PUNKTE_VERBESSERT
+            elif self.zufall.random() < math.exp(-(kosten - aktuelle_kosten) / max(temperatur * (1 - fortschritt),
+                                                                                      1e-9)):
+                punkte = self.PUNKTE_AKZEPTIERT
+
+            if punkte:
+                aktuell, aktuelle_kosten = kandidat, kosten
+            self.gewichte[name] = (1 - self.REAKTION) * self.gewichte[name] + self.REAKTION * punkte
+            self.gewichte[name] = max(self.gewichte[name], 0.1)
+
+        return beste
+
+    @staticmethod
+    def kopieren(routen: Dict[int, List[int]]) -> Dict[int, List[int]]:
+        return {m: list(r) for m, r in routen.items()}
+
+    def unerledigt(self, routen: Dict[int, List[int]]) -> List[int]:
+        """Aufträge, die in keiner Route eingeplant sind"""
+        eingeplant = {k for r in routen.values() for k in r}
+        return [k for k in range(self.bewertung.anz_auftraege) if k not in eingeplant]
+
+    def beweglich(self, routen: Dict[int, List[int]]) -> List[int]:
+        """Eingeplante Aufträge, die noch verschoben werden dürfen (nicht durch ein Replanning fixiert)"""
+        return [k for r in routen.values() for k in r if k not in self.bewertung.fixiert]
+
+    def anzahl_entfernen(self, routen: Dict[int, List[int]]) -> int:
+        anzahl = len(self.beweglich(routen))
+        return self.zufall.randint(1, max(1, min(self.MAX_ENTFERNEN, anzahl * 3 // 10)))
+
+    def entfernen(self, routen: Dict[int, List[int]], auftraege: List[int]) -> List[int]:
+        """Nimmt die Aufträge aus ihren Routen heraus
+
+        :return: List[int] (die entfernten Aufträge)
+        """
+        auswahl = set(auftraege)
+        for m in routen:
+            routen[m] = [k for k in routen[m] if k not in auswahl]
+        return list(auftraege)
+
+    def zufaellig(self, routen: Dict[int, List[int]], anzahl: int) -> List[int]:
+        """Zerstörung: zufällig gewählte Aufträge"""
+        kandidaten = self.beweglich(routen)
+        return self.entfernen(routen, self.zufall.sample(kandidaten, min(anzahl, len(kandidaten))))
+
+    def teuerste(self, routen: Dict[int, List[int]], anzahl: int) -> List[int]:
+        """Zerstörung: Aufträge mit der größten Ersparnis beim Herausnehmen, leicht randomisiert"""
+        b = self.bewertung
+        ersparnis = []
+        for m, auftraege in routen.items():
+            startzeiten, rueckkehr, _ = b.terminieren(m, auftraege)
+            for p, k in enumerate(auftraege):
+                if k not in b.fixiert:
+                    ersparnis.append((b.entfernen_bewerten(m, auftraege, startzeiten, rueckkehr, p), k))
+        ersparnis.sort()
+        auswahl = []
+        while ersparnis and len(auswahl) < anzahl:
+            auswahl.append(ersparnis.pop(int(len(ersparnis) * self.zufall.random() ** 3))[1])
+        return self.entfernen(routen, auswahl)
+
+    def verwandte(self, routen: Dict[int, List[int]], anzahl: int) -> List[int]:
+        """Zerstörung: ein zufälliger Auftrag und seine räumlich und zeitlich nächsten Nachbarn"""
+        kandidaten = set(self.beweglich(routen))
+        if not kandidaten:
+            return []
+        zentrum = self.zufall.choice(sorted(kandidaten))
+        auswahl = [zentrum] + [k for k in self.nachbarn[zentrum] if k in kandidaten][:anzahl - 1]
+        return self.entfernen(routen, auswahl)
+
+    def lokale_suche(self, routen: Dict[int, List[int]], zeitlimit: float = None) -> Dict[int, List[int]]:
+        """Wendet Relocate, Swap und 2-opt an, bis keiner der Züge mehr verbessert oder die Zeit abläuft
+
+        :param routen: Dict[int, List[int]] (wird verändert)
+        :param zeitlimit: float (optional, eigenes Zeitbudget in s; sonst gilt das Ende aus verbessern)
+        :return: Dict[int, List[int]]
+        """
+        if zeitlimit is not None:
+            self.ende = time.perf_counter() + zeitlimit
+        plan = {m: self.bewertung.terminieren(m, r) for m, r in routen.items()}
+        verbessert = True
+        while verbessert and time.perf_counter() < self.ende:
+            verbessert = self.relocate(routen, plan) | self.swap(routen, plan) | self.zwei_opt(routen, plan)
+        return routen
+
+    def fixe_laenge(self, auftraege: List[int]) -> int:
+        return sum(1 for k in auftraege if k in self.bewertung.fixiert)
+
+    def relocate(self, routen: Dict[int, List[int]], plan: dict) -> bool:
+        """Verschiebt einzelne Aufträge zu einem anderen Techniker, wenn das die Kosten senkt"""
+        b = self.bewertung
+        verbessert = False
+        for m in list(routen):
+            p = self.fixe_laenge(routen[m])
+            while p < len(routen[m]) and time.perf_counter() < self.ende:
+                k = routen[m][p]
+                startzeiten, rueckkehr, _ = plan[m]
+                ersparnis = b.entfernen_bewerten(m, routen[m], startzeiten, rueckkehr, p)
+                bestes = (-1e-6, None, None)
+                for n in routen:
+                    if n == m or not b.kompatibel[n][k]:
+                        continue
+                    for q in range(self.fixe_laenge(routen[n]), len(routen[n]) + 1):
+                        delta = ersparnis + b.einfuegen_bewerten(n, routen[n], plan[n][0], plan[n][1], q, k)
+                        if delta < bestes[0]:
+                            bestes = (delta, n, q)
+                if bestes[1] is None:
+                    p += 1
+                    continue
+                _, n, q = bestes
+                del routen[m][p]
+                routen[n].insert(q, k)
+                plan[m] = b.terminieren(m, routen[m])
+                plan[n] = b.terminieren(n, routen[n])
+                verbessert = True
+        return verbessert
+
+    def swap(self, routen: Dict[int, List[int]], plan: dict) -> bool:
+        """Tauscht zwei Aufträge benachbarter Lage zwischen zwei Technikern"""
+        b = self.bewertung
+        verbessert = False
+        ort = {k: (m, p) for m, r in routen.items() for p, k in enumerate(r)}
+        for k in list(ort):
+            if time.perf_counter() > self.ende:
+                break
+            m, p = ort[k]
+            if k in b.fixiert:
+                continue
+            for j in self.nachbarn[k][:self.NACHBARN]:
+                if j not in ort or j in b.fixiert:
+                    continue
+                n, q = ort[j]
+                if n == m or not (b.kompatibel[n][k] and b.kompatibel[m][j]):
+                    continue
+                neu_m = routen[m][:p] + [j] + routen[m][p + 1:]
+                neu_n = routen[n][:q] + [k] + routen[n][q + 1:]
+                plan_m, plan_n = b.terminieren(m, neu_m), b.terminieren(n, neu_n)
+                if plan_m[2] + plan_n[2] < plan[m][2] + plan[n][2] - 1e-6:
+                    routen[m], routen[n], plan[m], plan[n] = neu_m, neu_n, plan_m, plan_n
+                    ort[k], ort[j] = (n, q), (m, p)
+                    verbessert = True
+                    break
+        return verbessert
+
+    def zwei_opt(self, routen: Dict[int, List[int]], plan: dict) -> bool:
+        """Dreht Teilstücke einer Route um, wenn das die Kosten senkt"""
+        b = self.bewertung
+        verbessert = False
+        for m, auftraege in routen.items():
+            erste = self.fixe_laenge(auftraege)
+            for i in range(erste, len(auftraege) - 1):
+                for j in range(i + 1, len(auftraege)):
+                    if time.perf_counter() > self.ende:
+                        return verbessert
+                    neu = auftraege[:i] + auftraege[i:j + 1][::-1] + auftraege[j + 1:]
+                    neuer_plan = b.terminieren(m, neu)
+                    if neuer_plan[2] < plan[m][2] - 1e-6:
+                        auftraege[:] = neu
+                        plan[m] = neuer_plan
+                        verbessert = True
+        return verbessert
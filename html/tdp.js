@@ -1,6 +1,7 @@
 'use strict';
 
-var xhttp = new XMLHttpRequest();
+var quelle = null;
+var zwischenstand = null;
 
 function processInput() {
     var progress_indicator = document.querySelector('#progress_indicator');
@@ -47,39 +48,51 @@ function processInput() {
 
     var advancedSwitch = document.querySelector("#switch-advanced").checked;
 
-    xhttp.onreadystatechange = function () {
-        if (this.readyState === 4 && this.status === 200) {
-            enableFields();
-            var response = JSON.parse(this.responseText);
-            if (response.solved === true) {
-                appendSolution(response);
-                var clear_button = document.querySelector('#btnClear');
-                clear_button.disabled = false;
-                showToast("Lösung gefunden.");
-            } else {
-                showToast("Es konnte keine Lösung gefunden werden.");
-            }
-
-        } else {
-            if (this.status === 500) {
-                showToast("Ein Fehler bei der Verarbeitung der Daten ist aufgetreten.");
-                cancel();
-            }
-        }
-    };
-
-    xhttp.open("GET",
-        "http://localhost:5000/solve?techniker=" + techniker + "&auftraege=" + auftraege +
+    zwischenstand = null;
+    quelle = new EventSource(
+        "http://localhost:5000/solve/stream?techniker=" + techniker + "&auftraege=" + auftraege +
         "&skills=" + skills + "&tageslaenge=" + tageslaenge + "&maxTageslaenge=" + maxTageslaenge +
         "&seed=" + seed + "&minDistanz=" + minDistanz + "&maxDistanz=" + maxDistanz + "&minStart=" + minStart +
         "&maxStart=" + maxStart + "&maxDauer=" + maxDauer + "&eDauer=" + eDauer + "&maxEnde=" + maxEnde +
         "&eEnde=" + eEnde + "&maxStrafeAuftrag=" + maxStrafeAuftrag + "&eStrafeAuftrag=" + eStrafeAuftrag +
         "&maxStrafeTechniker=" + maxStrafeTechniker + "&eStrafeTechniker=" + eStrafeTechniker + "&advanced=" + advancedSwitch +
         "&replanning=" + replanning + "&reZeitpunkt=" + reZeitpunkt + "&reFruesterStart=" + reFruesterStart + "&reSpaetestesEnde=" + reSpaetestesEnde +
-        "&reDauer=" + reDauer + "&reStrafe=" + reStrafe + "&reSkills=" + encodeURIComponent(reSkills),
-        true);
-    xhttp.send();
-
+        "&reDauer=" + reDauer + "&reStrafe=" + reStrafe + "&reSkills=" + encodeURIComponent(reSkills) +
+        "&felder=distanzmatrix,skills");
+
+    /* Jede verbesserte Zwischenlösung wird angezeigt und kann mit "Stoppen" übernommen werden */
+    quelle.addEventListener("zwischenstand", function (event) {
+        zwischenstand = JSON.parse(event.data);
+        document.querySelector('#zwischenstand').textContent = "Beste Zwischenlösung: Zielfunktion " +
+            zwischenstand.zielfunktion.toFixed(0) + ", Gap " + (100 * zwischenstand.gap).toFixed(1) + " %";
+        document.querySelector('#btnStop').disabled = false;
+    });
+
+    quelle.addEventListener("ergebnis", function (event) {
+        quelle.close();
+        enableFields();
+        var response = JSON.parse(event.data);
+        if (response.solved === true) {
+            appendSolution(response);
+            var clear_button = document.querySelector('#btnClear');
+            clear_button.disabled = false;
+            showToast("Lösung gefunden.");
+        } else {
+            showToast("Es konnte keine Lösung gefunden werden.");
+        }
+    });
+
+    /* Fehler bei der Berechnung meldet der Server als eigenes Ereignis mit der Beschreibung */
+    quelle.addEventListener("fehler", function (event) {
+        showToast("Fehler bei der Berechnung: " + JSON.parse(event.data));
+        cancel();
+    });
+
+    /* Ohne close() würde der Browser die Verbindung neu aufbauen und die Berechnung neu starten */
+    quelle.onerror = function () {
+        showToast("Ein Fehler bei der Verarbeitung der Daten ist aufgetreten.");
+        cancel();
+    };
 }
 
 function toggleAdvanced() {
@@ -106,7 +119,8 @@ function toggleReplan() {
 function updateReplanRegex() {
     var skillsetSize = document.querySelector('#skills').value;
     console.log(skillsetSize);
-    document.querySelector('#reSkills').pattern = "([01],){" + (skillsetSize - 1) + "}[01]{1}";
+    var skillset = "([01],){" + (skillsetSize - 1) + "}[01]{1}";
+    document.querySelector('#reSkills').pattern = skillset + "(;" + skillset + ")*";
 }
 
 function enableFields() {
@@ -114,6 +128,9 @@ function enableFields() {
     progress_indicator.style.display = "none";
     var cancel_button = document.querySelector('#btnCancel');
     cancel_button.disabled = true;
+    var stop_button = document.querySelector('#btnStop');
+    stop_button.disabled = true;
+    document.querySelector('#zwischenstand').textContent = "";
     var solve_button = document.querySelector('#btnSolve');
     solve_button.disabled = false;
     var inputs = document.getElementsByTagName("INPUT");
@@ -125,10 +142,21 @@ function enableFields() {
 }
 
 function cancel() {
-    xhttp.abort();
+    if (quelle !== null) {
+        quelle.close();
+    }
     enableFields()
 }
 
+function stopSearch() {
+    cancel();
+    if (zwischenstand !== null) {
+        appendSolution(zwischenstand.plan);
+        document.querySelector('#btnClear').disabled = false;
+        showToast("Suche beendet, die beste Zwischenlösung wurde übernommen.");
+    }
+}
+
 function resetAdvanced() {
     document.querySelector('#seed').value = "";
     document.querySelector('#minDistanz').value = 0;
@@ -201,6 +229,9 @@ function appendSolution(result) {
     if (!result.outputs.alle_auftraege_erledigt) {
         html += "<h4>Unerledigte Aufträge</h4><span>" + result.outputs.unerledigte_auftraege + "</span>"
     }
+    if (result.outputs.ohne_techniker) {
+        html += "<h4>Kein Techniker mit passenden Skills</h4><span>" + result.outputs.ohne_techniker + "</span>"
+    }
 
     if (anzRouten > 0) {
         html += "<h4>" + (anzRouten > 1 ? "Routen" : "Route") + "</h4>";
@@ -0,0 +1,119 @@
+"""Hintergrundausführung von Berechnungen für die Job-API von websolve.py
+
+Die Berechnungen laufen in einem ProcessPoolExecutor, da CPLEX mehrere Threads in einem Prozess schlecht verträgt.
+Jobs werden im Speicher des Webservers verwaltet. Die Anzahl gleichzeitig angenommener Jobs ist begrenzt, damit
+Lastspitzen in der Warteschlange landen, statt die Worker zu überlasten. Fertige Jobs werden nach einer
+Aufbewahrungszeit verworfen.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+WARTEND = "wartend"
+LAUFEND = "laufend"
+FERTIG = "fertig"
+FEHLER = "fehler"
+
+
+class JobVerwaltung:
+    """Nimmt Jobs an, verteilt sie auf die Worker-Prozesse und liefert ihren Status"""
+
+    def __init__(self, max_prozesse: int = None, max_jobs: int = None, aufbewahrung: int = 3600):
+        """
+        :param max_prozesse: int (Anzahl der Worker-Prozesse, Standard ist die Anzahl der Kerne)
+        :param max_jobs: int (maximal gleichzeitig offene Jobs, Standard ist das Vierfache der Worker)
+        :param aufbewahrung: int (Zeit in s, nach der fertige Jobs verworfen werden)
+        """
+        self.max_prozesse = max_prozesse or os.cpu_count() or 1
+        self.max_jobs = max_jobs or 4 * self.max_prozesse
+        self.aufbewahrung = aufbewahrung
+        self.pool = None
+        self.jobs = {}
+        self.sperre = threading.Lock()
+
+    def einreichen(self, funktion, *args):
+        """Reicht einen Aufruf von funktion(*args) als Job ein
+
+        :param funktion: callable (muss auf Modulebene definiert sein, damit sie an einen Prozess übergeben werden kann)
+        :return: str (Job-ID) oder None, wenn bereits max_jobs Jobs offen sind
+        """
+        with self.sperre:
+            self.aufraeumen()
+            if sum(1 for job in self.jobs.values() if not job["future"].done()) >= self.max_jobs:
+                return None
+
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.max_prozesse)
+            try:
+                future = self.pool.submit(funktion, *args)
+            except BrokenProcessPool:
+                # Ein abgestürzter Worker macht den ganzen Pool unbrauchbar, daher neu starten
+                self.pool = ProcessPoolExecutor(max_workers=self.max_prozesse)
+                future = self.pool.submit(funktion, *args)
+
+            return self.anlegen(future)
+
+    def ergebnis_eintragen(self, ergebnis) -> str:
+        """Legt einen bereits fertigen Job an, z.B. für ein Ergebnis aus dem Cache
+
+        :param ergebnis: Rückgabewert, den der Job liefern soll
+        :return: str (Job-ID)
+        """
+        future = Future()
+        future.set_result(ergebnis)
+        with self.sperre:
+            return self.anlegen(future)
+
+    def anlegen(self, future: Future) -> str:
+        job_id = uuid.uuid4().hex
+        self.jobs[job_id] = {"future": future, "erstellt": time.time(), "fertig": None}
+        return job_id
+
+    def bei_erfolg(self, job_id: str, rueckruf):
+        """Ruft rueckruf(ergebnis) im Webserver-Prozess auf, sobald der Job erfolgreich beendet ist
+
+        :param job_id: str
+        :param rueckruf: callable
+        """
+        def abschluss(future):
+            if not future.cancelled() and future.exception() is None:
+                rueckruf(future.result())
+
+        with self.sperre:
+            future = self.jobs[job_id]["future"]
+        future.add_done_callback(abschluss)
+
+    def status(self, job_id: str):
+        """Liefert den Status eines Jobs
+
+        :param job_id: str
+        :return: dict (id, status, bei Erfolg ergebnis, bei Fehlern fehler) oder None für unbekannte Jobs
+        """
+        with self.sperre:
+            self.aufraeumen()
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+
+            future = job["future"]
+            antwort = {"id": job_id, "status": LAUFEND if future.running() else WARTEND}
+            if future.done():
+                if job["fertig"] is None:
+                    job["fertig"] = time.time()
+                if future.exception() is not None:
+                    antwort.update(status=FEHLER, fehler=repr(future.exception()))
+                else:
+                    antwort.update(status=FERTIG, ergebnis=future.result())
+            return antwort
+
+    def aufraeumen(self):
+        """Verwirft Jobs, die seit mehr als aufbewahrung Sekunden fertig sind"""
+        jetzt = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if job["future"].done():
+                job["fertig"] = job["fertig"] or jetzt
+                if jetzt - job["fertig"] > self.aufbewahrung:
+                    del self.jobs[job_id]
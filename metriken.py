@@ -0,0 +1,91 @@
+"""Sammelt Laufzeiten und Solverkennzahlen der Web-API und gibt sie im Prometheus-Textformat aus
+
+Pro Anfrage werden die Phasenzeiten aus RoutingProblem.zeiten und die Kennzahlen aus RoutingProblem.solver_details
+übernommen. Die Phasenzeiten landen in Histogrammen, Knoten und Iterationen von CPLEX in Zählern, die Größe und der
+Gap des letzten MIP als Momentanwerte. Die Daten liegen nur im Speicher des Webserver-Prozesses.
+"""
+import threading
+from collections import Counter
+
+PRAEFIX = "tdp"
+GRENZEN = (0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300)  # Obergrenzen der Histogrammklassen in s
+
+
+class Metriken:
+    """Threadsicherer Sammler für die Kennzahlen der Web-API"""
+
+    def __init__(self):
+        self.sperre = threading.Lock()
+        self.phasen = {}  # Phase -> [Anzahl pro Klasse aus GRENZEN, Summe, Anzahl]
+        self.anfragen = Counter()  # (engine, geloest) -> Anzahl
+        self.cache_treffer = 0
+        self.solver_summen = Counter()  # knoten, iterationen
+        self.letztes_mip = {}  # variablen, constraints, gap
+
+    def phase_beobachten(self, phase: str, sekunden: float):
+        """Trägt die Dauer einer Phase in ihr Histogramm ein"""
+        with self.sperre:
+            klassen, summe, anzahl = self.phasen.get(phase, [[0] * len(GRENZEN), 0.0, 0])
+            for i, grenze in enumerate(GRENZEN):
+                if sekunden <= grenze:
+                    klassen[i] += 1
+            self.phasen[phase] = [klassen, summe + sekunden, anzahl + 1]
+
+    def erfassen(self, messung: dict):
+        """Übernimmt die Messung einer Anfrage
+
+        :param messung: dict ("zeiten": RoutingProblem.zeiten, "solver": RoutingProblem.solver_details())
+        """
+        for phase, sekunden in messung["zeiten"].items():
+            self.phase_beobachten(phase, sekunden)
+
+        solver = messung["solver"]
+        with self.sperre:
+            self.anfragen[(solver["engine"], solver["geloest"])] += 1
+            if solver["engine"] == "mip":
+                self.solver_summen["knoten"] += solver.get("knoten") or 0
+                self.solver_summen["iterationen"] += solver.get("iterationen") or 0
+                self.letztes_mip = {name: solver.get(name) for name in ("variablen", "constraints", "gap")}
+
+    def cache_treffer_zaehlen(self):
+        with self.sperre:
+            self.cache_treffer += 1
+
+    def prometheus(self) -> str:
+        """Alle Kennzahlen im Textformat von Prometheus (Version 0.0.4)"""
+        zeilen = []
+
+        def kopf(name, typ, hilfe):
+            zeilen.append("# HELP {}_{} {}".format(PRAEFIX, name, hilfe))
+            zeilen.append("# TYPE {}_{} {}".format(PRAEFIX, name, typ))
+
+        with self.sperre:
+            kopf("phase_sekunden", "histogram", "Dauer der Phasen pro Anfrage")
+            for phase, (klassen, summe, anzahl) in sorted(self.phasen.items()):
+                for grenze, wert in zip(GRENZEN, klassen):
+                    zeilen.append('{}_phase_sekunden_bucket{{phase="{}",le="{}"}} {}'.format(
+                        PRAEFIX, phase, grenze, wert))
+                zeilen.append('{}_phase_sekunden_bucket{{phase="{}",le="+Inf"}} {}'.format(PRAEFIX, phase, anzahl))
+                zeilen.append('{}_phase_sekunden_sum{{phase="{}"}} {}'.format(PRAEFIX, phase, summe))
+                zeilen.append('{}_phase_sekunden_count{{phase="{}"}} {}'.format(PRAEFIX, phase, anzahl))
+
+            kopf("anfragen_total", "counter", "Berechnete Anfragen nach Engine und Ergebnis")
+            for (engine, geloest), anzahl in sorted(self.anfragen.items(), key=str):
+                zeilen.append('{}_anfragen_total{{engine="{}",geloest="{}"}} {}'.format(
+                    PRAEFIX, engine, str(bool(geloest)).lower(), anzahl))
+
+            kopf("cache_treffer_total", "counter", "Aus dem Ergebniscache beantwortete Anfragen")
+            zeilen.append("{}_cache_treffer_total {}".format(PRAEFIX, self.cache_treffer))
+
+            kopf("solver_knoten_total", "counter", "Von CPLEX bearbeitete Branch-and-Bound-Knoten")
+            zeilen.append("{}_solver_knoten_total {}".format(PRAEFIX, self.solver_summen["knoten"]))
+            kopf("solver_iterationen_total", "counter", "Simplex-Iterationen von CPLEX")
+            zeilen.append("{}_solver_iterationen_total {}".format(PRAEFIX, self.solver_summen["iterationen"]))
+
+            for name, hilfe in (("variablen", "Variablen des letzten MIP"),
+                                ("constraints", "Constraints des letzten MIP"),
+                                ("gap", "Relativer Gap des letzten MIP")):
+                if self.letztes_mip.get(name) is not None:
+                    kopf("mip_" + name, "gauge", hilfe)
+                    zeilen.append("{}_mip_{} {}".format(PRAEFIX, name, self.letztes_mip[name]))
+        return "\n".join(zeilen) + "\n"
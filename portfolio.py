@@ -0,0 +1,193 @@
+"""Portfolio-Lösung: mehrere Lösungsverfahren laufen parallel gegen eine feste Deadline
+
+Jede Strategie (MIP mit eigenen CPLEX-Parametern oder Formulierung, ALNS, CP) läuft in einem eigenen Prozess und
+meldet ihre Pläne über eine gemeinsame Warteschlange, das MIP auch jede Zwischenlösung während der Suche. Der
+koordinierende Prozess führt den besten Plan (bewertet einheitlich mit heuristik.Bewertung, nicht mit den
+Zielfunktionswerten der einzelnen Verfahren, siehe RoutingProblem.plan_kosten), beginnend mit der
+Einfügeheuristik, damit zur Deadline in jedem Fall ein Plan vorliegt. Ist die Deadline erreicht, werden alle noch
+laufenden Strategien beendet.
+
+Es laufen so viele Strategien wie Kerne vorhanden sind, in der Reihenfolge von STRATEGIEN, mindestens aber die ersten
+MIN_STRATEGIEN (MIP und ALNS). Auf Rechnern mit wenigen Kernen teilen sich diese die Kerne, statt dass das Rennen
+nur aus dem MIP besteht, das auf großen Instanzen meist gegen ALNS verliert.
+
+Alle Strategien beginnen beim Plan der Einfügeheuristik: ALNS und CP verbessern ihn ohnehin, den MIP-Strategien wird
+er als MIP-Start übergeben (siehe heuristik_als_mip_start). Da heuristik.konstruieren deterministisch ist, erzeugt
+jeder Prozess denselben Plan wie der koordinierende Prozess, statt ihn übertragen zu bekommen. Das MIP minimiert
+allerdings seine eigene Zielfunktion, nicht die Kosten von heuristik.Bewertung, nach denen der Gewinner bestimmt
+wird. Ein für das MIP guter Plan kann dort deutlich schlechter abschneiden als der von ALNS, zusätzliche
+MIP-Varianten lohnen sich daher vor allem, wenn die Kerne für ALNS und CP nicht gebraucht werden.
+
+Strategien, die in der Umgebung nicht verfügbar sind (z.B. CP ohne cpoptimizer), melden einen Fehler und fallen aus
+dem Rennen, ohne die übrigen zu stören.
+"""
+import math
+import multiprocessing
+import os
+import queue
+import time
+from typing import List
+
+from docplex.mp.constants import EffortLevel
+
+import heuristik
+
+# Strategien in absteigender Priorität (erwarteter Nutzen), bei weniger Prozessen als Strategien laufen die ersten
+STRATEGIEN = [
+    {"name": "mip", "engine": "mip"},
+    {"name": "alns", "engine": "alns"},
+    {"name": "cp", "engine": "cp"},
+    {"name": "mip_zulaessigkeit", "engine": "mip", "parameter": {"emphasis.mip": 1}},
+    {"name": "mip_zweiindex", "engine": "mip", "formulierung": "zweiindex"},
+    {"name": "mip_heuristik", "engine": "mip", "parameter": {"mip.strategy.heuristicfreq": 5, "randomseed": 7}},
+]
+MIN_STRATEGIEN = 2  # Auch bei weniger Kernen laufen mindestens die ersten Strategien (MIP und ALNS) gegeneinander
+ANTEIL_PUFFER = 0.1  # Anteil des Budgets, um den die Strategien vor der Deadline enden, damit ihr Plan ankommt
+MIN_PUFFER = 0.5  # Mindestpuffer in s
+ENDE_WARTEN = 1.0  # Wartezeit in s für das Beenden eines Prozesses nach der Deadline
+
+
+def parameter_setzen(mdl, parameter: dict):
+    """Setzt CPLEX-Parameter über ihren Pfad, z.B. {"emphasis.mip": 1}
+
+    :param mdl: Model
+    :param parameter: dict (Pfad -> Wert)
+    """
+    for pfad, wert in parameter.items():
+        knoten = mdl.parameters
+        for teil in pfad.split("."):
+            knoten = getattr(knoten, teil)
+        knoten.set(wert)
+
+
+def heuristik_als_mip_start(problem):
+    """Übergibt dem aufgestellten Modell den Plan der Einfügeheuristik als zusätzlichen MIP-Start
+
+    Beim Replanning bleibt der MIP-Start aus dem vorherigen Plan (siehe RoutingProblem.mip_start_setzen) erhalten,
+    CPLEX beginnt mit dem besseren der beiden.
+
+    :param problem: RoutingProblem (mit Modell)
+    """
+    routen = heuristik.konstruieren(problem)
+    depots = {m: m + problem.ANZ_AUFTRAEGE for m in routen}
+    problem.mdl.add_mip_start(
+        problem.loesung_aus_routen({m: [depots[m]] + r + [depots[m]] for m, r in routen.items() if r},
+                                   problem.fixierte_startzeiten),
+        effort_level=EffortLevel.Repair)
+
+
+def strategie_ausfuehren(problem, strategie: dict, timeout: float, threads: int, warteschlange, replanning_daten=None,
+                         neue_auftraege: list = None):
+    """Führt eine Strategie aus, läuft in einem eigenen Prozess
+
+    :param problem: RoutingProblem (Kopie, ohne Modell)
+    :param strategie: dict (Eintrag wie in STRATEGIEN)
+    :param timeout: float (Zeitbudget in s)
+    :param threads: int (CPLEX-Threads für das MIP)
+    :param warteschlange: multiprocessing.Queue (für Pläne und die Abschlussmeldung)
+    :param replanning_daten: ReplanningDaten (optional, bereits ausgeführte Fahrten und Startzeiten)
+    :param neue_auftraege: List[Auftrag] (optional, zusätzliche Aufträge des Replannings)
+    """
+    name = strategie["name"]
+    engine = strategie["engine"]
+    fehler = None
+
+    # Zwischenlösungen des MIP und den Endstand jeder Strategie einheitlich bewertet melden
+    def melden(teil, zielfunktion, gap):
+        routen = teil.routen_ohne_depots()
+        warteschlange.put(("loesung", name, heuristik.Bewertung(teil).gesamtkosten(routen), routen))
+        return False
+
+    try:
+        if engine == "mip":
+            problem.modell_aus_daten_aufstellen(replanning_daten=replanning_daten, neue_auftraege=neue_auftraege,
+                                                formulierung=strategie.get("formulierung"))
+            problem.mdl.parameters.threads = threads
+            parameter_setzen(problem.mdl, strategie.get("parameter", {}))
+            heuristik_als_mip_start(problem)
+        elif replanning_daten:
+            problem.replanning_vorbereiten(replanning_daten, neue_auftraege=neue_auftraege)
+
+        problem.solve_model(timeout=timeout, engine=engine, zwischenstand=melden if engine == "mip" else None)
+        if problem.geloest:
+            melden(problem, None, None)
+    except Exception as e:
+        fehler = "{}: {}".format(type(e).__name__, e)
+    warteschlange.put(("fertig", name, fehler, None))
+
+
+def loesen(problem, timeout: float, strategien: List[dict] = None, replanning_daten=None,
+           neue_auftraege: list = None, max_prozesse: int = None):
+    """Lässt die Strategien gegeneinander laufen und liefert den besten Plan zur Deadline
+
+    Beim Replanning bereiten die Strategien ihre Kopie selbst vor, problem wird anschließend mit
+    replanning_vorbereiten auf denselben Stand gebracht.
+
+    :param problem: RoutingProblem
+    :param timeout: float (Zeitbudget in s bis zur Deadline)
+    :param strategien: List[dict] (Standard siehe STRATEGIEN)
+    :param replanning_daten: ReplanningDaten (optional)
+    :param neue_auftraege: List[Auftrag] (optional)
+    :param max_prozesse: int (Anzahl paralleler Prozesse, Standard ist die Anzahl der Kerne, mindestens
+        MIN_STRATEGIEN)
+    :return: tuple (Routen ohne Depots, Protokoll pro Strategie)
+    """
+    beginn = time.perf_counter()
+    deadline = beginn + timeout
+    kerne = os.cpu_count() or 1
+    strategien = (strategien or STRATEGIEN)[:max(MIN_STRATEGIEN, max_prozesse or kerne)]
+    threads = max(1, kerne // len(strategien))
+    budget = max(0.0, timeout - max(MIN_PUFFER, ANTEIL_PUFFER * timeout))
+
+    kontext = multiprocessing.get_context()
+    warteschlange = kontext.Queue()
+    prozesse = {}
+    for strategie in strategien:
+        prozess = kontext.Process(target=strategie_ausfuehren, daemon=True,
+                                  args=(problem, strategie, budget, threads, warteschlange, replanning_daten,
+                                        neue_auftraege))
+        prozess.start()
+        prozesse[strategie["name"]] = prozess
+
+    # Während die Strategien laufen, den eigenen Stand vorbereiten und den Plan der Einfügeheuristik als Rückfall
+    if replanning_daten:
+        problem.replanning_vorbereiten(replanning_daten, neue_auftraege=neue_auftraege)
+    bewertung = heuristik.Bewertung(problem)
+    beste_routen = heuristik.konstruieren(problem, bewertung)
+    beste_kosten = bewertung.gesamtkosten(beste_routen)
+    gewinner = "heuristik"
+    protokoll = {s["name"]: {"engine": s["engine"], "loesungen": 0, "kosten": None, "erste_loesung": None,
+                             "status": "abgebrochen"} for s in strategien}
+
+    laufend = set(prozesse)
+    while laufend:
+        rest = deadline - time.perf_counter()
+        if rest <= 0:
+            break
+        try:
+            art, name, wert, routen = warteschlange.get(timeout=rest)
+        except queue.Empty:
+            break
+        eintrag = protokoll[name]
+        if art == "fertig":
+            laufend.discard(name)
+            eintrag["status"] = "fehler" if wert else "fertig"
+            if wert:
+                eintrag["fehler"] = wert
+            continue
+
+        eintrag["loesungen"] += 1
+        if eintrag["erste_loesung"] is None:
+            eintrag["erste_loesung"] = time.perf_counter() - beginn
+        if eintrag["kosten"] is None or wert < eintrag["kosten"]:
+            eintrag["kosten"] = wert
+        if wert < beste_kosten and math.isfinite(wert):
+            beste_kosten, beste_routen, gewinner = wert, routen, name
+
+    # Harte Deadline: Nachzügler werden beendet
+    for prozess in prozesse.values():
+        if prozess.is_alive():
+            prozess.terminate()
+        prozess.join(ENDE_WARTEN)
+
+    return beste_routen, {"gewinner": gewinner, "kosten": beste_kosten, "strategien": protokoll}
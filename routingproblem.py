@@ -1,10 +1,20 @@
 import json
-from typing import Dict, List
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
 
 import numpy as np
+from docplex.mp.constants import EffortLevel
 from docplex.mp.model import Model
+from docplex.mp.progress import ProgressClock, SolutionListener
 from docplex.mp.solution import SolveSolution
 
+import cp_modell
+import distanzen
+import heuristik
+import portfolio
+import zerlegung
+
 
 class Auftrag:
     """Diese Klasse ist für zusätzliche Aufträge, die beim Replanning zum Tragen kommen, bestimmt."""
@@ -14,14 +24,17 @@ class Auftrag:
     spaeteste_end_zeit: int
     strafe: int
     skills: np.array
+    koordinaten: np.array
 
-    def __init__(self, fruehste_start_zeit, dauer, spaeteste_end_zeit, strafe, skills):
+    def __init__(self, fruehste_start_zeit, dauer, spaeteste_end_zeit, strafe, skills, koordinaten=None):
         """
         :param fruehste_start_zeit: int (muss so gewählt sein, dass fruehste_start_zeit + dauer + spaeteste_end_zeit < h_max)
         :param dauer: int (Dauer des Auftrags)
         :param spaeteste_end_zeit: int (muss so gewählt sein, dass fruehste_start_zeit + dauer + spaeteste_end_zeit < h_max)
         :param strafe: int (Strafe pro Minute über der spätesten Endzeit)
         :param skills: np.array (Länge muss mindestens ANZ_SKILLS des Problems entsprechen)
+        :param koordinaten: np.array (optional, Ort des Auftrags im Koordinatensystem des Problems, sonst wird ein
+            zufälliger Ort innerhalb der vorhandenen Wegpunkte gewählt)
         """
 
         if fruehste_start_zeit + dauer > spaeteste_end_zeit:
@@ -32,6 +45,7 @@ class Auftrag:
         self.spaeteste_end_zeit = spaeteste_end_zeit
         self.strafe = strafe
         self.skills = skills
+        self.koordinaten = koordinaten
 
     def __str__(self):
         return '[Auftrag - Frühste Startzeit {}, Dauer {}, späteste Endzeit {}, Strafe {}, Skills {}]'.format(
@@ -93,31 +107,77 @@ class JsonAntwort:
         startzeiten: dict
         unerledigte_auftraege: list
         solution: str
+        ohne_techniker: list  # Aufträge, für die kein Techniker alle Skills besitzt
 
         def __init__(self, alle_auftraege_erledigt, fahrten_pro_techniker_sortiert, startzeiten, unerledigte_auftraege,
-                     solution):
+                     solution, ohne_techniker=None):
             self.alle_auftraege_erledigt = alle_auftraege_erledigt
             self.fahrten_pro_techniker_sortiert = fahrten_pro_techniker_sortiert
             self.startzeiten = startzeiten
             self.unerledigte_auftraege = unerledigte_auftraege
             self.solution = solution
+            self.ohne_techniker = ohne_techniker
 
     solved: bool
     inputs: Inputs
     outputs: Outputs
+    metriken: dict
 
     def __init__(self, distanzmatrix, fruester_start, auftragsdauer, spaetestes_ende, auftrag_skills, strafe_auftrag,
                  strafe_techniker, techniker_skills, seed,
                  alle_auftraege_erledigt, fahrten_pro_techniker_sortiert, startzeiten, unerledigte_auftraege, solution,
-                 solved, replanned=False):
+                 solved, replanned=False, metriken=None, ohne_techniker=None):
         self.solved = solved
+        self.metriken = metriken
         self.inputs = self.Inputs(distanzmatrix, fruester_start, auftragsdauer, spaetestes_ende, auftrag_skills,
                                   strafe_auftrag, strafe_techniker, techniker_skills, seed, replanned)
         self.outputs = self.Outputs(alle_auftraege_erledigt, fahrten_pro_techniker_sortiert, startzeiten,
-                                    unerledigte_auftraege, solution)
+                                    unerledigte_auftraege, solution, ohne_techniker)
 
     def get_json(self):
-        return json.dumps({'solved': self.solved, 'inputs': self.inputs.__dict__, 'outputs': self.outputs.__dict__})
+        """Kompaktes JSON ohne Leerzeichen, nicht angeforderte Felder (None) werden weggelassen"""
+        antwort = {'solved': self.solved,
+                   'inputs': {k: v for k, v in self.inputs.__dict__.items() if v is not None},
+                   'outputs': {k: v for k, v in self.outputs.__dict__.items() if v is not None}}
+        if self.metriken is not None:
+            antwort['metriken'] = self.metriken
+        return json.dumps(antwort, separators=(',', ':'))
+
+
+class Zwischenstand(SolutionListener):
+    """Übernimmt jede verbesserte Zwischenlösung von CPLEX in den Plan des Problems und meldet sie weiter
+
+    Die Rückmeldung erhält das Problem (mit fahrten_pro_techniker_sortiert, startzeiten und unerledigte_auftraege wie
+    nach solve_model), den Zielfunktionswert und die aktuelle Gap. Gibt sie True zurück oder wird das Abbruchsignal
+    gesetzt, wird die Suche beendet, die bis dahin beste Lösung bleibt erhalten.
+    """
+
+    def __init__(self, problem, rueckmeldung: Callable = None, abbruch=None):
+        """
+        :param problem: RoutingProblem
+        :param rueckmeldung: Callable (problem, zielfunktion, gap) -> bool
+        :param abbruch: threading.Event (optional, wird bei jedem Aufruf von CPLEX geprüft)
+        """
+        super().__init__(ProgressClock.Objective)
+        self.problem = problem
+        self.rueckmeldung = rueckmeldung
+        self.abbruch = abbruch
+
+    def accept(self, pdata):
+        if self.abbruch is not None and self.abbruch.is_set():
+            self.abort()
+            return False
+        return super().accept(pdata)
+
+    def notify_solution(self, sol):
+        if self.rueckmeldung is None:
+            return
+        p = self.problem
+        p.fahrten_pro_techniker_sortiert, p.startzeiten, p.unerledigte_auftraege = p.loesung_dekodieren(sol)
+        p.alle_auftraege_erledigt = len(p.unerledigte_auftraege) == 0
+        p.geloest = True
+        if self.rueckmeldung(p, sol.objective_value, self.current_progress_data.mip_gap):
+            self.abort()
 
 
 class RoutingProblem:
@@ -136,6 +196,21 @@ class RoutingProblem:
     STRAFE_AUFTRAG: np.array
     STRAFE_TECHNIKER: np.array
 
+    KOORDINATEN = None  # Ort jedes Wegpunkts, Grundlage der DISTANZMATRIX (siehe koordinaten_setzen)
+    METRIK = "euklidisch"  # siehe distanzen.METRIKEN
+    GESCHWINDIGKEIT = 1.0  # Strecke pro Minute
+    FAHRZEIT_AUFSCHLAG = 0  # Feste Zeit pro Fahrt zwischen verschiedenen Orten
+    DISTANZ_DATEI = None  # .npy-Datei, wenn die DISTANZMATRIX eine Memory-Map ist
+
+    TECHNIKER_SKILL_BITS: np.array  # Gepackte Skillsets (siehe skill_index_aufbauen)
+    AUFTRAG_SKILL_BITS: np.array
+    KOMPATIBEL: np.array  # Techniker x Auftrag, True wenn der Techniker alle benötigten Skills hat
+    ERREICHBAR: np.array  # Techniker x Auftrag, KOMPATIBEL und zeitlich erreichbar (siehe vorpruefen)
+    START_FRUEHESTENS: np.array  # Techniker x Auftrag, Schranken der Startzeit aus der Vorprüfung
+    START_SPAETESTENS: np.array
+    START_MIN: np.array  # Schranken der Startzeit pro Auftrag über alle Techniker, 0 wenn unerreichbar
+    START_MAX: np.array
+
     TRANSPORT_KOSTEN = 0.15  # Betriebskosten pro Zeiteinheit während der Fahrt zwischen zwei Standorten
 
     GEWICHT_STRAFE_AUFTRAG_UNERFUELLT = 10000  # XL
@@ -143,6 +218,9 @@ class RoutingProblem:
     GEWICHT_STRAFE_TECHNIKER = 100  # M
     GEWICHT_TRANSPORT_KOSTEN = 1  # S
 
+    KPI_NAMEN = ["Strafkosten Auftrag verspätet", "Strafkosten Auftrag unerfüllter", "Strafkosten Techniker",
+                 "Transportkosten"]
+
     ANZ_TECHNIKER: int
     ANZ_AUFTRAEGE: int
     ANZ_WEGPUNKTE: int
@@ -150,17 +228,44 @@ class RoutingProblem:
 
     SEED: int
     REPLANNED = False
+    zufall: np.random.RandomState  # Eigener Zufallsgenerator der Instanz, siehe daten_generieren
+    MAX_SKILL_VERSUCHE = 100  # Runden der Verwerfungsmethode in skills_nachziehen
+
+    ENGINES = ["mip", "heuristik", "alns", "cp"]  # Wählbare Lösungsverfahren für solve_model
+    FORMULIERUNGEN = ["dreiindex", "zweiindex"]  # Wählbare Modellformulierungen, siehe modell_aus_daten_aufstellen
+    JSON_FELDER = ["solution", "distanzmatrix", "skills"]  # Große Felder, die json_ausgabe nur auf Anfrage liefert
+    GENERATOR_VERSION = 3  # Wird erhöht, wenn ein Seed andere Daten erzeugt als zuvor (Teil der Cacheschlüssel)
 
     mdl: Model
     solution: SolveSolution
 
+    formulierung = "dreiindex"
+    SYMMETRIE_BRECHEN = True  # Reihenfolge gleichwertiger Techniker festlegen, siehe symmetrie_brechen
+    symmetrie = {}  # Kennzahlen der Symmetriebrechung für solver_details
+    symmetrie_constraints = []
+    vorpruefung = {}  # Klassifikation der Aufträge für solver_details, siehe vorpruefen
+    cp_details = {}  # Kennzahlen des letzten Laufs mit engine="cp"
+    portfolio_details = {}  # Gewinner und Protokoll des letzten portfolio_loesen
+    zerlegung_details = {}  # Teilprobleme und Fehlschläge des letzten zerlegt_loesen
     x: {}
+    y: {}
+    z: {}
     start_zeit = []
+    ein: {}
+    aus: {}
+    gradgleichungen: {}
+    kpi_terme: {}
+
+    engine = None
+    zeiten = {}  # Dauer in s pro Phase (siehe zeitmessung)
 
+    geloest = False
     alle_auftraege_erledigt = False
     fahrten_pro_techniker_sortiert = {}
     startzeiten = {}
     unerledigte_auftraege = []
+    fixierte_startzeiten = {}
+    fixierte_routen = {}
 
     def __init__(self, anz_techniker: int = None, anz_auftraege: int = None, anz_skills: int = None,
                  tageslaenge: int = None, max_tageslaenge: int = None, seed: int = None):
@@ -173,13 +278,31 @@ class RoutingProblem:
         :param seed: int (Initialisierung für PRNG)
         """
         self.solution = None
+        self.engine = None
+        self.zufall = np.random.RandomState()
+        self.zeiten = {}
+        self.geloest = False
         self.alle_auftraege_erledigt = False
         self.fahrten_pro_techniker_sortiert = {}
         self.startzeiten = {}
         self.unerledigte_auftraege = []
+        self.fixierte_startzeiten = {}
+        self.fixierte_routen = {}
         self.mdl = None
         self.x = {}
+        self.y = {}
+        self.z = {}
+        self.symmetrie = {}
+        self.symmetrie_constraints = []
+        self.vorpruefung = {}
+        self.cp_details = {}
+        self.portfolio_details = {}
+        self.zerlegung_details = {}
         self.start_zeit = []
+        self.ein = {}
+        self.aus = {}
+        self.gradgleichungen = {}
+        self.kpi_terme = {}
 
         if (anz_techniker and anz_auftraege and anz_skills and tageslaenge and max_tageslaenge):
             self.daten_generieren(anz_techniker, anz_auftraege, anz_skills, tageslaenge, max_tageslaenge, seed)
@@ -213,7 +336,7 @@ Seed: {}
                          max_ende: int = 120,
                          e_ende: int = 60, max_strafe_auftrag: int = 100, e_strafe_auftrag: int = 25,
                          max_strafe_techniker: int = 100,
-                         e_strafe_techniker: int = 25):
+                         e_strafe_techniker: int = 25, distanz_datei: str = None):
         """Initialisiert die Ausgangsdaten, die später zur Modellgenerierung herangezogen werden.
 
         :param anz_techniker: int (Anzahl Techniker)
@@ -234,48 +357,50 @@ Seed: {}
         :param e_strafe_auftrag: int (Erwartungswert der Strafe pro Minute außerhalb des Wartungsfensters des Auftrags (binomialverteilt))
         :param max_strafe_techniker: int (maximale Strafe pro Minute außerhalb der Tagesdauer des Technikers (binomialverteilt))
         :param e_strafe_techniker:  int (Erwartungswert der  Strafe pro Minute außerhalb der Tagesdauer des Technikers (binomialverteilt))
+        :param distanz_datei: str (optional, .npy-Datei, in die die Distanzmatrix als Memory-Map geschrieben wird)
         """
 
         anz_wegpunkte = anz_techniker + anz_auftraege
 
-        # Wenn kein Seed gegeben ist, ziehe einen und speichere ihn
+        # Wenn kein Seed gegeben ist, ziehe einen und speichere ihn. Jede Instanz hat einen eigenen Zufallsgenerator,
+        # parallele Anfragen im Webserver beeinflussen sich dadurch nicht gegenseitig
         if not seed:
-            seed = np.random.randint(2 ** 32 - 1)
-        np.random.seed(seed)
+            seed = int(np.random.RandomState().randint(2 ** 32 - 1))
+        self.zufall = np.random.RandomState(seed)
+        zufall = self.zufall
         self.SEED = seed
 
-        # Gib eine symmetrische Distanzmatrix mit gegebenen Parametern aus
-        distanzmatrix = np.random.randint(min_distanz, int(max_distanz / 2), size=(anz_wegpunkte, anz_wegpunkte))
-        distanzmatrix = (distanzmatrix + distanzmatrix.T)
-        np.fill_diagonal(distanzmatrix, 0)
-        self.DISTANZMATRIX = distanzmatrix
+        # Verteile die Wegpunkte gleichmäßig auf ein Quadrat, dessen Diagonale (plus Aufschlag) max_distanz entspricht.
+        # Jede Fahrt dauert damit zwischen min_distanz und max_distanz Minuten
+        seite = max(max_distanz - min_distanz, 0) / np.sqrt(2)
+        self.koordinaten_setzen(zufall.uniform(0, seite, size=(anz_wegpunkte, 2)), aufschlag=min_distanz,
+                                datei=distanz_datei)
 
         # Setze Tageslänge
         self.H = tageslaenge
         self.H_max = max_tageslaenge
 
         # Generiere Skillsets, binomialverteilt
-        self.TECHNIKER_HAT_SKILL = np.random.binomial(n=1, p=(2 / 3), size=(anz_techniker, anz_skills))
-        self.AUFTRAG_BRAUCHT_SKILL = np.random.binomial(n=1, p=(1 / 3), size=(anz_auftraege, anz_skills))
+        self.TECHNIKER_HAT_SKILL = zufall.binomial(n=1, p=(2 / 3), size=(anz_techniker, anz_skills))
+        self.AUFTRAG_BRAUCHT_SKILL = zufall.binomial(n=1, p=(1 / 3), size=(anz_auftraege, anz_skills))
 
         # Generiere frühste Auftragsstartzeiten, gleichverteilt
-        self.FRUESTER_START = np.random.randint(min_start, max_start, size=anz_auftraege)
+        self.FRUESTER_START = zufall.randint(min_start, max_start, size=anz_auftraege)
 
-        # Generiere Auftragsdauern, binomialverteilt
-        self.AUFTRAGSDAUER = np.random.binomial(n=max_dauer, p=(e_dauer / max_dauer), size=anz_wegpunkte)
-        for i in range(anz_techniker):
-            self.AUFTRAGSDAUER[anz_auftraege + i] = 0
+        # Generiere Auftragsdauern, binomialverteilt, Depots haben die Dauer 0
+        self.AUFTRAGSDAUER = np.concatenate((
+            zufall.binomial(n=max_dauer, p=(e_dauer / max_dauer), size=anz_auftraege),
+            np.zeros(anz_techniker, dtype=int)))
 
         # Generiere Pufferzeit im Wartungsfenster der Aufträge, binomialverteilt
-        self.SPAETESTES_ENDE = np.zeros(anz_auftraege, dtype=int)
-        for i in range(anz_auftraege):
-            self.SPAETESTES_ENDE[i] = self.FRUESTER_START[i] + self.AUFTRAGSDAUER[i] + np.random.binomial(n=max_ende,
-                                                                                                  p=(e_ende / max_ende))
+        self.SPAETESTES_ENDE = self.FRUESTER_START + self.AUFTRAGSDAUER[:anz_auftraege] + \
+            zufall.binomial(n=max_ende, p=(e_ende / max_ende), size=anz_auftraege)
+
         # Generiere Strafzahlungen, binomialverteilt
-        self.STRAFE_AUFTRAG = np.random.binomial(n=max_strafe_auftrag, p=(e_strafe_auftrag / max_strafe_auftrag),
-                                                 size=anz_auftraege)
-        self.STRAFE_TECHNIKER = np.random.binomial(n=max_strafe_techniker,
-                                                   p=(e_strafe_techniker / max_strafe_techniker), size=anz_techniker)
+        self.STRAFE_AUFTRAG = zufall.binomial(n=max_strafe_auftrag, p=(e_strafe_auftrag / max_strafe_auftrag),
+                                              size=anz_auftraege)
+        self.STRAFE_TECHNIKER = zufall.binomial(n=max_strafe_techniker,
+                                                p=(e_strafe_techniker / max_strafe_techniker), size=anz_techniker)
 
         self.ANZ_AUFTRAEGE = anz_auftraege
         self.ANZ_SKILLS = anz_skills
@@ -283,15 +408,393 @@ Seed: {}
         self.ANZ_WEGPUNKTE = anz_wegpunkte
 
         # Überprüfe, ob die Techniker die Aufträge mit ihren Skillsets ausführen können
-        skill_check = np.zeros(self.ANZ_AUFTRAEGE, dtype=bool)
-        for techniker in self.TECHNIKER_HAT_SKILL:
-            for i, auftrag in enumerate(self.AUFTRAG_BRAUCHT_SKILL):
-                skill_check[i] = skill_check[i] or np.logical_or(techniker, np.logical_not(auftrag)).all()
-        if (not skill_check.all()):
-            print("Warnung - Skillset-Daten sind inkonsistent, es wird ein neuer Seed ({}) verwendet".format(seed + 1))
-            self.daten_generieren(anz_techniker, anz_auftraege, anz_skills, tageslaenge, max_tageslaenge, seed + 1)
-
-    def modell_aus_daten_aufstellen(self, replanning_daten=None, neuer_auftrag: Auftrag = None):
+        self.skill_index_aufbauen()
+        self.skills_nachziehen()
+
+    def koordinaten_setzen(self, koordinaten: np.ndarray, metrik: str = "euklidisch", geschwindigkeit: float = 1.0,
+                           aufschlag: int = 0, datei: str = None):
+        """Setzt die Orte aller Wegpunkte (Aufträge, dann Depots) und berechnet daraus die DISTANZMATRIX
+
+        :param koordinaten: np.ndarray (ANZ_WEGPUNKTE x 2, siehe distanzen.METRIKEN)
+        :param metrik: str (siehe distanzen.METRIKEN)
+        :param geschwindigkeit: float (Strecke pro Minute)
+        :param aufschlag: int (feste Zeit pro Fahrt zwischen verschiedenen Orten)
+        :param datei: str (optional, .npy-Datei für eine Memory-Map der Matrix)
+        """
+        self.KOORDINATEN = np.asarray(koordinaten, dtype=float)
+        self.METRIK = metrik
+        self.GESCHWINDIGKEIT = geschwindigkeit
+        self.FAHRZEIT_AUFSCHLAG = aufschlag
+        self.DISTANZ_DATEI = datei
+        self.DISTANZMATRIX = distanzen.matrix_berechnen(self.KOORDINATEN, metrik, geschwindigkeit, aufschlag, datei)
+
+    def __getstate__(self):
+        """Eine gemappte Distanzmatrix wird beim Pickeln (z.B. für Worker-Prozesse) nur als Dateiname übergeben, das
+        Modell wird nicht übertragen und muss bei Bedarf neu aufgestellt werden"""
+        zustand = self.__dict__.copy()
+        if self.DISTANZ_DATEI:
+            del zustand["DISTANZMATRIX"]
+        zustand.update(solution=None, mdl=None, x={}, y={}, z={}, symmetrie_constraints=[], start_zeit=[], ein={},
+                       aus={}, gradgleichungen={}, kpi_terme={})
+        return zustand
+
+    def __setstate__(self, zustand):
+        self.__dict__.update(zustand)
+        if self.DISTANZ_DATEI:
+            self.DISTANZMATRIX = distanzen.matrix_laden(self.DISTANZ_DATEI)
+
+    def skills_nachziehen(self):
+        """Zieht die Skillsets von Aufträgen, die kein Techniker ausführen kann, neu (Verwerfungsmethode)
+
+        Es werden nur die betroffenen Aufträge neu gezogen, alle übrigen Daten bleiben erhalten. Nach
+        MAX_SKILL_VERSUCHE Runden werden die Skills verbliebener Aufträge auf die eines zufälligen Technikers
+        beschränkt, damit die Generierung in jedem Fall endet.
+        """
+        for _ in range(self.MAX_SKILL_VERSUCHE):
+            unzulaessig = np.flatnonzero(~self.KOMPATIBEL.any(axis=0))
+            if len(unzulaessig) == 0:
+                return
+            self.AUFTRAG_BRAUCHT_SKILL[unzulaessig] = self.zufall.binomial(n=1, p=(1 / 3),
+                                                                           size=(len(unzulaessig), self.ANZ_SKILLS))
+            self.auftragsskills_aktualisieren(unzulaessig)
+
+        unzulaessig = np.flatnonzero(~self.KOMPATIBEL.any(axis=0))
+        if len(unzulaessig):
+            print("Warnung - Skillsets von {} Aufträgen werden auf die eines Technikers beschränkt".format(
+                len(unzulaessig)))
+            techniker = self.zufall.randint(self.ANZ_TECHNIKER, size=len(unzulaessig))
+            self.AUFTRAG_BRAUCHT_SKILL[unzulaessig] &= self.TECHNIKER_HAT_SKILL[techniker]
+            self.auftragsskills_aktualisieren(unzulaessig)
+
+    def auftragsskills_aktualisieren(self, auftraege: np.ndarray):
+        """Berechnet gepackte Skills und Kompatibilität für geänderte Aufträge neu
+
+        :param auftraege: np.ndarray (Indizes der Aufträge, deren AUFTRAG_BRAUCHT_SKILL sich geändert hat)
+        """
+        self.AUFTRAG_SKILL_BITS[auftraege] = self.skills_packen(self.AUFTRAG_BRAUCHT_SKILL[auftraege])
+        self.KOMPATIBEL[:, auftraege] = self.kompatibilitaet_berechnen(self.AUFTRAG_SKILL_BITS[auftraege])
+
+    @staticmethod
+    def skills_packen(skills) -> np.ndarray:
+        """Packt Skillvektoren zeilenweise in Bitsets (8 Skills pro Byte)
+
+        :param skills: np.array (Skillmatrix oder einzelner Skillvektor mit Einträgen 0/1)
+        :return: np.ndarray (uint8, letzte Achse hat die Länge ceil(ANZ_SKILLS / 8))
+        """
+        return np.packbits(np.asarray(skills, dtype=bool), axis=-1)
+
+    def skill_index_aufbauen(self):
+        """Berechnet die Kompatibilitätsmatrix Techniker x Auftrag aus den gepackten Skillsets.
+
+        Ein Techniker kann einen Auftrag ausführen, wenn kein benötigtes Skillbit bei ihm fehlt, also
+        AUFTRAG_BITS & ~TECHNIKER_BITS == 0 gilt. Das Ergebnis wird in KOMPATIBEL abgelegt und vom Generator, vom
+        Modell und von der Web-API verwendet.
+        """
+        self.TECHNIKER_SKILL_BITS = self.skills_packen(self.TECHNIKER_HAT_SKILL)
+        self.AUFTRAG_SKILL_BITS = self.skills_packen(self.AUFTRAG_BRAUCHT_SKILL)
+        self.KOMPATIBEL = self.kompatibilitaet_berechnen(self.AUFTRAG_SKILL_BITS)
+
+    def kompatibilitaet_berechnen(self, auftrag_bits) -> np.ndarray:
+        """Prüft gepackte Auftragsskills gegen alle Techniker
+
+        :param auftrag_bits: np.ndarray (gepackte Skills, siehe skills_packen)
+        :return: np.ndarray (bool, Form ANZ_TECHNIKER x Anzahl Aufträge)
+        """
+        auftrag_bits = np.atleast_2d(auftrag_bits)
+        fehlend = auftrag_bits[np.newaxis, :, :] & ~self.TECHNIKER_SKILL_BITS[:, np.newaxis, :]
+        return ~fehlend.any(axis=2)
+
+    def skills_pruefen(self, skills) -> np.ndarray:
+        """Prüft, ob der Skillvektor eines neuen Auftrags zu den Skills des Problems passt
+
+        :param skills: Skillvektor (0/1 je Skill)
+        :return: np.ndarray (Skillvektor als int-Array)
+        :raises ValueError: wenn die Länge nicht ANZ_SKILLS entspricht
+        """
+        skills = np.asarray(skills, dtype=int)
+        if skills.shape != (self.ANZ_SKILLS,):
+            raise ValueError("Skillvektor der Länge {} passt nicht zu {} Skills".format(skills.size, self.ANZ_SKILLS))
+        return skills
+
+    def techniker_fuer_auftrag(self, auftrag) -> np.ndarray:
+        """Liefert alle Techniker, die einen Auftrag mit ihren Skills ausführen können
+
+        :param auftrag: int oder Auftrag (Index eines vorhandenen Auftrags oder neuer Auftrag)
+        :return: np.ndarray (Indizes der passenden Techniker)
+        """
+        if isinstance(auftrag, Auftrag):
+            bits = self.skills_packen(self.skills_pruefen(auftrag.skills))
+            return np.flatnonzero(self.kompatibilitaet_berechnen(bits)[:, 0])
+        return np.flatnonzero(self.KOMPATIBEL[:, auftrag])
+
+    def vorpruefen(self):
+        """Klassifiziert die Aufträge vor dem Modellaufbau und schränkt ihre Startzeiten ein
+
+        Für jeden Techniker m und Auftrag k ergeben sich aus den kürzesten Wegen (siehe kuerzeste_wege) vom Depot zu
+        k und von k zurück ins Depot die früheste und die späteste mögliche Startzeit:
+
+        * START_FRUEHESTENS[m, k] = max(FRUESTER_START[k], 1, kürzeste Ankunft vom Depot)
+        * START_SPAETESTENS[m, k] = H_max - kürzeste Rückkehr von k ins Depot (einschließlich AUFTRAGSDAUER[k])
+
+        ERREICHBAR[m, k] gilt, wenn m passende Skills hat und das Zeitfenster nicht leer ist. Ein Auftrag ist
+        "unerreichbar", wenn kein Techniker ihn erreicht, und "verspaetet", wenn er selbst beim frühesten Start nach
+        SPAETESTES_ENDE endet. START_MIN und START_MAX sind die Schranken über alle Techniker, für unerreichbare
+        Aufträge 0. Bereits begonnene Aufträge (fixierte_startzeiten) bleiben erreichbar, ihre Schranken schließen
+        die feste Startzeit ein.
+        """
+        anz = self.ANZ_AUFTRAEGE
+        depots = np.arange(self.ANZ_TECHNIKER) + anz
+        dauer = self.AUFTRAGSDAUER.astype(float)
+        distanz = np.asarray(self.DISTANZMATRIX, dtype=float)
+        # Kantengewicht einer Fahrt: Dauer am Ausgangspunkt plus Fahrzeit
+        auftraege = dauer[:anz, None] + distanz[:anz, :anz]
+        hin = self.kuerzeste_wege(auftraege, dauer[depots, None] + distanz[depots, :anz])
+        zurueck = self.kuerzeste_wege(auftraege.T, (dauer[:anz, None] + distanz[:anz, depots]).T)
+
+        fruehestens = np.maximum(np.maximum(self.FRUESTER_START[:anz], 1), np.ceil(hin)).astype(int)
+        spaetestens = np.floor(self.H_max - zurueck).astype(int)
+        erreichbar = self.KOMPATIBEL & (fruehestens <= spaetestens)
+
+        if self.fixierte_startzeiten:
+            fixiert = np.array(list(self.fixierte_startzeiten), dtype=int)
+            zeiten = np.array(list(self.fixierte_startzeiten.values()), dtype=int)
+            erreichbar[:, fixiert] = self.KOMPATIBEL[:, fixiert]
+            fruehestens[:, fixiert] = np.minimum(fruehestens[:, fixiert], zeiten)
+            spaetestens[:, fixiert] = np.maximum(spaetestens[:, fixiert], zeiten)
+
+        self.ERREICHBAR = erreichbar
+        self.START_FRUEHESTENS = fruehestens
+        self.START_SPAETESTENS = spaetestens
+        unerreichbar = ~erreichbar.any(axis=0)
+        self.START_MIN = np.where(unerreichbar, 0, np.where(erreichbar, fruehestens, self.H_max).min(axis=0))
+        self.START_MAX = np.where(unerreichbar, 0, np.where(erreichbar, spaetestens, 0).max(axis=0))
+        verspaetet = ~unerreichbar & (self.START_MIN + self.AUFTRAGSDAUER[:anz] > self.SPAETESTES_ENDE)
+        self.vorpruefung = {"zulaessig": int((~unerreichbar & ~verspaetet).sum()),
+                            "unerreichbar": np.flatnonzero(unerreichbar).tolist(),
+                            "verspaetet": np.flatnonzero(verspaetet).tolist()}
+
+    @staticmethod
+    def kuerzeste_wege(gewichte: np.ndarray, start: np.ndarray) -> np.ndarray:
+        """Kürzeste Wege über beliebig viele Aufträge, vektorisiert nach Bellman-Ford
+
+        Die DISTANZMATRIX muss die Dreiecksungleichung nicht erfüllen (z.B. bei zufälligen Distanzen), ein Umweg
+        über andere Aufträge kann kürzer sein als die direkte Fahrt. Pro Startpunkt wird so lange über alle
+        Aufträge relaxiert, bis sich keine Entfernung mehr ändert.
+
+        :param gewichte: np.ndarray (Auftrag x Auftrag, Länge der Kante von i nach j)
+        :param start: np.ndarray (Startpunkt x Auftrag, Länge der direkten Kante vom Startpunkt)
+        :return: np.ndarray (Startpunkt x Auftrag, Länge des kürzesten Wegs)
+        """
+        entfernung = start.astype(float)
+        if not gewichte.size:
+            return entfernung
+        for zeile in entfernung:
+            while True:
+                neu = np.minimum(zeile, np.min(zeile[:, None] + gewichte, axis=0))
+                if np.array_equal(neu, zeile):
+                    break
+                zeile[:] = neu
+        return entfernung
+
+    def zulaessige_fahrten_ermitteln(self, auftraege: List[int] = None) -> List[tuple]:
+        """Ermittelt alle Fahrten (m, i, j), die ein Techniker überhaupt antreten kann.
+
+        Ein Techniker fährt nur zwischen seinem eigenen Depot und den Aufträgen, die er laut vorpruefen erreicht.
+        Schleifen (i == j) und die Fahrt vom Depot direkt zurück ins Depot werden ausgeschlossen, ebenso Fahrten,
+        nach denen j selbst beim frühesten Start von i nicht mehr rechtzeitig beginnen kann. Die Anzahl der
+        Fahrten wächst damit mit den nutzbaren Kanten und nicht mit ANZ_TECHNIKER * ANZ_WEGPUNKTE².
+
+        :param auftraege: List[int] (optional, es werden nur Fahrten geliefert, die einen dieser Aufträge berühren)
+        :return: List[tuple] (zulässige Indextripel (Techniker, von Wegpunkt, zu Wegpunkt))
+        """
+        fahrten = []
+        for m in range(self.ANZ_TECHNIKER):
+            knoten = np.append(np.flatnonzero(self.ERREICHBAR[m]), m + self.ANZ_AUFTRAEGE)
+            von, zu = np.meshgrid(knoten, knoten, indexing='ij')
+            maske = (von != zu) & self.zeitlich_moeglich(m, knoten)
+            if auftraege is not None:
+                maske &= np.isin(von, auftraege) | np.isin(zu, auftraege)
+            fahrten.extend((m, int(i), int(j)) for i, j in zip(von[maske], zu[maske]))
+        return fahrten
+
+    def zeitlich_moeglich(self, m: int, knoten: np.ndarray) -> np.ndarray:
+        """Prüft für alle Paare von Wegpunkten, ob Techniker m nach i noch rechtzeitig zu j kommt
+
+        :param m: int (Techniker)
+        :param knoten: np.ndarray (erreichbare Aufträge von m, zuletzt sein Depot)
+        :return: np.ndarray (len(knoten) x len(knoten), bool)
+        """
+        auftraege = knoten[:-1]
+        fruehestens = np.append(self.START_FRUEHESTENS[m, auftraege], 0)
+        spaetestens = np.append(self.START_SPAETESTENS[m, auftraege], self.H_max)
+        dauer = self.AUFTRAGSDAUER[knoten]
+        return fruehestens[:, None] + dauer[:, None] + self.DISTANZMATRIX[np.ix_(knoten, knoten)] <= spaetestens
+
+    def wegpunkt_name(self, k: int) -> str:
+        """Bezeichnung eines Wegpunkts für Variablennamen: Aufträge mit ihrem Index, Depots als D<Techniker>
+
+        :param k: int (Index des Wegpunkts)
+        :return: str
+        """
+        return str(k) if k < self.ANZ_AUFTRAEGE else "D{}".format(k - self.ANZ_AUFTRAEGE)
+
+    def auftrag_anfuegen(self, neuer_auftrag: Auftrag):
+        """Fügt einen Replanning-Auftrag in die Daten ein, siehe auftraege_anfuegen
+
+        :param neuer_auftrag: Auftrag
+        """
+        self.auftraege_anfuegen([neuer_auftrag])
+
+    def auftraege_anfuegen(self, neue_auftraege: List[Auftrag]):
+        """Fügt mehrere Replanning-Aufträge in einem Schritt in die Daten ein
+
+        Die Aufträge erhalten in ihrer Reihenfolge die Indizes ab ANZ_AUFTRAEGE (vor dem Einfügen), alle Depots rücken
+        um len(neue_auftraege) Stellen nach hinten. Jedes Array wird nur einmal kopiert, unabhängig von der Anzahl
+        der Aufträge.
+
+        :param neue_auftraege: List[Auftrag]
+        """
+        anz_neu = len(neue_auftraege)
+        anz_vorher = self.ANZ_AUFTRAEGE
+        # Vor jeder Änderung prüfen, damit ein ungültiger Auftrag die Daten nicht halb erweitert zurücklässt
+        skills = np.array([self.skills_pruefen(a.skills) for a in neue_auftraege], dtype=int)
+
+        # Inkrementiere Anzahlen
+        self.ANZ_AUFTRAEGE += anz_neu
+        self.ANZ_WEGPUNKTE += anz_neu
+
+        # Füge Aufträge an letzter Stelle hinzu
+        self.AUFTRAG_BRAUCHT_SKILL = np.vstack((self.AUFTRAG_BRAUCHT_SKILL, skills))
+        neue_bits = self.skills_packen(skills)
+        self.AUFTRAG_SKILL_BITS = np.vstack((self.AUFTRAG_SKILL_BITS, neue_bits))
+        self.KOMPATIBEL = np.hstack((self.KOMPATIBEL, self.kompatibilitaet_berechnen(neue_bits)))
+        self.STRAFE_AUFTRAG = np.hstack((self.STRAFE_AUFTRAG, [a.strafe for a in neue_auftraege]))
+        self.FRUESTER_START = np.hstack((self.FRUESTER_START, [a.fruehste_start_zeit for a in neue_auftraege]))
+        self.AUFTRAGSDAUER = np.insert(self.AUFTRAGSDAUER, anz_vorher, [a.dauer for a in neue_auftraege])
+        self.SPAETESTES_ENDE = np.hstack(
+            (self.SPAETESTES_ENDE, np.array([a.spaeteste_end_zeit for a in neue_auftraege], dtype=int)))
+
+        # Distanzen der neuen Wegpunkte: mit Koordinaten nur die neuen Zeilen berechnen, sonst zufällig und
+        # untereinander symmetrisch mit Nullen auf der Diagonalen
+        alte = np.r_[0:anz_vorher, anz_vorher + anz_neu:self.ANZ_WEGPUNKTE]
+        neue = np.arange(anz_vorher, anz_vorher + anz_neu)
+        if self.KOORDINATEN is not None:
+            orte = self.orte_bestimmen(neue_auftraege)
+            zu_alten = distanzen.fahrzeiten(orte, self.KOORDINATEN, self.METRIK, self.GESCHWINDIGKEIT,
+                                            self.FAHRZEIT_AUFSCHLAG)
+            untereinander = distanzen.fahrzeiten(orte, orte, self.METRIK, self.GESCHWINDIGKEIT,
+                                                 self.FAHRZEIT_AUFSCHLAG)
+            np.fill_diagonal(untereinander, 0)
+            self.KOORDINATEN = np.insert(self.KOORDINATEN, anz_vorher, orte, axis=0)
+        else:
+            zu_alten = self.zufall.randint(0, 120, size=(anz_neu, len(alte)))
+            untereinander = np.triu(self.zufall.randint(0, 120, size=(anz_neu, anz_neu)), 1)
+            untereinander = untereinander + untereinander.T
+        matrix = np.zeros((self.ANZ_WEGPUNKTE, self.ANZ_WEGPUNKTE), dtype=self.DISTANZMATRIX.dtype)
+        matrix[np.ix_(alte, alte)] = self.DISTANZMATRIX
+        matrix[np.ix_(neue, alte)] = zu_alten
+        matrix[np.ix_(alte, neue)] = zu_alten.T
+        matrix[np.ix_(neue, neue)] = untereinander
+        self.DISTANZMATRIX = matrix
+        self.DISTANZ_DATEI = None
+
+    def orte_bestimmen(self, neue_auftraege: List[Auftrag]) -> np.ndarray:
+        """Koordinaten neuer Aufträge, ohne Angabe zufällig innerhalb der Ausdehnung der vorhandenen Wegpunkte
+
+        :param neue_auftraege: List[Auftrag]
+        :return: np.ndarray (len(neue_auftraege) x 2)
+        """
+        untere, obere = self.KOORDINATEN.min(axis=0), self.KOORDINATEN.max(axis=0)
+        return np.array([a.koordinaten if a.koordinaten is not None else self.zufall.uniform(untere, obere)
+                         for a in neue_auftraege], dtype=float)
+
+    def teilproblem(self, auftraege: List[int], techniker: List[int]):
+        """Erzeugt ein eigenständiges Problem aus einer Teilmenge der Aufträge und Techniker
+
+        Im Teilproblem sind Aufträge und Techniker neu von 0 an nummeriert, in der Reihenfolge der übergebenen Listen.
+
+        :param auftraege: List[int] (Indizes der Aufträge im Gesamtproblem)
+        :param techniker: List[int] (Indizes der Techniker im Gesamtproblem)
+        :return: RoutingProblem
+        """
+        auftraege = np.asarray(auftraege, dtype=int)
+        techniker = np.asarray(techniker, dtype=int)
+        wegpunkte = np.concatenate((auftraege, techniker + self.ANZ_AUFTRAEGE))
+
+        teil = RoutingProblem()
+        teil.DISTANZMATRIX = self.DISTANZMATRIX[np.ix_(wegpunkte, wegpunkte)]
+        teil.AUFTRAGSDAUER = self.AUFTRAGSDAUER[wegpunkte]
+        teil.FRUESTER_START = self.FRUESTER_START[auftraege]
+        teil.SPAETESTES_ENDE = self.SPAETESTES_ENDE[auftraege]
+        teil.STRAFE_AUFTRAG = self.STRAFE_AUFTRAG[auftraege]
+        teil.STRAFE_TECHNIKER = self.STRAFE_TECHNIKER[techniker]
+        teil.AUFTRAG_BRAUCHT_SKILL = self.AUFTRAG_BRAUCHT_SKILL[auftraege]
+        teil.TECHNIKER_HAT_SKILL = self.TECHNIKER_HAT_SKILL[techniker]
+        teil.H = self.H
+        teil.H_max = self.H_max
+        teil.SEED = self.SEED
+        if self.KOORDINATEN is not None:
+            teil.KOORDINATEN = self.KOORDINATEN[wegpunkte]
+            teil.METRIK = self.METRIK
+            teil.GESCHWINDIGKEIT = self.GESCHWINDIGKEIT
+            teil.FAHRZEIT_AUFSCHLAG = self.FAHRZEIT_AUFSCHLAG
+        teil.zufall = np.random.RandomState(self.SEED)
+        teil.ANZ_AUFTRAEGE = len(auftraege)
+        teil.ANZ_TECHNIKER = len(techniker)
+        teil.ANZ_WEGPUNKTE = len(wegpunkte)
+        teil.ANZ_SKILLS = self.ANZ_SKILLS
+        teil.skill_index_aufbauen()
+        return teil
+
+    def zerlegt_loesen(self, timeout: int = 120, engine: str = "mip", anz_cluster: int = None,
+                       max_prozesse: int = None):
+        """Zerlegt das Problem geografisch und löst die Teilprobleme parallel, siehe zerlegung.py
+
+        Das Ergebnis steht wie nach solve_model in fahrten_pro_techniker_sortiert, startzeiten und
+        unerledigte_auftraege. Gedacht für die Tagesplanung, fixierte Aufträge eines Replannings werden nicht
+        berücksichtigt. Anzahl und Fehlschläge der Teilprobleme stehen in zerlegung_details (siehe solver_details).
+
+        :param timeout: int (Zeitbudget in s für Teilprobleme und Reparatur zusammen)
+        :param engine: str (Lösungsverfahren der Teilprobleme, siehe ENGINES)
+        :param anz_cluster: int (Anzahl der Teilprobleme, Standard siehe zerlegung.anzahl_cluster)
+        :param max_prozesse: int (Anzahl paralleler Prozesse, Standard ist die Anzahl der Kerne)
+        """
+        if engine not in self.ENGINES:
+            raise ValueError("Unbekannte Engine '{}', erlaubt sind {}".format(engine, self.ENGINES))
+        self.engine = "zerlegung"
+        with self.zeitmessung("loesen"):
+            routen, self.zerlegung_details = zerlegung.loesen(self, timeout, engine, anz_cluster, max_prozesse)
+        self.zerlegung_details["engine"] = engine
+        self.solution = None
+        with self.zeitmessung("dekodieren"):
+            self.plan_uebernehmen(routen)
+
+    def portfolio_loesen(self, timeout: int = 120, replanning_daten=None, neue_auftraege: List[Auftrag] = None,
+                         strategien: List[dict] = None, max_prozesse: int = None):
+        """Lässt mehrere Lösungsverfahren parallel bis zur Deadline laufen und übernimmt den besten Plan, siehe
+        portfolio.py
+
+        Das Ergebnis steht wie nach solve_model in fahrten_pro_techniker_sortiert, startzeiten und
+        unerledigte_auftraege. Ein Modell muss nicht aufgestellt sein, beim Replanning werden die Replanning-Daten
+        und neuen Aufträge direkt übergeben (statt modell_aus_daten_aufstellen bzw. replanning_vorbereiten).
+
+        :param timeout: int (Wandzeit in s bis zur Deadline)
+        :param replanning_daten: ReplanningDaten (optional, bereits ausgeführte Fahrten und Startzeiten)
+        :param neue_auftraege: List[Auftrag] (optional, zusätzliche Aufträge des Replannings)
+        :param strategien: List[dict] (Standard siehe portfolio.STRATEGIEN)
+        :param max_prozesse: int (Anzahl paralleler Prozesse, Standard ist die Anzahl der Kerne, siehe portfolio.loesen)
+        """
+        self.engine = "portfolio"
+        with self.zeitmessung("loesen"):
+            routen, self.portfolio_details = portfolio.loesen(self, timeout, strategien, replanning_daten,
+                                                              neue_auftraege, max_prozesse)
+        self.solution = None
+        with self.zeitmessung("dekodieren"):
+            self.plan_uebernehmen(routen)
+
+    def modell_aus_daten_aufstellen(self, replanning_daten=None, neuer_auftrag: Auftrag = None,
+                                    inkrementell: bool = False, neue_auftraege: List[Auftrag] = None,
+                                    formulierung: str = None):
         """Stellt das Linearprogramm aus den vorinitialisierten Daten auf
 
         Wichtig: Zugriff auf die Aufträge und Depots sind in gemeinsamen Arrays x und DISTANZMATRIX.
@@ -301,365 +804,885 @@ Seed: {}
             Die Indizierung von x ist speziell, der Zugriff muss über ein Python Set aus Indizes bestehen, daher die
             etwas merkwürdige Syntax x[()]
 
+            x enthält nur die zulässigen Fahrten (siehe zulaessige_fahrten_ermitteln), nicht enthaltene Fahrten
+            werden niemals angetreten.
+
+            Für jeden Techniker und jeden seiner Wegpunkte zählen die Hilfsvariablen ein[(m, k)] und aus[(m, k)] die
+            angetretenen Fahrten in bzw. aus dem Wegpunkt. Alle Constraints greifen auf diese Summen zu, dadurch muss
+            beim Replanning nur deren Definition um die Fahrten des neuen Auftrags ergänzt werden.
+
         Indizes beginnen immer bei 0.
 
-        1. Das Modell um einen potenziellen Replanning-Auftrag erweitert
+        Mit formulierung="zweiindex" wird statt x[(m, i, j)] die kompaktere Formulierung aus zweiindex_aufstellen
+        verwendet. Sie wird immer vollständig neu aufgestellt, inkrementell gilt nur für "dreiindex".
+
+        1. Das Modell um potenzielle Replanning-Aufträge erweitert
         2. Die Zielfunktion wird mit 4 KPIs erstellt
         3. Die Constraints werden hinzugefügt
 
-        :param replanning_daten:
-        :param neuer_auftrag:
-        """
-        mdl = Model(name="Technician Dispatch Problem")
-
-        # Wenn ein neuer Auftrag hinzukommt -> Replanning, dann passe die Arrays und Matrizen an
-        if neuer_auftrag:
-            # Inkrementiere Anzahlen
-            self.ANZ_AUFTRAEGE += 1
-            self.ANZ_WEGPUNKTE += 1
-
-            # Füge Auftrag an letzer Stelle hinzu
-            self.AUFTRAG_BRAUCHT_SKILL = np.vstack((self.AUFTRAG_BRAUCHT_SKILL, np.array(neuer_auftrag.skills)))
-            self.STRAFE_AUFTRAG = np.hstack((self.STRAFE_AUFTRAG, np.array(neuer_auftrag.strafe)))
-            self.FRUESTER_START = np.hstack((self.FRUESTER_START, np.array(neuer_auftrag.fruehste_start_zeit)))
-            self.AUFTRAGSDAUER = np.hstack((self.AUFTRAGSDAUER[:self.ANZ_AUFTRAEGE - 1], np.array(neuer_auftrag.dauer),
-                                            self.AUFTRAGSDAUER[self.ANZ_AUFTRAEGE - 1:]))
-            self.SPAETESTES_ENDE = np.hstack(
-                (self.SPAETESTES_ENDE, np.array(neuer_auftrag.spaeteste_end_zeit, dtype=int)))
-
-            # Generiere neue Distanzen für den neuen Wegpunkt
-            zufallsdistanzen = np.random.randint(0, 120, size=self.ANZ_WEGPUNKTE)
-            zufallsdistanzen[self.ANZ_AUFTRAEGE - 1] = 0
-            self.DISTANZMATRIX = np.insert(self.DISTANZMATRIX, self.ANZ_AUFTRAEGE - 1,
-                                           np.delete(zufallsdistanzen, self.ANZ_AUFTRAEGE - 1), 0)
-            self.DISTANZMATRIX = np.insert(self.DISTANZMATRIX, self.ANZ_AUFTRAEGE - 1, zufallsdistanzen, 1)
-
-        # Abkürzung für loop ranges
-        r_auftraege = range(self.ANZ_AUFTRAEGE)
-        r_wegpunkte = range(self.ANZ_WEGPUNKTE)
-        r_techniker = range(self.ANZ_TECHNIKER)
-        r_skills = range(self.ANZ_SKILLS)
-
-        # Entscheidungsvariablen
-        x = mdl.binary_var_cube(self.ANZ_TECHNIKER, self.ANZ_WEGPUNKTE, self.ANZ_WEGPUNKTE, name="Fahrt")
-        start_zeit = mdl.integer_var_list(self.ANZ_WEGPUNKTE, name="Startzeit")
-
-        # Entscheidungsausdrücke
-        #
-        # Summe der Strafkosten für verspätetet erledigte Aufträge
-        strafkosten_auftrag_verspaetet = mdl.sum(
-            mdl.max(0, start_zeit[i] + self.AUFTRAGSDAUER[i] - self.SPAETESTES_ENDE[i]) * self.STRAFE_AUFTRAG[i]
-            for i in r_auftraege
-        )
-        mdl.add_kpi(strafkosten_auftrag_verspaetet, "Strafkosten Auftrag verspätet")
+        :param replanning_daten: ReplanningDaten (bereits ausgeführte Fahrten und Startzeiten)
+        :param neuer_auftrag: Auftrag (zusätzlicher Auftrag für das Replanning)
+        :param inkrementell: bool (erweitert ein bestehendes Modell um die neuen Aufträge, statt es neu aufzustellen)
+        :param neue_auftraege: List[Auftrag] (mehrere zusätzliche Aufträge, werden gemeinsam mit neuer_auftrag in
+            einem Schritt eingefügt und gelöst)
+        :param formulierung: str (siehe FORMULIERUNGEN, ohne Angabe bleibt die bisherige Formulierung erhalten)
+        """
+        gewechselt = False
+        if formulierung is not None:
+            if formulierung not in self.FORMULIERUNGEN:
+                raise ValueError("Unbekannte Formulierung '{}', erlaubt sind {}".format(formulierung,
+                                                                                      self.FORMULIERUNGEN))
+            gewechselt = formulierung != self.formulierung
+            self.formulierung = formulierung
+
+        with self.zeitmessung("modell_aufstellen"):
+            # Vorherigen Plan für den MIP-Start merken, er bezieht sich noch auf die alten Depotindizes
+            vorplan = self.fahrten_pro_techniker_sortiert if (replanning_daten and self.geloest) else None
+            anz_auftraege_vorher = self.ANZ_AUFTRAEGE
+            neue_auftraege = self.neue_auftraege_sammeln(neuer_auftrag, neue_auftraege)
+
+            if inkrementell and self.mdl is not None and neue_auftraege and not gewechselt \
+                    and self.formulierung == "dreiindex":
+                self.modell_erweitern(replanning_daten, neue_auftraege)
+            else:
+                self.modell_neu_aufstellen(replanning_daten, neue_auftraege)
 
-        # Summe der Strafkosten für unerledigte Aufträge
-        strafkosten_auftrag_unerfuellt = mdl.sum(
-            mdl.max((1 - start_zeit[i]) * 10000, 0) * self.STRAFE_AUFTRAG[i]
-            for i in r_auftraege
-        )
-        mdl.add_kpi(strafkosten_auftrag_unerfuellt, "Strafkosten Auftrag unerfüllter")
-
-        # Summe der Strafkosten für verspätetet zurückgekehrte Techniker
-        strafkosten_techniker = mdl.sum(
-            mdl.max(0, start_zeit[i] + self.AUFTRAGSDAUER[i], self.DISTANZMATRIX[i][m + self.ANZ_AUFTRAEGE] - self.H)
-            * self.STRAFE_TECHNIKER[m] * x[(m, i, m + self.ANZ_AUFTRAEGE)]
-            for i in r_auftraege
-            for m in r_techniker
-        )
-        mdl.add_kpi(strafkosten_techniker, "Strafkosten Techniker")
-
-        # Summe der Transportkosten
-        transportkosten = mdl.sum(
-            x[(m, i, j)] * self.DISTANZMATRIX[i][j] * self.TRANSPORT_KOSTEN
-            for m in r_techniker
-            for i in r_wegpunkte
-            for j in r_wegpunkte
-        )
-        mdl.add_kpi(transportkosten, "Transportkosten")
+            if vorplan:
+                self.mip_start_setzen(vorplan, replanning_daten, anz_auftraege_vorher)
 
-        # Gewichteter Entscheidungsausdruck
-        mdl.minimize(
-            strafkosten_auftrag_verspaetet * self.GEWICHT_STRAFE_AUFTRAG + strafkosten_techniker * self.GEWICHT_STRAFE_TECHNIKER +
-            self.GEWICHT_STRAFE_AUFTRAG_UNERFUELLT * strafkosten_auftrag_unerfuellt
-        )
+    @contextmanager
+    def zeitmessung(self, phase: str):
+        """Addiert die Dauer des with-Blocks in zeiten[phase], beim Replanning zählen beide Durchläufe
 
-        # Constraints
-        #
-        # Startzeit eines Auftrags muss nach frühestem Startpunkt liegen
-        for i in r_auftraege:
-            mdl.add_if_then(
-                mdl.sum(
-                    x[(m, j, i)]
-                    for m in r_techniker
-                    for j in r_wegpunkte
-                ) >= 1,
-                self.FRUESTER_START[i] <= start_zeit[i]
-            )
+        :param phase: str (z.B. daten_generieren, modell_aufstellen, loesen, dekodieren, json_ausgabe)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.zeiten[phase] = self.zeiten.get(phase, 0.0) + time.perf_counter() - start
+
+    @staticmethod
+    def neue_auftraege_sammeln(neuer_auftrag: Auftrag = None, neue_auftraege: List[Auftrag] = None) -> List[Auftrag]:
+        """Fasst einen einzelnen und eine Liste neuer Aufträge zu einer Liste zusammen
+
+        :param neuer_auftrag: Auftrag (oder None)
+        :param neue_auftraege: List[Auftrag] (oder None)
+        :return: List[Auftrag]
+        """
+        return list(neue_auftraege or []) + ([neuer_auftrag] if neuer_auftrag else [])
 
-        # Startzeit und Auftragsdauer müssen vor H_max enden
-        mdl.add_constraints(
-            start_zeit[i] + self.AUFTRAGSDAUER[i] <= self.H_max
-            for i in r_auftraege
-        )
+    def modell_neu_aufstellen(self, replanning_daten=None, neue_auftraege: List[Auftrag] = None):
+        """Stellt das Modell vollständig neu auf, siehe modell_aus_daten_aufstellen
 
-        # Wenn eine Fahrt von einem Auftrag zu einem Depot stattfindet, dann muss die Ankunftszeit vor H_max liegen
-        for i in r_auftraege:
-            for m in r_techniker:
-                mdl.add_if_then(
-                    x[(m, i, m + self.ANZ_AUFTRAEGE)] == 1,
-                    start_zeit[i] + self.AUFTRAGSDAUER[i] + self.DISTANZMATRIX[i][
-                        m + self.ANZ_AUFTRAEGE] <= self.H_max
-                )
+        :param replanning_daten: ReplanningDaten (bereits ausgeführte Fahrten und Startzeiten)
+        :param neue_auftraege: List[Auftrag] (zusätzliche Aufträge für das Replanning)
+        """
+        anz_auftraege_vorher = self.ANZ_AUFTRAEGE
 
-        # Fährt nicht von anderem Wegpunkt zu fremden Depot
-        mdl.add_constraints(
-            x[(m, i, t + self.ANZ_AUFTRAEGE)] == 0
-            for m in r_techniker
-            for i in r_wegpunkte
-            for t in r_techniker
-            if (t != m)
-        )
+        # Wenn neue Aufträge hinzukommen -> Replanning, dann passe die Arrays und Matrizen an
+        if neue_auftraege:
+            self.auftraege_anfuegen(neue_auftraege)
+        self.fixierung_merken(replanning_daten, anz_auftraege_vorher)
+        self.vorpruefen()
+        self.modell_aufbauen(replanning_daten, anz_auftraege_vorher)
 
-        # Fährt nicht von anderem Depot zu einem Wegpunkt
-        mdl.add_constraints(
-            x[(m, i + self.ANZ_AUFTRAEGE, j)] == 0
-            for m in r_techniker
-            for i in r_techniker
-            for j in r_wegpunkte
-            if m != i
-        )
+    def modell_aufbauen(self, replanning_daten, anz_auftraege_vorher: int):
+        """Legt ein neues Modell für die aktuellen Daten und die Schranken aus vorpruefen an
 
-        # Fährt maximal einmal von seinem Depot los
-        mdl.add_constraints(
-            mdl.sum(
-                x[(m, m + self.ANZ_AUFTRAEGE, j)]
-                for j in r_auftraege
-            ) <= 1
-            for m in r_techniker
-        )
+        :param replanning_daten: ReplanningDaten (bereits ausgeführte Fahrten und Startzeiten)
+        :param anz_auftraege_vorher: int (Anzahl der Aufträge, auf die sich die Replanning-Daten beziehen)
+        """
+        self.mdl = Model(name="Technician Dispatch Problem")
+        self.x = {}
+        self.y = {}
+        self.z = {}
+        self.ein = {}
+        self.aus = {}
+        self.gradgleichungen = {}
+        self.kpi_terme = {name: [] for name in self.KPI_NAMEN}
+
+        # Entscheidungsvariablen, die Startzeit eines Auftrags ist durch die Vorprüfung beschränkt
+        self.start_zeit = self.mdl.integer_var_list(self.ANZ_WEGPUNKTE,
+                                                    ub=self.START_MAX.tolist() + [0] * self.ANZ_TECHNIKER,
+                                                    name=lambda k: "Startzeit_{}".format(self.wegpunkt_name(k)))
 
-        # Fährt maximal einmal nach Hause
-        mdl.add_constraints(
-            mdl.sum(
-                x[(m, j, m + self.ANZ_AUFTRAEGE)]
-                for j in r_auftraege
-            ) <= 1
-            for m in r_techniker
+        # Defaultwert für Technikerstart
+        self.mdl.add_constraints(
+            self.start_zeit[m + self.ANZ_AUFTRAEGE] == 0
+            for m in range(self.ANZ_TECHNIKER)
         )
 
-        # Beginnt die Route im eigenen Depot
-        mdl.add_constraints(
-            x[(m, i, j)] <= mdl.sum(
-                x[(m, m + self.ANZ_AUFTRAEGE, t)] for t in r_auftraege
-            )
-            for m in r_techniker
-            for i in r_wegpunkte
-            for j in r_auftraege
-        )
+        # Zulässige Fahrten vorab bestimmen, nur für diese werden Variablen angelegt
+        if self.formulierung == "zweiindex":
+            self.zweiindex_aufstellen()
+        else:
+            self.fahrten_hinzufuegen(self.zulaessige_fahrten_ermitteln())
+        self.auftraege_hinzufuegen(range(self.ANZ_AUFTRAEGE))
+        self.zielfunktion_setzen()
 
-        # Endet die Route im eigenen Depot
-        mdl.add_constraints(
-            x[(m, i, j)] <= mdl.sum(
-                x[(m, t, m + self.ANZ_AUFTRAEGE)]
-                for t in r_auftraege
-                if t != i
-            )
-            for m in r_techniker
-            for i in r_wegpunkte
-            for j in r_auftraege
-            if i != j
-            if (i < self.ANZ_AUFTRAEGE) or (i == m + self.ANZ_AUFTRAEGE)
-        )
+        # Fixierte Routen machen Techniker unterscheidbar, beim Replanning wird die Symmetrie nicht gebrochen
+        self.symmetrie_constraints = []
+        self.symmetrie = {}
+        if self.SYMMETRIE_BRECHEN and not replanning_daten:
+            self.symmetrie_brechen()
 
-        # Fährt maximal einmal von einem Wegpunkt zu einem anderen Wegpunkt
-        mdl.add_constraints(
-            mdl.sum(
-                x[(m, j, k)]
-                for k in r_wegpunkte
-            ) <= 1
-            for m in r_techniker
-            for j in r_wegpunkte
-            if m + self.ANZ_AUFTRAEGE != j
-        )
+        self.replanning_fixieren(replanning_daten, anz_auftraege_vorher)
 
-        # Wenn er von einem Auftrag wegfährt, dann muss er dort auch hingefahren sein
-        mdl.add_constraints(
-            x[(m, j, l)] <= mdl.sum([
-                x[(m, t, j)]
-                for t in r_wegpunkte
-                if j != t
-                if l != t
-            ]
-            )
-            for m in r_techniker
-            for j in r_auftraege
-            for l in r_auftraege
-            if l != j
-        )
+    def modell_erweitern(self, replanning_daten, neue_auftraege: List[Auftrag]):
+        """Erweitert das bestehende Modell um Replanning-Aufträge, ohne es neu aufzustellen
 
-        # Wenn er von einem Auftrag wegfährt, dann muss er dort auch hingefahren sein
-        mdl.add_constraints(
-            x[(m, j, l)] <= mdl.sum([
-                x[(m, t, j)]
-                for t in r_wegpunkte
-                if j != t
-            ]
-            )
-            for m in r_techniker
-            for j in r_auftraege
-            for l in r_wegpunkte
-            if l != j
-        )
+        Es werden nur die Variablen und Constraints angelegt, die die neuen Aufträge berühren. Bestehende Variablen
+        werden an die neuen Depotindizes angepasst, die Definitionen von ein/aus um die neuen Fahrten ergänzt.
 
-        # Jeder Auftrag mit positiver Startzeit muss angefahren worden sein
-        for i in r_auftraege:
-            mdl.add_if_then(
-                start_zeit[i] >= 1,
-                mdl.sum(
-                    [
-                        x[(m, j, i)]
-                        for m in r_techniker
-                        for j in r_wegpunkte
-                    ]
-                ) == 1
-            )
+        :param replanning_daten: ReplanningDaten (bereits ausgeführte Fahrten und Startzeiten)
+        :param neue_auftraege: List[Auftrag] (zusätzliche Aufträge für das Replanning)
+        """
+        mdl = self.mdl
+        anz_auftraege_vorher = self.ANZ_AUFTRAEGE
+        anz_neu = len(neue_auftraege)
+        bisher = (self.ERREICHBAR, self.START_FRUEHESTENS, self.START_SPAETESTENS)
+        self.auftraege_anfuegen(neue_auftraege)
+        self.fixierung_merken(replanning_daten, anz_auftraege_vorher)
+        self.vorpruefen()
+
+        # Die Big-M-Werte und weggelassenen Fahrten der bestehenden Constraints beruhen auf den bisherigen
+        # Schranken. Werden diese durch die neuen Aufträge weiter (Umwege bei fehlender Dreiecksungleichung), wird
+        # das Modell neu aufgebaut. Bereits begonnene Aufträge liegen ohnehin innerhalb ihrer bisherigen Schranken fest
+        erreichbar = self.ERREICHBAR[:, :anz_auftraege_vorher].copy()
+        erreichbar[:, list(self.fixierte_startzeiten)] = False
+        if (erreichbar & ~bisher[0]).any() or \
+                (erreichbar & (self.START_FRUEHESTENS[:, :anz_auftraege_vorher] < bisher[1])).any() or \
+                (erreichbar & (self.START_SPAETESTENS[:, :anz_auftraege_vorher] > bisher[2])).any():
+            self.modell_aufbauen(replanning_daten, anz_auftraege_vorher)
+            return
+
+        # Die Symmetriebrechung des Tagesplans passt nicht zu den fixierten Routen
+        if self.symmetrie_constraints:
+            mdl.remove_constraints(self.symmetrie_constraints)
+            self.symmetrie_constraints = []
+            self.symmetrie = {}
+        neue = list(range(anz_auftraege_vorher, self.ANZ_AUFTRAEGE))
+
+        # Depots rücken um anz_neu Stellen nach hinten, die Schlüssel werden nachgezogen. Die Variablennamen bleiben
+        # gültig, da Depots unabhängig von ihrem Index benannt sind (siehe wegpunkt_name)
+        def verschieben(k):
+            return k + anz_neu if k >= anz_auftraege_vorher else k
+
+        self.x = {(m, verschieben(i), verschieben(j)): var for (m, i, j), var in self.x.items()}
+        self.ein = {(m, verschieben(k)): var for (m, k), var in self.ein.items()}
+        self.aus = {(m, verschieben(k)): var for (m, k), var in self.aus.items()}
+        self.gradgleichungen = {(art, m, verschieben(k)): ct for (art, m, k), ct in self.gradgleichungen.items()}
+
+        self.start_zeit[anz_auftraege_vorher:anz_auftraege_vorher] = [
+            mdl.integer_var(ub=int(self.START_MAX[k]), name="Startzeit_{}".format(self.wegpunkt_name(k)))
+            for k in neue]
+
+        self.fahrten_hinzufuegen(self.zulaessige_fahrten_ermitteln(neue))
+        self.auftraege_hinzufuegen(neue)
+        self.zielfunktion_setzen()
+
+        self.replanning_fixieren(replanning_daten, anz_auftraege_vorher)
+
+    def route_terminieren(self, route: List[int], fixiert: Dict[int, int] = None):
+        """Berechnet die frühesten Startzeiten entlang einer Route
+
+        :param route: List[int] (Wegpunkte vom Depot über die Aufträge zurück ins Depot)
+        :param fixiert: Dict[int, int] (bereits feststehende Startzeiten einzelner Aufträge)
+        :return: tuple (Dict Auftrag -> Startzeit, Ankunftszeit im Depot, bool ob H_max eingehalten wird)
+        """
+        fixiert = fixiert or {}
+        startzeiten = {}
+        zeit = 0
+        zulaessig = True
+        for vorher, k in zip(route[:-1], route[1:]):
+            ankunft = zeit + self.AUFTRAGSDAUER[vorher] + self.DISTANZMATRIX[vorher][k]
+            if k >= self.ANZ_AUFTRAEGE:
+                return startzeiten, ankunft, zulaessig and ankunft <= self.H_max
+            zeit = fixiert.get(k, max(ankunft, self.FRUESTER_START[k], 1))
+            zulaessig = zulaessig and ankunft <= zeit and zeit + self.AUFTRAGSDAUER[k] <= self.H_max
+            startzeiten[k] = int(zeit)
+        return startzeiten, zeit, zulaessig
+
+    def guenstigste_einfuegung(self, routen: Dict[int, List[int]], auftrag: int, fixiert: Dict[int, int] = None):
+        """Fügt einen Auftrag an der Stelle mit dem geringsten Umweg in eine der Routen ein
+
+        Eingefügt wird nur hinter bereits fixierten Aufträgen und nur, wenn die Route danach H_max einhält.
+
+        :param routen: Dict[int, List[int]] (Routen pro Techniker, werden verändert)
+        :param auftrag: int (Index des Auftrags)
+        :param fixiert: Dict[int, int] (bereits feststehende Startzeiten einzelner Aufträge)
+        :return: bool (True, wenn der Auftrag eingefügt werden konnte)
+        """
+        fixiert = fixiert or {}
+        d = self.DISTANZMATRIX
+        beste = None
+        for m in self.techniker_fuer_auftrag(auftrag):
+            depot = m + self.ANZ_AUFTRAEGE
+            route = routen.get(m, [depot, depot])
+            erste = 1 + max([p for p, k in enumerate(route) if k in fixiert], default=0)
+            for p in range(erste, len(route)):
+                umweg = d[route[p - 1]][auftrag] + d[auftrag][route[p]] - d[route[p - 1]][route[p]]
+                if beste is not None and umweg >= beste[0]:
+                    continue
+                kandidat = route[:p] + [auftrag] + route[p:]
+                if self.route_terminieren(kandidat, fixiert)[2]:
+                    beste = (umweg, m, kandidat)
+        if beste is None:
+            return False
+        routen[beste[1]] = beste[2]
+        return True
+
+    def mip_start_setzen(self, vorplan: Dict[int, List[int]], replanning_daten, anz_auftraege_vorher: int):
+        """Übergibt dem Solver den vorherigen Plan, ergänzt um die neuen Aufträge, als MIP-Start
+
+        Die Routen werden auf die neuen Depotindizes umgerechnet, neue Aufträge an der günstigsten Stelle eingefügt
+        und die Startzeiten ab den fixierten Aufträgen vorwärts berechnet.
+
+        :param vorplan: Dict[int, List[int]] (fahrten_pro_techniker_sortiert der vorherigen Lösung)
+        :param replanning_daten: ReplanningDaten (bereits ausgeführte Fahrten und Startzeiten)
+        :param anz_auftraege_vorher: int (Anzahl der Aufträge, auf die sich vorplan bezieht)
+        """
+        def verschieben(k):
+            return k + self.ANZ_AUFTRAEGE - anz_auftraege_vorher if k >= anz_auftraege_vorher else k
 
-        # Ein Auftrag besucht sich nicht selbst
-        mdl.add_constraints(
-            x[(m, i, i)] == 0
-            for m in r_techniker
-            for i in r_auftraege
-        )
+        fixiert = {i: int(replanning_daten.start_zeit[i]) for i in range(anz_auftraege_vorher)
+                   if replanning_daten.start_zeit[i] != 0}
+        routen = {m: [verschieben(k) for k in route] for m, route in vorplan.items()}
+        for auftrag in range(anz_auftraege_vorher, self.ANZ_AUFTRAEGE):
+            self.guenstigste_einfuegung(routen, auftrag, fixiert)
 
-        # Defaultwert für Technikerstart
-        mdl.add_constraints(
-            start_zeit[m + self.ANZ_AUFTRAEGE] == 0
-            for m in r_techniker
-        )
+        self.mdl.clear_mip_starts()
+        self.mdl.add_mip_start(self.loesung_aus_routen(routen, fixiert), effort_level=EffortLevel.Repair)
 
-        # Zeitconstraints, Startzeiten müssen der Route entsprechen
-        [
-            mdl.add_if_then(
-                x[(m, i, j)] == 1,
-                start_zeit[j] >= (start_zeit[i] + self.AUFTRAGSDAUER[i] + self.DISTANZMATRIX[i][j])
-            )
-            for m in r_techniker
-            for i in r_wegpunkte
-            for j in r_auftraege
-            if i != j
-        ]
-
-        # Skill constraint
-        mdl.add_constraints(
-            self.AUFTRAG_BRAUCHT_SKILL[i][s] - (1 - x[(m, i, j)]) <= self.TECHNIKER_HAT_SKILL[m][s]
-            for m in r_techniker
-            for i in r_auftraege
-            for j in r_wegpunkte
-            for s in r_skills
-        )
+    def loesung_aus_routen(self, routen: Dict[int, List[int]], fixiert: Dict[int, int] = None) -> SolveSolution:
+        """Übersetzt Routen in Werte für alle Variablen des Modells
 
-        # Setze vorberechnete Replanning-Daten als constraint fix
-        if replanning_daten:
-            self.REPLANNED = True
+        Wird für den MIP-Start verwendet und von benchmark.py als Ersatz für eine CPLEX-Lösung.
+
+        :param routen: Dict[int, List[int]] (Wegpunkte pro Techniker vom Depot zurück ins Depot)
+        :param fixiert: Dict[int, int] (bereits feststehende Startzeiten einzelner Aufträge)
+        :return: SolveSolution
+        """
+        werte = {var: 0 for var in self.x.values()}
+        werte.update({var: 0 for var in self.start_zeit})
+        werte.update({var: 0 for var in self.ein.values()})
+        werte.update({var: 0 for var in self.aus.values()})
+        werte.update({var: 0 for var in self.y.values()})
+        werte.update({var: 0 for var in self.z.values()})
+        for m, route in routen.items():
+            for (i, j) in zip(route[:-1], route[1:]):
+                if self.formulierung == "zweiindex":
+                    if (i, j) in self.y:
+                        werte[self.y[(i, j)]] = 1
+                    if (j, m) in self.z:
+                        werte[self.z[(j, m)]] = 1
+                elif (m, i, j) in self.x:
+                    werte[self.x[(m, i, j)]] = 1
+                    werte[self.aus[(m, i)]] += 1
+                    werte[self.ein[(m, j)]] += 1
+            for k, zeit in self.route_terminieren(route, fixiert)[0].items():
+                werte[self.start_zeit[k]] = zeit
+        return SolveSolution(self.mdl, werte)
+
+    def fahrten_hinzufuegen(self, fahrten: List[tuple]):
+        """Legt Variablen und Constraints für die gegebenen Fahrten an
+
+        :param fahrten: List[tuple] (Indextripel (Techniker, von Wegpunkt, zu Wegpunkt), noch nicht im Modell)
+        """
+        mdl = self.mdl
+        x = self.x
+        self.x.update(mdl.binary_var_dict(
+            fahrten, name=lambda f: "Fahrt_{}_{}_{}".format(f[0], self.wegpunkt_name(f[1]), self.wegpunkt_name(f[2]))))
+
+        def depot(m):
+            return m + self.ANZ_AUFTRAEGE
+
+        # Zähler für Fahrten in einen bzw. aus einem Wegpunkt anlegen oder ergänzen
+        neu_aus: Dict[tuple, list] = {}  # (m, i) -> Fahrten, die von Wegpunkt i ausgehen
+        neu_ein: Dict[tuple, list] = {}  # (m, j) -> Fahrten, die in Wegpunkt j enden
+        for (m, i, j) in fahrten:
+            neu_aus.setdefault((m, i), []).append(x[(m, i, j)])
+            neu_ein.setdefault((m, j), []).append(x[(m, i, j)])
+
+        for (m, k) in set(neu_aus) | set(neu_ein):
+            if (m, k) in self.aus:
+                for art, neue_fahrten in (("aus", neu_aus), ("ein", neu_ein)):
+                    ausdruck = self.gradgleichungen[(art, m, k)].left_expr
+                    for var in neue_fahrten.get((m, k), []):
+                        ausdruck.add_term(var, 1)
+            else:
+                # Fährt maximal einmal von einem Wegpunkt los, maximal einmal nach Hause
+                self.aus[(m, k)] = mdl.integer_var(ub=1, name="Aus_{}_{}".format(m, self.wegpunkt_name(k)))
+                self.ein[(m, k)] = mdl.integer_var(ub=1 if k == depot(m) else None,
+                                                      name="Ein_{}_{}".format(m, self.wegpunkt_name(k)))
+                for art, zaehler, neue_fahrten in (("aus", self.aus, neu_aus), ("ein", self.ein, neu_ein)):
+                    ausdruck = mdl.linear_expr()
+                    for var in neue_fahrten.get((m, k), []):
+                        ausdruck.add_term(var, 1)
+                    ausdruck.add_term(zaehler[(m, k)], -1)
+                    self.gradgleichungen[(art, m, k)] = mdl.add_constraint(ausdruck == 0)
+
+        start_zeit = self.start_zeit
+        ein = self.ein
+        aus = self.aus
+        for (m, i, j) in fahrten:
+            if j < self.ANZ_AUFTRAEGE:
+                # Beginnt die Route im eigenen Depot
+                mdl.add_constraint(x[(m, i, j)] <= aus[(m, depot(m))])
+
+                # Endet die Route im eigenen Depot
+                mdl.add_constraint(x[(m, i, j)] <= ein[(m, depot(m))] - x.get((m, i, depot(m)), 0))
+
+                # Zeitconstraints, Startzeiten müssen der Route entsprechen
+                self.zeitfolge_hinzufuegen(x[(m, i, j)], i, j)
+
+                # Wenn er von einem Auftrag wegfährt, dann muss er dort auch hingefahren sein
+                if i < self.ANZ_AUFTRAEGE:
+                    mdl.add_constraint(x[(m, i, j)] <= ein[(m, i)] - x.get((m, j, i), 0))
+            else:
+                # Wenn er von einem Auftrag ins Depot fährt, dann muss er dort auch hingefahren sein
+                mdl.add_constraint(x[(m, i, j)] <= ein[(m, i)])
+
+                # Wenn eine Fahrt von einem Auftrag zu einem Depot stattfindet, dann muss die Ankunftszeit vor H_max
+                # liegen
+                self.rueckkehr_hinzufuegen(x[(m, i, j)], i, j)
+
+                # Strafkosten für verspätetet zurückgekehrte Techniker, linearisiert: die Hilfsvariable entspricht
+                # max(0, start_zeit[i] + AUFTRAGSDAUER[i], DISTANZMATRIX[i][j] - H), wenn die Fahrt angetreten wird,
+                # sonst 0
+                strafzeit = mdl.continuous_var(name="Strafzeit_{}_{}".format(m, self.wegpunkt_name(i)))
+                mdl.add_constraint(
+                    strafzeit >= start_zeit[i] + self.AUFTRAGSDAUER[i] - self.H_max * (1 - x[(m, i, j)]))
+                mdl.add_constraint(strafzeit >= (self.DISTANZMATRIX[i][j] - self.H) * x[(m, i, j)])
+                self.kpi_terme["Strafkosten Techniker"].append(strafzeit * self.STRAFE_TECHNIKER[m])
+
+            # Transportkosten
+            self.kpi_terme["Transportkosten"].append(x[(m, i, j)] * self.DISTANZMATRIX[i][j] * self.TRANSPORT_KOSTEN)
+
+    def zeitfolge_hinzufuegen(self, fahrt, i: int, j: int):
+        """Wird die Fahrt von i nach j angetreten, beginnt j frühestens nach Auftrag i und der Fahrzeit
+
+        Linearisiert mit Big-M aus der oberen Schranke der Startzeit von i (siehe vorpruefen): ohne Fahrt ist die
+        rechte Seite höchstens 0 und die Bedingung damit immer erfüllt.
+
+        :param fahrt: Var (Binärvariable der Fahrt)
+        :param i: int (von Wegpunkt)
+        :param j: int (zu Auftrag)
+        """
+        start_zeit = self.start_zeit
+        dauer = self.AUFTRAGSDAUER[i] + self.DISTANZMATRIX[i][j]
+        gross_m = start_zeit[i].ub + dauer
+        self.mdl.add_constraint(start_zeit[j] >= start_zeit[i] + dauer - gross_m * (1 - fahrt))
+
+    def rueckkehr_hinzufuegen(self, fahrt, i: int, depot: int):
+        """Wird die Fahrt von Auftrag i ins Depot angetreten, muss der Techniker vor H_max zurück sein
+
+        Linearisiert wie zeitfolge_hinzufuegen. Lässt schon die obere Schranke der Startzeit von i eine rechtzeitige
+        Rückkehr zu, entfällt die Bedingung.
 
-            mdl.add_constraints(
-                start_zeit[i] == replanning_daten.start_zeit[i]
-                for i in range(self.ANZ_AUFTRAEGE - 1)
-                if replanning_daten.start_zeit[i] != 0
+        :param fahrt: Var (Binärvariable der Fahrt)
+        :param i: int (Auftrag)
+        :param depot: int (Wegpunkt des Depots)
+        """
+        start_zeit = self.start_zeit
+        dauer = self.AUFTRAGSDAUER[i] + self.DISTANZMATRIX[i][depot]
+        gross_m = start_zeit[i].ub + dauer - self.H_max
+        if gross_m > 0:
+            self.mdl.add_constraint(start_zeit[i] + dauer <= self.H_max + gross_m * (1 - fahrt))
+
+    def auftraege_hinzufuegen(self, auftraege):
+        """Legt die Constraints und KPI-Terme an, die sich auf einzelne Aufträge beziehen
+
+        :param auftraege: Iterable[int] (Indizes der Aufträge)
+        """
+        mdl = self.mdl
+        start_zeit = self.start_zeit
+        for i in auftraege:
+            angefahren = self.anfahrten(i)
+
+            if angefahren:
+                # Startzeit eines Auftrags muss nach frühestem Startpunkt liegen, verschärft durch die kürzeste Anfahrt
+                # aus vorpruefen
+                mdl.add_if_then(
+                    mdl.sum(angefahren) >= 1,
+                    self.START_MIN[i] <= start_zeit[i]
+                )
+
+                # Jeder Auftrag mit positiver Startzeit muss angefahren worden sein
+                mdl.add_if_then(
+                    start_zeit[i] >= 1,
+                    mdl.sum(angefahren) == 1
+                )
+            else:
+                # Kein Techniker erreicht den Auftrag, er bleibt unerledigt
+                start_zeit[i].ub = 0
+
+            # Startzeit und Auftragsdauer müssen vor H_max enden
+            mdl.add_constraint(start_zeit[i] + self.AUFTRAGSDAUER[i] <= self.H_max)
+
+            # Strafkosten für verspätetet erledigte Aufträge
+            self.kpi_terme["Strafkosten Auftrag verspätet"].append(
+                mdl.max(0, start_zeit[i] + self.AUFTRAGSDAUER[i] - self.SPAETESTES_ENDE[i]) * self.STRAFE_AUFTRAG[i]
             )
 
-            mdl.add_constraints(
-                x[(m, i, j)] == replanning_daten.x[m][i][j]
-                for m in r_techniker
-                for i in range(self.ANZ_AUFTRAEGE - 1)
-                for j in range(self.ANZ_AUFTRAEGE - 1)
-                if replanning_daten.x[m][i][j] != 0
+            # Strafkosten für unerledigte Aufträge
+            self.kpi_terme["Strafkosten Auftrag unerfüllter"].append(
+                mdl.max((1 - start_zeit[i]) * 10000, 0) * self.STRAFE_AUFTRAG[i]
             )
-        else:
-            self.REPLANNED = False
 
-        # Speichere Modell
-        self.x = x
-        self.start_zeit = start_zeit
-        self.mdl = mdl
+    def anfahrten(self, i: int) -> list:
+        """Variablen, deren Summe angibt, ob Auftrag i angefahren wird (1) oder nicht (0)
+
+        :param i: int (Index des Auftrags)
+        :return: list (ein[(m, i)] bzw. bei "zweiindex" z[(i, m)] aller Techniker, die i übernehmen können)
+        """
+        if self.formulierung == "zweiindex":
+            return [self.z[(i, m)] for m in range(self.ANZ_TECHNIKER) if (i, m) in self.z]
+        return [self.ein[(m, i)] for m in range(self.ANZ_TECHNIKER) if (m, i) in self.ein]
+
+    def zweiindex_fahrten_ermitteln(self) -> List[tuple]:
+        """Ermittelt alle Fahrten (i, j) der Formulierung "zweiindex"
+
+        Zwischen zwei Aufträgen gibt es eine Fahrt, wenn mindestens ein Techniker beide erreicht und die Fahrt
+        zeitlich antreten kann (siehe zulaessige_fahrten_ermitteln). Vom und zum Depot eines Technikers gibt es nur
+        Fahrten zu Aufträgen, die er erreicht, zwischen Depots keine.
+
+        :return: List[tuple] (Indexpaare (von Wegpunkt, zu Wegpunkt))
+        """
+        anz = self.ANZ_AUFTRAEGE
+        gemeinsam = np.zeros((anz, anz), dtype=bool)
+        fahrten = []
+        for m in range(self.ANZ_TECHNIKER):
+            knoten = np.append(np.flatnonzero(self.ERREICHBAR[m]), m + anz)
+            moeglich = self.zeitlich_moeglich(m, knoten)
+            gemeinsam[np.ix_(knoten[:-1], knoten[:-1])] |= moeglich[:-1, :-1]
+            fahrten.extend((int(knoten[-1]), int(k)) for k in knoten[:-1][moeglich[-1, :-1]])
+            fahrten.extend((int(k), int(knoten[-1])) for k in knoten[:-1][moeglich[:-1, -1]])
+        np.fill_diagonal(gemeinsam, False)
+        return [(int(i), int(j)) for i, j in np.argwhere(gemeinsam)] + fahrten
+
+    def zweiindex_aufstellen(self):
+        """Kompakte Formulierung mit Fahrten y[(i, j)] ohne Technikerindex und Zuordnungen z[(k, m)]
+
+        Statt ANZ_TECHNIKER * ANZ_WEGPUNKTE² Fahrtvariablen gibt es nur eine pro Wegpunktpaar und eine Zuordnung pro
+        Auftrag und Techniker. Welcher Techniker eine Route fährt, ergibt sich aus dem Depot, in dem sie beginnt und
+        endet: Fahrten aus und in Depot m sind nur zu Aufträgen möglich, die m zugeordnet sind, und entlang einer
+        Fahrt zwischen zwei Aufträgen muss die Technikernummer sum(m * z[(k, m)]) gleich bleiben. Kurzzyklen ohne
+        Depot schließen wie bei "dreiindex" die Zeitconstraints aus.
+
+        Strafzeiten und Transportkosten entsprechen "dreiindex", die KPIs sind damit vergleichbar.
+        """
+        mdl = self.mdl
+        start_zeit = self.start_zeit
+        fahrten = self.zweiindex_fahrten_ermitteln()
+        self.y = mdl.binary_var_dict(
+            fahrten, name=lambda f: "Fahrt_{}_{}".format(self.wegpunkt_name(f[0]), self.wegpunkt_name(f[1])))
+        self.z = mdl.binary_var_dict(
+            [(k, m) for m, k in np.argwhere(self.ERREICHBAR).tolist()],
+            name=lambda zuordnung: "Zuordnung_{}_{}".format(zuordnung[0], zuordnung[1]))
+        y = self.y
+        z = self.z
+
+        def depot(m):
+            return m + self.ANZ_AUFTRAEGE
+
+        aus: Dict[int, list] = {}
+        ein: Dict[int, list] = {}
+        for (i, j) in fahrten:
+            aus.setdefault(i, []).append(y[(i, j)])
+            ein.setdefault(j, []).append(y[(i, j)])
+
+        # Jeder Auftrag hat höchstens einen Techniker und wird genau dann einmal angefahren und verlassen
+        technikernummer = {}
+        for k in range(self.ANZ_AUFTRAEGE):
+            zuordnungen = self.anfahrten(k)
+            if not zuordnungen:
+                continue
+            mdl.add_constraint(mdl.sum(zuordnungen) <= 1)
+            mdl.add_constraint(mdl.sum(ein.get(k, [])) == mdl.sum(zuordnungen))
+            mdl.add_constraint(mdl.sum(aus.get(k, [])) == mdl.sum(zuordnungen))
+            technikernummer[k] = mdl.sum(m * z[(k, m)] for m in range(self.ANZ_TECHNIKER) if (k, m) in z)
+
+        # Jeder Techniker fährt höchstens eine Route, die in seinem Depot beginnt und endet
+        for m in range(self.ANZ_TECHNIKER):
+            if depot(m) in aus:
+                mdl.add_constraint(mdl.sum(aus[depot(m)]) <= 1)
+                mdl.add_constraint(mdl.sum(ein[depot(m)]) == mdl.sum(aus[depot(m)]))
+
+        max_nummer = self.ANZ_TECHNIKER - 1
+        for (i, j) in fahrten:
+            if i >= self.ANZ_AUFTRAEGE:
+                # Route beginnt im Depot des zugeordneten Technikers
+                mdl.add_constraint(y[(i, j)] <= z[(j, i - self.ANZ_AUFTRAEGE)])
+            elif j >= self.ANZ_AUFTRAEGE:
+                m = j - self.ANZ_AUFTRAEGE
+                # Route endet im Depot des zugeordneten Technikers
+                mdl.add_constraint(y[(i, j)] <= z[(i, m)])
+
+                # Rückkehr vor H_max und Strafkosten für verspätet zurückgekehrte Techniker wie in fahrten_hinzufuegen
+                self.rueckkehr_hinzufuegen(y[(i, j)], i, j)
+                strafzeit = mdl.continuous_var(name="Strafzeit_{}_{}".format(m, self.wegpunkt_name(i)))
+                mdl.add_constraint(
+                    strafzeit >= start_zeit[i] + self.AUFTRAGSDAUER[i] - self.H_max * (1 - y[(i, j)]))
+                mdl.add_constraint(strafzeit >= (self.DISTANZMATRIX[i][j] - self.H) * y[(i, j)])
+                self.kpi_terme["Strafkosten Techniker"].append(strafzeit * self.STRAFE_TECHNIKER[m])
+            else:
+                # Beide Aufträge gehören zum selben Techniker
+                mdl.add_constraint(technikernummer[j] - technikernummer[i] <= max_nummer * (1 - y[(i, j)]))
+                mdl.add_constraint(technikernummer[i] - technikernummer[j] <= max_nummer * (1 - y[(i, j)]))
 
-    def solve_model(self, timeout: int = 120):
+            if j < self.ANZ_AUFTRAEGE:
+                # Zeitconstraints, Startzeiten müssen der Route entsprechen
+                self.zeitfolge_hinzufuegen(y[(i, j)], i, j)
+
+            # Transportkosten
+            self.kpi_terme["Transportkosten"].append(y[(i, j)] * self.DISTANZMATRIX[i][j] * self.TRANSPORT_KOSTEN)
+
+    def techniker_klassen(self) -> List[List[int]]:
+        """Ermittelt Gruppen gleichwertiger Techniker
+
+        Techniker sind gleichwertig, wenn sie dieselben Skills und dieselbe Strafe haben und ihre Depots von allen
+        Aufträgen gleich weit entfernt sind. Jede Permutation ihrer Routen ergibt dann einen gleich guten Plan.
+
+        :return: List[List[int]] (Gruppen mit mindestens zwei Technikern, aufsteigend sortiert)
+        """
+        depots = np.arange(self.ANZ_TECHNIKER) + self.ANZ_AUFTRAEGE
+        merkmale = np.column_stack((self.TECHNIKER_HAT_SKILL, self.STRAFE_TECHNIKER,
+                                    self.DISTANZMATRIX[depots, :self.ANZ_AUFTRAEGE],
+                                    self.DISTANZMATRIX[:self.ANZ_AUFTRAEGE, depots].T))
+        gruppen: Dict[bytes, List[int]] = {}
+        for m in range(self.ANZ_TECHNIKER):
+            gruppen.setdefault(np.ascontiguousarray(merkmale[m]).tobytes(), []).append(m)
+        return [gruppe for gruppe in gruppen.values() if len(gruppe) > 1]
+
+    def symmetrie_brechen(self):
+        """Legt die Reihenfolge gleichwertiger Techniker fest (siehe techniker_klassen)
+
+        Innerhalb einer Gruppe werden die Routen nach ihrem kleinsten Auftragsindex sortiert: Übernimmt ein Techniker
+        Auftrag k, muss sein Vorgänger in der Gruppe einen Auftrag mit kleinerem Index übernehmen. Damit fährt auch
+        ein Techniker nur, wenn sein Vorgänger fährt. Jeder Plan lässt sich durch Tauschen der Routen in diese Form
+        bringen, es geht also keine Lösung verloren.
+        """
+        klassen = self.techniker_klassen()
+        for klasse in klassen:
+            for vorgaenger, m in zip(klasse[:-1], klasse[1:]):
+                bisher = []  # Anfahrten des Vorgängers zu Aufträgen mit kleinerem Index
+                for k in range(self.ANZ_AUFTRAEGE):
+                    bedient = self.anfahrt(m, k)
+                    if bedient is not None:
+                        self.symmetrie_constraints.append(self.mdl.add_constraint(
+                            bedient <= self.mdl.sum(bisher), ctname="Symmetrie_{}_{}".format(m, k)))
+                    bedient_vorgaenger = self.anfahrt(vorgaenger, k)
+                    if bedient_vorgaenger is not None:
+                        bisher.append(bedient_vorgaenger)
+
+        self.symmetrie = {"klassen": len(klassen), "techniker": sum(len(klasse) for klasse in klassen),
+                          "constraints": len(self.symmetrie_constraints)}
+
+    def anfahrt(self, m: int, k: int):
+        """Variable, die angibt, ob Techniker m Auftrag k übernimmt, oder None, wenn er es nicht kann
+
+        :param m: int (Techniker)
+        :param k: int (Auftrag)
+        """
+        if self.formulierung == "zweiindex":
+            return self.z.get((k, m))
+        return self.ein.get((m, k))
+
+    def zielfunktion_setzen(self):
+        """Setzt die KPIs und die gewichtete Zielfunktion aus den gesammelten KPI-Termen"""
+        mdl = self.mdl
+        mdl.clear_kpis()
+        kpis = {}
+        for name in self.KPI_NAMEN:
+            kpis[name] = mdl.sum(self.kpi_terme[name])
+            mdl.add_kpi(kpis[name], name)
+
+        # Gewichteter Entscheidungsausdruck
+        mdl.minimize(
+            kpis["Strafkosten Auftrag verspätet"] * self.GEWICHT_STRAFE_AUFTRAG +
+            kpis["Strafkosten Techniker"] * self.GEWICHT_STRAFE_TECHNIKER +
+            self.GEWICHT_STRAFE_AUFTRAG_UNERFUELLT * kpis["Strafkosten Auftrag unerfüllter"]
+        )
+
+    def replanning_fixieren(self, replanning_daten, anz_auftraege_vorher: int):
+        """Setzt vorberechnete Replanning-Daten als Variablenschranken fix
+
+        :param replanning_daten: ReplanningDaten (oder None, dann wird nicht fixiert)
+        :param anz_auftraege_vorher: int (Anzahl der Aufträge, auf die sich die Replanning-Daten beziehen)
+        """
+        self.fixierung_merken(replanning_daten, anz_auftraege_vorher)
+        if replanning_daten:
+            for i in range(anz_auftraege_vorher):
+                if replanning_daten.start_zeit[i] != 0:
+                    self.start_zeit[i].lb = replanning_daten.start_zeit[i]
+                    self.start_zeit[i].ub = replanning_daten.start_zeit[i]
+
+            for (m, i, j) in np.argwhere(replanning_daten.x[:, :anz_auftraege_vorher, :anz_auftraege_vorher]):
+                if self.formulierung == "zweiindex":
+                    self.y[(i, j)].lb = 1
+                else:
+                    self.x[(m, i, j)].lb = 1
+
+            # Bereits angefahrene Aufträge bleiben bei ihrem Techniker
+            if self.formulierung == "zweiindex":
+                for m, route in self.fixierte_routen.items():
+                    for k in route:
+                        self.z[(k, m)].lb = 1
+
+    def fixierung_merken(self, replanning_daten, anz_auftraege_vorher: int):
+        """Merkt sich die bereits ausgeführten Aufträge als feste Startzeiten und feste Routenanfänge
+
+        Wird von replanning_fixieren für das MIP und von replanning_vorbereiten für die Heuristik verwendet.
+
+        :param replanning_daten: ReplanningDaten (oder None, dann wird nichts fixiert)
+        :param anz_auftraege_vorher: int (Anzahl der Aufträge, auf die sich die Replanning-Daten beziehen)
+        """
+        self.fixierte_startzeiten = {}
+        self.fixierte_routen = {}
+        self.REPLANNED = bool(replanning_daten)
+        if not replanning_daten:
+            return
+
+        start_zeit = np.asarray(replanning_daten.start_zeit[:anz_auftraege_vorher])
+        for i in np.flatnonzero(start_zeit).tolist():
+            self.fixierte_startzeiten[i] = int(start_zeit[i])
+            # Der Techniker ergibt sich aus der bereits angetretenen Fahrt zum Auftrag
+            m = int(np.argmax(replanning_daten.x[:, :, i].any(axis=1)))
+            self.fixierte_routen.setdefault(m, []).append(i)
+        for route in self.fixierte_routen.values():
+            route.sort(key=self.fixierte_startzeiten.get)
+
+    def replanning_vorbereiten(self, replanning_daten, neuer_auftrag: Auftrag = None,
+                               neue_auftraege: List[Auftrag] = None):
+        """Bereitet ein Replanning für Lösungsverfahren ohne Modell vor (siehe ENGINES)
+
+        :param replanning_daten: ReplanningDaten (bereits ausgeführte Fahrten und Startzeiten)
+        :param neuer_auftrag: Auftrag (zusätzlicher Auftrag für das Replanning)
+        :param neue_auftraege: List[Auftrag] (mehrere zusätzliche Aufträge, siehe modell_aus_daten_aufstellen)
+        """
+        anz_auftraege_vorher = self.ANZ_AUFTRAEGE
+        neue_auftraege = self.neue_auftraege_sammeln(neuer_auftrag, neue_auftraege)
+        if neue_auftraege:
+            self.auftraege_anfuegen(neue_auftraege)
+        self.fixierung_merken(replanning_daten, anz_auftraege_vorher)
+
+    def solve_model(self, timeout: int = 120, engine: str = "mip", zwischenstand: Callable = None, abbruch=None):
         """Startet den Solver
 
+        Mit engine="heuristik" wird statt CPLEX die Einfügeheuristik aus heuristik.py verwendet, mit engine="alns"
+        wird deren Ergebnis zusätzlich bis zum timeout durch ALNS verbessert. Mit engine="cp" wird das Scheduling-Modell
+        aus cp_modell.py mit CP Optimizer gelöst. Dafür muss kein Modell aufgestellt sein, beim Replanning genügt
+        replanning_vorbereiten.
+
         :param timeout: int (timeout in s, nach dem die Optimierung abgebrochen wird)
+        :param engine: str (Lösungsverfahren, siehe ENGINES)
+        :param zwischenstand: Callable (optional, nur beim MIP: wird mit jeder verbesserten Zwischenlösung aufgerufen
+            und kann die Suche beenden, siehe Zwischenstand)
+        :param abbruch: threading.Event (optional, nur beim MIP: die Suche endet, sobald es gesetzt ist)
         """
-        self.mdl.set_time_limit(timeout)
-        self.mdl.solve()
+        if engine not in self.ENGINES:
+            raise ValueError("Unbekannte Engine '{}', erlaubt sind {}".format(engine, self.ENGINES))
+
+        self.engine = engine
+
+        if engine in ("heuristik", "alns"):
+            self.solution = None
+            with self.zeitmessung("loesen"):
+                bewertung = heuristik.Bewertung(self)
+                routen = heuristik.konstruieren(self, bewertung)
+                if engine == "alns":
+                    routen = heuristik.ALNS(self, bewertung, seed=self.SEED).verbessern(routen, timeout)
+            with self.zeitmessung("dekodieren"):
+                self.plan_uebernehmen(routen)
+            return
+
+        if engine == "cp":
+            self.solution = None
+            with self.zeitmessung("loesen"):
+                routen, self.cp_details = cp_modell.loesen(self, timeout)
+            self.geloest = routen is not None
+            if self.geloest:
+                with self.zeitmessung("dekodieren"):
+                    self.plan_uebernehmen(routen)
+            return
+
+        with self.zeitmessung("loesen"):
+            self.mdl.set_time_limit(timeout)
+            if zwischenstand or abbruch:
+                melder = Zwischenstand(self, zwischenstand, abbruch)
+                self.mdl.add_progress_listener(melder)
+                try:
+                    self.mdl.solve()
+                finally:
+                    self.mdl.remove_progress_listener(melder)
+            else:
+                self.mdl.solve()
         self.solution = self.mdl.solution
+        self.geloest = self.solution is not None
 
         # Datenaufbereitung zur einfacheren Verwendung
         if self.solution:
-            solution_dict = self.solution.as_dict()
-
-            # Fahrten pro Techniker zugreifbar machen
-            fahrten_pro_techniker: Dict[int, List] = {}
-            for m in range(self.ANZ_TECHNIKER):
-                for i in range(self.ANZ_WEGPUNKTE):
-                    for j in range(self.ANZ_WEGPUNKTE):
-                        if 'Fahrt_{}_{}_{}'.format(m, i, j) in solution_dict:
-                            if m in fahrten_pro_techniker:
-                                fahrten_pro_techniker[m].append((i, j))
-                            else:
-                                fahrten_pro_techniker[m] = [(i, j)]
-
-            # Fahrten pro Techniker in korrekter Reihenfolge ausgeben
-            self.fahrten_pro_techniker_sortiert = {}
-            for techniker, fahrten in fahrten_pro_techniker.items():
-                current_node = techniker + self.ANZ_AUFTRAEGE
-                self.fahrten_pro_techniker_sortiert[techniker] = [current_node]
-                while True:
-                    next_node = None
-                    i = 0
-                    while (next_node is None):
-                        if fahrten[i][0] == current_node:
-                            next_node = fahrten[i][1]
-                        else:
-                            i = i + 1
-
-                    self.fahrten_pro_techniker_sortiert[techniker].append(next_node)
-                    current_node = next_node
-                    if (current_node == techniker + self.ANZ_AUFTRAEGE):
-                        break
-
-            # Überprüfe, ob alle Fahrten angetreten wurden
-            self.alle_auftraege_erledigt = set(["Startzeit_{}".format(i) for i in range(self.ANZ_AUFTRAEGE)]).issubset(
-                set(self.solution.as_dict().keys()))
-
-            # Ermittle unerledigte Aufträge
-            self.unerledigte_auftraege = []
-            if not self.alle_auftraege_erledigt:
-                restauftraege = [item for item in set(["Startzeit_{}".format(i) for i in range(self.ANZ_AUFTRAEGE)]) if
-                                 item not in set(self.solution.as_dict().keys())]
-                for auftrag in restauftraege:
-                    self.unerledigte_auftraege.append(int(auftrag[10:]))
+            with self.zeitmessung("dekodieren"):
+                self.fahrten_pro_techniker_sortiert, self.startzeiten, self.unerledigte_auftraege = \
+                    self.loesung_dekodieren(self.solution)
+            self.alle_auftraege_erledigt = len(self.unerledigte_auftraege) == 0
+
+    def solver_details(self) -> dict:
+        """Kennzahlen des letzten Lösungslaufs
+
+        :return: dict (engine, Status, einheitliche Kosten (siehe plan_kosten) und Modellgröße; beim MIP zusätzlich Gap,
+            Knoten, Iterationen und Solverzeit)
+        """
+        details = {"engine": self.engine, "geloest": self.geloest, "kosten": self.plan_kosten(),
+                   "unerledigte_auftraege": len(self.unerledigte_auftraege)}
+        if self.engine == "mip" and self.mdl is not None:
+            solve_details = self.mdl.solve_details
+            details.update(
+                status=solve_details.status if solve_details else None,
+                gap=solve_details.mip_relative_gap if solve_details and self.solution else None,
+                knoten=solve_details.nb_nodes_processed if solve_details else 0,
+                iterationen=solve_details.nb_iterations if solve_details else 0,
+                solverzeit=solve_details.time if solve_details else 0.0,
+                formulierung=self.formulierung,
+                vorpruefung=self.vorpruefung,
+                symmetrie=self.symmetrie,
+                variablen=self.mdl.number_of_variables,
+                constraints=self.mdl.number_of_constraints
+            )
+        elif self.engine == "cp":
+            details.update(self.cp_details)
+        elif self.engine == "portfolio":
+            details["portfolio"] = self.portfolio_details
+        elif self.engine == "zerlegung":
+            details["zerlegung"] = self.zerlegung_details
+        return details
+
+    def plan_uebernehmen(self, routen: Dict[int, List[int]]):
+        """Übernimmt Routen ohne Depots (z.B. aus heuristik.py) in dieselbe Form wie eine dekodierte MIP-Lösung
+
+        :param routen: Dict[int, List[int]] (Aufträge pro Techniker in Fahrtreihenfolge)
+        """
+        self.fahrten_pro_techniker_sortiert = {}
+        self.startzeiten = {k: 0 for k in range(self.ANZ_AUFTRAEGE)}
+        for m, auftraege in routen.items():
+            if not auftraege:
+                continue
+            depot = m + self.ANZ_AUFTRAEGE
+            route = [depot] + list(auftraege) + [depot]
+            self.fahrten_pro_techniker_sortiert[m] = route
+            self.startzeiten.update(self.route_terminieren(route, self.fixierte_startzeiten)[0])
+
+        self.unerledigte_auftraege = [k for k, zeit in self.startzeiten.items() if zeit < 1]
+        self.alle_auftraege_erledigt = len(self.unerledigte_auftraege) == 0
+        self.geloest = True
+
+    def routen_ohne_depots(self) -> Dict[int, List[int]]:
+        """Aktueller Plan als Aufträge pro Techniker, ohne Depots (Format von heuristik.py)"""
+        return {m: [k for k in route if k < self.ANZ_AUFTRAEGE]
+                for m, route in self.fahrten_pro_techniker_sortiert.items()}
+
+    def plan_kosten(self) -> float:
+        """Gewichtete Kosten des aktuellen Plans nach heuristik.Bewertung
+
+        Anders als der Zielfunktionswert des MIP für alle Lösungsverfahren gleich berechnet, Pläne aus mip, heuristik,
+        alns, cp und portfolio sind damit direkt vergleichbar.
+
+        :return: float (None, wenn kein Plan vorliegt)
+        """
+        if not self.geloest:
+            return None
+        return heuristik.Bewertung(self).gesamtkosten(self.routen_ohne_depots())
+
+    def kpi_werte(self) -> Dict[str, float]:
+        """KPI-Werte des aktuellen Plans
+
+        Die Werte werden für alle Lösungsverfahren einheitlich aus dem Plan berechnet (siehe heuristik.Bewertung),
+        damit sie vergleichbar sind.
+
+        :return: Dict[str, float] (Werte mit den Namen aus KPI_NAMEN)
+        """
+        return heuristik.Bewertung(self).kpis(self.routen_ohne_depots(), self.unerledigte_auftraege)
+
+    def loesung_dekodieren(self, solution: SolveSolution):
+        """Liest alle Variablenwerte einer Lösung in einem Durchgang aus und bereitet sie auf
+
+        :param solution: SolveSolution (Lösung oder Zwischenlösung des Modells)
+        :return: tuple (Routen pro Techniker, Startzeiten pro Auftrag, Liste der unerledigten Aufträge)
+        """
+        startwerte = np.rint(solution.get_values(self.start_zeit)).astype(int)
+        if self.formulierung == "zweiindex":
+            fahrten = self.zweiindex_dekodieren(solution)
+        else:
+            schluessel = np.array(list(self.x.keys()), dtype=int).reshape(-1, 3)
+            benutzt = np.asarray(solution.get_values(list(self.x.values()))) > 0.5
+            fahrten = schluessel[benutzt]
+
+        routen = self.routen_aus_fahrten(fahrten)
+        startzeiten = {i: int(startwerte[i]) for i in range(self.ANZ_AUFTRAEGE)}
+
+        # Ein Auftrag ohne positive Startzeit gilt als unerledigt
+        unerledigte_auftraege = np.flatnonzero(startwerte[:self.ANZ_AUFTRAEGE] < 1).tolist()
+        return routen, startzeiten, unerledigte_auftraege
+
+    def zweiindex_dekodieren(self, solution: SolveSolution) -> np.ndarray:
+        """Ergänzt die angetretenen Fahrten der Formulierung "zweiindex" um den Techniker
+
+        :param solution: SolveSolution
+        :return: np.ndarray (Zeilen (Techniker, von Wegpunkt, zu Wegpunkt) wie bei "dreiindex")
+        """
+        fahrten = np.array(list(self.y.keys()), dtype=int).reshape(-1, 2)
+        fahrten = fahrten[np.asarray(solution.get_values(list(self.y.values()))) > 0.5]
+        zuordnungen = np.array(list(self.z.keys()), dtype=int).reshape(-1, 2)
+        zuordnungen = zuordnungen[np.asarray(solution.get_values(list(self.z.values()))) > 0.5]
+
+        # Der Techniker einer Fahrt ist der des Auftrags, von dem sie ausgeht, bzw. der des Depots
+        techniker = np.full(self.ANZ_WEGPUNKTE, -1, dtype=int)
+        techniker[zuordnungen[:, 0]] = zuordnungen[:, 1]
+        techniker[self.ANZ_AUFTRAEGE:] = np.arange(self.ANZ_TECHNIKER)
+        return np.column_stack((techniker[fahrten[:, 0]], fahrten)).reshape(-1, 3)
+
+    def routen_aus_fahrten(self, fahrten: np.ndarray) -> Dict[int, List[int]]:
+        """Setzt angetretene Fahrten zu Routen zusammen, die im Depot beginnen und enden
+
+        :param fahrten: np.ndarray (Zeilen (Techniker, von Wegpunkt, zu Wegpunkt))
+        :return: Dict[int, List[int]] (Wegpunkte pro Techniker in Fahrtreihenfolge)
+        """
+        nachfolger = np.full((self.ANZ_TECHNIKER, self.ANZ_WEGPUNKTE), -1, dtype=int)
+        nachfolger[fahrten[:, 0], fahrten[:, 1]] = fahrten[:, 2]
+
+        routen = {}
+        for m in np.unique(fahrten[:, 0]).tolist():
+            depot = m + self.ANZ_AUFTRAEGE
+            route = [depot]
+            k = nachfolger[m, depot]
+            while k not in (-1, depot) and len(route) <= self.ANZ_WEGPUNKTE:
+                route.append(int(k))
+                k = nachfolger[m, k]
+            route.append(depot)
+            routen[m] = route
+        return routen
 
     def print_solution(self, print_stats=False, print_details=False, print_lp=False):
         """Gibt die Lösung auf der command line aus
         :param print_stats: bool (gibt erweiterte Informationen des Solvers aus)
         :param print_details: bool (gibt alle Lösungswerte und das Linearprogramm aus)
         """
-        if print_stats:
+        if print_stats and self.solution:
             print(self.mdl.get_solve_details())
-        if self.solution:
-            if print_details:
+        if self.geloest:
+            if print_details and self.solution:
                 print(self.solution)
-            if print_lp:
+            if print_lp and self.mdl:
                 print(self.mdl.export_as_lp_string())
 
             for techniker, fahrten in self.fahrten_pro_techniker_sortiert.items():
                 techniker_str = "Techniker {} fährt von seinem Depot ".format(techniker)
                 for fahrt in fahrten:
                     if fahrt != self.ANZ_AUFTRAEGE + techniker:
-                        techniker_str = techniker_str + "zu Auftrag {} (Startzeit: {}) ".format(fahrt,
-                                                                                                self.solution.as_dict()[
-                                                                                                    "Startzeit_{}".format(
-                                                                                                        fahrt)])
+                        techniker_str = techniker_str + "zu Auftrag {} (Startzeit: {}) ".format(
+                            fahrt, self.startzeiten[fahrt])
                 techniker_str = techniker_str + "und zurück zu seinem Depot."
                 print(techniker_str)
 
@@ -677,32 +1700,41 @@ Seed: {}
                 }
             )
 
-    def json_ausgabe(self):
+    def json_ausgabe(self, metriken: bool = False, felder=None):
         """Formatiert die Daten in JSON
 
+        Die großen Felder aus JSON_FELDER (Lösungstext, Distanzmatrix, Skillmatrizen) sind nur enthalten, wenn sie
+        über felder angefordert werden. Ohne Angabe von felder werden alle geliefert.
+
+        :param metriken: bool (fügt die bisherigen Phasenzeiten und die Solverdetails hinzu)
+        :param felder: List[str] (optional, anzufordernde Felder aus JSON_FELDER)
         :return: str (enthält in JSON kodierte Daten, die vom Webserver ausgeliefert werden)
         """
-        if self.solution:
-            start_zeit_geloest = self.solution.get_values(self.start_zeit[i] for i in range(self.ANZ_AUFTRAEGE))
-            startzeiten = {i: start_zeit_geloest[i] for i in range(self.ANZ_AUFTRAEGE)}
+        with self.zeitmessung("json_ausgabe"):
+            return self.json_erzeugen(metriken, self.JSON_FELDER if felder is None else felder)
 
+    def json_erzeugen(self, metriken: bool, felder) -> str:
+        if self.geloest:
             json_data = JsonAntwort(
                 solved=True,
-                distanzmatrix=self.DISTANZMATRIX.tolist(),
+                distanzmatrix=self.DISTANZMATRIX.tolist() if "distanzmatrix" in felder else None,
                 fruester_start=self.FRUESTER_START.tolist(),
                 auftragsdauer=self.AUFTRAGSDAUER.tolist(),
                 spaetestes_ende=self.SPAETESTES_ENDE.tolist(),
-                techniker_skills=self.TECHNIKER_HAT_SKILL.tolist(),
-                auftrag_skills=self.AUFTRAG_BRAUCHT_SKILL.tolist(),
+                techniker_skills=self.TECHNIKER_HAT_SKILL.tolist() if "skills" in felder else None,
+                auftrag_skills=self.AUFTRAG_BRAUCHT_SKILL.tolist() if "skills" in felder else None,
                 strafe_auftrag=self.STRAFE_AUFTRAG.tolist(),
                 strafe_techniker=self.STRAFE_TECHNIKER.tolist(),
                 seed=self.SEED,
                 alle_auftraege_erledigt=self.alle_auftraege_erledigt,
                 fahrten_pro_techniker_sortiert=self.fahrten_pro_techniker_sortiert,
-                startzeiten=startzeiten,
+                startzeiten=self.startzeiten,
                 unerledigte_auftraege=sorted(self.unerledigte_auftraege),
-                solution=str(self.solution),
-                replanned=self.REPLANNED
+                solution=(str(self.solution) if self.solution else "") if "solution" in felder else None,
+                replanned=self.REPLANNED,
+                # Nur vorhanden, wenn es solche Aufträge gibt (in der Regel neue Aufträge eines Replannings)
+                ohne_techniker=np.flatnonzero(~self.KOMPATIBEL.any(axis=0)).tolist() or None,
+                metriken={"zeiten": dict(self.zeiten), "solver": self.solver_details()} if metriken else None
             )
 
             return json_data.get_json()
@@ -722,19 +1754,17 @@ Seed: {}
         :param t: int (gewünschter Zeitpunkt, zu dem die Daten ermittelt werden sollen)
         :return: Replanning_Daten (enthält die Liste aller Fahrten und Startzeiten, die bereits erledigt wurden
         """
-        if self.solution:
+        if self.geloest:
             done_matrix = np.zeros((self.ANZ_TECHNIKER, self.ANZ_WEGPUNKTE, self.ANZ_WEGPUNKTE), dtype=bool)
             tatsaechliche_start_zeit = np.zeros(self.ANZ_AUFTRAEGE, dtype=int)
 
             for techniker, auftraege in self.fahrten_pro_techniker_sortiert.items():
                 letzter_auftrag = techniker + self.ANZ_AUFTRAEGE
                 for aktueller_auftrag in auftraege:
-                    if aktueller_auftrag is not techniker + self.ANZ_AUFTRAEGE:
-                        abfahrt = self.solution.get_value(self.start_zeit[letzter_auftrag]) + self.AUFTRAGSDAUER[
-                            letzter_auftrag]
+                    if aktueller_auftrag != techniker + self.ANZ_AUFTRAEGE:
+                        abfahrt = self.startzeiten.get(letzter_auftrag, 0) + self.AUFTRAGSDAUER[letzter_auftrag]
                         if abfahrt < t:
-                            tatsaechliche_start_zeit[aktueller_auftrag] = self.solution.get_value(
-                                self.start_zeit[aktueller_auftrag])
+                            tatsaechliche_start_zeit[aktueller_auftrag] = self.startzeiten[aktueller_auftrag]
                             done_matrix[techniker, letzter_auftrag, aktueller_auftrag] = True
                     letzter_auftrag = aktueller_auftrag
             rp_daten = ReplanningDaten(tatsaechliche_start_zeit, done_matrix)
@@ -756,7 +1786,8 @@ if __name__ == '__main__':
     neuer_auftrag_200 = Auftrag(195, 15, 270, 10, np.array([1, 0]))
     print('\nNeuer Auftrag: ', neuer_auftrag_200)
     print('Replanning erfolgt zur t=200\n')
-    problem.modell_aus_daten_aufstellen(replanning_daten=replanning_um_200, neuer_auftrag=neuer_auftrag_200)
+    problem.modell_aus_daten_aufstellen(replanning_daten=replanning_um_200, neuer_auftrag=neuer_auftrag_200,
+                                        inkrementell=True)
 
     problem.solve_model()
     problem.print_solution(print_details=False, print_stats=False)
@@ -764,7 +1795,7 @@ if __name__ == '__main__':
     print('Replanning erfolgt zur t=300\n')
     replanning_um_300 = problem.parameter_zum_zeitpunkt(300)
     neuer_auftrag_300 = Auftrag(298, 15, 390, 5, np.array([1, 0]))
-    problem.modell_aus_daten_aufstellen(replanning_um_300, neuer_auftrag_300)
+    problem.modell_aus_daten_aufstellen(replanning_um_300, neuer_auftrag_300, inkrementell=True)
 
     problem.solve_model()
     problem.print_solution(print_details=False, print_stats=False)
@@ -0,0 +1,223 @@
+"""Rolling-Horizon-Simulation eines Dispositionstages
+
+Ausgehend von einem Tagesplan treffen im Laufe des Tages neue Aufträge ein. Die Simulation stellt die Uhr auf den
+nächsten Entscheidungszeitpunkt, friert die bis dahin begonnene Arbeit über parameter_zum_zeitpunkt ein und plant
+mit den neu eingetroffenen Aufträgen neu. Wann neu geplant wird, bestimmt die Politik:
+
+* ereignis: bei jedem eintreffenden Auftrag
+* intervall: alle intervall Minuten mit allen seitdem eingetroffenen Aufträgen
+* batch: sobald batch_groesse Aufträge warten (der Rest spätestens am Ende des Tages)
+
+Für jeden Planungsschritt werden die Latenz (Wandzeit für Einfrieren, Modellaufbau und Lösen) und die Qualität des
+Plans festgehalten. Findet ein Schritt keinen Plan (z.B. Timeout ohne Zwischenlösung), wird er als nicht gelöst
+protokolliert und mit der Einfügeheuristik aus heuristik.py ein Ersatzplan erstellt, auf dem der nächste Schritt
+aufsetzt.
+
+Ein eintreffender Auftrag kann frühestens zum Zeitpunkt der Planung beginnen, die ihn aufnimmt, sein frühester Start
+wird entsprechend angehoben. Die Ereignisse kommen aus einer JSON-Lines-Datei (siehe ereignisse_lesen) oder aus einem
+Generator mit exponentialverteilten Zwischenankunftszeiten (siehe ereignisse_generieren).
+
+Beispiel::
+
+    python simulator.py --techniker 5 --auftraege 20 --rate 0.05 --politik intervall --intervall 30 --engine alns
+"""
+import argparse
+import csv
+import json
+import time
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+import heuristik
+import routingproblem
+from routingproblem import Auftrag
+
+POLITIKEN = ["ereignis", "intervall", "batch"]
+
+
+def ereignisse_lesen(pfad: str) -> List[Tuple[int, Auftrag]]:
+    """Liest Auftragsankünfte aus einer JSON-Lines-Datei
+
+    Jede Zeile enthält zeitpunkt, fruester_start, dauer, spaetestes_ende, strafe und skills (Liste aus 0/1), optional
+    koordinaten (Liste mit zwei Zahlen im Koordinatensystem des Problems).
+
+    :param pfad: str
+    :return: List[Tuple[int, Auftrag]] (nach Ankunftszeit sortiert)
+    """
+    ereignisse = []
+    with open(pfad, encoding='utf-8') as datei:
+        for zeile in datei:
+            if zeile.strip():
+                e = json.loads(zeile)
+                koordinaten = np.array(e["koordinaten"], dtype=float) if "koordinaten" in e else None
+                ereignisse.append((int(e["zeitpunkt"]), Auftrag(e["fruester_start"], e["dauer"], e["spaetestes_ende"],
+                                                                e["strafe"], np.array(e["skills"], dtype=int),
+                                                                koordinaten)))
+    return sorted(ereignisse, key=lambda e: e[0])
+
+
+def ereignisse_generieren(anz_skills: int, rate: float, ende: int, seed: int = None, max_dauer: int = 60,
+                          e_dauer: int = 30, max_puffer: int = 120, e_puffer: int = 60, max_strafe: int = 20,
+                          e_strafe: int = 5):
+    """Erzeugt Auftragsankünfte mit exponentialverteilten Zwischenankunftszeiten
+
+    :param anz_skills: int (Länge der Skillvektoren)
+    :param rate: float (erwartete Ankünfte pro Minute)
+    :param ende: int (letzter möglicher Ankunftszeitpunkt)
+    :param seed: int (Initialisierung für PRNG)
+    :return: Iterator über (Ankunftszeit, Auftrag), zeitlich aufsteigend
+    """
+    zufall = np.random.RandomState(seed)
+    zeit = 0.0
+    while True:
+        zeit += zufall.exponential(1 / rate)
+        if zeit > ende:
+            return
+        zeitpunkt = int(zeit)
+        fruester_start = zeitpunkt + int(zufall.randint(0, 60))
+        dauer = int(zufall.binomial(max_dauer, e_dauer / max_dauer))
+        spaetestes_ende = fruester_start + dauer + int(zufall.binomial(max_puffer, e_puffer / max_puffer))
+        strafe = int(zufall.binomial(max_strafe, e_strafe / max_strafe))
+        skills = zufall.binomial(n=1, p=(1 / 3), size=anz_skills)
+        yield zeitpunkt, Auftrag(fruester_start, dauer, spaetestes_ende, strafe, skills)
+
+
+class Simulator:
+    """Spielt einen Strom von Auftragsankünften gegen ein RoutingProblem ab"""
+
+    def __init__(self, problem: routingproblem.RoutingProblem, engine: str = "mip", timeout: int = 30,
+                 politik: str = "ereignis", intervall: int = 30, batch_groesse: int = 5):
+        """
+        :param problem: RoutingProblem (mit generierten Daten, der Tagesplan wird in ausfuehren erstellt)
+        :param engine: str (siehe RoutingProblem.ENGINES)
+        :param timeout: int (Zeitbudget in s pro Lösungslauf)
+        :param politik: str (siehe POLITIKEN)
+        :param intervall: int (Minuten zwischen zwei Planungen bei politik="intervall")
+        :param batch_groesse: int (wartende Aufträge, ab denen bei politik="batch" geplant wird)
+        """
+        if engine not in problem.ENGINES:
+            raise ValueError("Unbekannte Engine '{}', erlaubt sind {}".format(engine, problem.ENGINES))
+        if politik not in POLITIKEN:
+            raise ValueError("Unbekannte Politik '{}', erlaubt sind {}".format(politik, POLITIKEN))
+        self.problem = problem
+        self.engine = engine
+        self.timeout = timeout
+        self.politik = politik
+        self.intervall = intervall
+        self.batch_groesse = batch_groesse
+        self.protokoll = []
+
+    def ausfuehren(self, ereignisse: Iterable[Tuple[int, Auftrag]]) -> List[dict]:
+        """Erstellt den Tagesplan und plant für alle Ereignisse gemäß der Politik neu
+
+        :param ereignisse: Iterable[Tuple[int, Auftrag]] (Ankunftszeit und Auftrag, zeitlich aufsteigend)
+        :return: List[dict] (Protokoll mit einer Zeile pro Planungsschritt)
+        """
+        self.protokoll = []
+        self.schritt(0, [])
+
+        wartend = []
+        naechste_planung = self.intervall
+        for zeitpunkt, auftrag in ereignisse:
+            if zeitpunkt > self.problem.H_max:
+                break
+
+            # Bei der Intervallpolitik alle fälligen Planungen vor diesem Ereignis durchführen
+            while self.politik == "intervall" and zeitpunkt > naechste_planung:
+                if wartend:
+                    self.schritt(naechste_planung, wartend)
+                    wartend = []
+                naechste_planung += self.intervall
+
+            wartend.append(auftrag)
+
+            if self.politik == "ereignis" or (self.politik == "batch" and len(wartend) >= self.batch_groesse):
+                self.schritt(zeitpunkt, wartend)
+                wartend = []
+
+        if wartend:
+            letzte = naechste_planung if self.politik == "intervall" else zeitpunkt
+            self.schritt(min(letzte, self.problem.H_max), wartend)
+        return self.protokoll
+
+    def schritt(self, zeitpunkt: int, auftraege: List[Auftrag]):
+        """Ein Planungsschritt: Arbeit bis zeitpunkt einfrieren, neue Aufträge einfügen, neu lösen, protokollieren
+
+        :param zeitpunkt: int (Simulationszeit der Entscheidung)
+        :param auftraege: List[Auftrag] (seit dem letzten Schritt eingetroffene Aufträge, leer für den Tagesplan)
+        """
+        start = time.perf_counter()
+        if not auftraege:
+            if self.engine == "mip":
+                self.problem.modell_aus_daten_aufstellen()
+            self.problem.solve_model(timeout=self.timeout, engine=self.engine)
+        else:
+            # Ein Auftrag kann nicht beginnen, bevor über ihn entschieden wurde
+            for auftrag in auftraege:
+                auftrag.fruehste_start_zeit = max(auftrag.fruehste_start_zeit, zeitpunkt)
+
+            # Alle wartenden Aufträge werden in einem Schritt eingefügt und gemeinsam gelöst
+            replanning_daten = self.problem.parameter_zum_zeitpunkt(zeitpunkt)
+            if self.engine == "mip":
+                self.problem.modell_aus_daten_aufstellen(replanning_daten=replanning_daten, neue_auftraege=auftraege,
+                                                         inkrementell=True)
+            else:
+                self.problem.replanning_vorbereiten(replanning_daten, neue_auftraege=auftraege)
+            self.problem.solve_model(timeout=self.timeout, engine=self.engine)
+        latenz = time.perf_counter() - start
+
+        zeile = {"zeitpunkt": zeitpunkt, "neue_auftraege": len(auftraege), "latenz": latenz,
+                 "anz_auftraege": self.problem.ANZ_AUFTRAEGE, "geloest": self.problem.geloest}
+        if not self.problem.geloest:
+            # Ohne Plan könnte der nächste Schritt nichts einfrieren, die Heuristik beachtet die Fixierungen
+            self.problem.plan_uebernehmen(heuristik.konstruieren(self.problem))
+        zeile["zielfunktion"] = heuristik.Bewertung(self.problem).gesamtkosten(self.problem.routen_ohne_depots())
+        zeile["anz_unerledigt"] = len(self.problem.unerledigte_auftraege)
+        self.protokoll.append(zeile)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rolling-Horizon-Simulation mit eintreffenden Aufträgen")
+    parser.add_argument("--techniker", type=int, default=5)
+    parser.add_argument("--auftraege", type=int, default=20, help="Aufträge im Tagesplan")
+    parser.add_argument("--skills", type=int, default=3)
+    parser.add_argument("--tageslaenge", type=int, default=400)
+    parser.add_argument("--max-tageslaenge", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--ereignisse", default=None, help="JSON-Lines-Datei, sonst werden Ankünfte generiert")
+    parser.add_argument("--rate", type=float, default=0.05, help="Ankünfte pro Minute für generierte Ereignisse")
+    parser.add_argument("--engine", default="mip", choices=routingproblem.RoutingProblem.ENGINES)
+    parser.add_argument("--timeout", type=int, default=30, help="Zeitbudget in s pro Lösungslauf")
+    parser.add_argument("--politik", default="ereignis", choices=POLITIKEN)
+    parser.add_argument("--intervall", type=int, default=30)
+    parser.add_argument("--batch-groesse", type=int, default=5)
+    parser.add_argument("--ausgabe", default=None, help="CSV-Datei für das Protokoll")
+    argumente = parser.parse_args()
+
+    problem = routingproblem.RoutingProblem()
+    problem.daten_generieren(argumente.techniker, argumente.auftraege, argumente.skills, argumente.tageslaenge,
+                             argumente.max_tageslaenge, argumente.seed)
+    if argumente.ereignisse:
+        ereignisse = ereignisse_lesen(argumente.ereignisse)
+    else:
+        ereignisse = ereignisse_generieren(problem.ANZ_SKILLS, argumente.rate, problem.H, argumente.seed)
+
+    simulator = Simulator(problem, argumente.engine, argumente.timeout, argumente.politik, argumente.intervall,
+                          argumente.batch_groesse)
+    protokoll = simulator.ausfuehren(ereignisse)
+
+    for zeile in protokoll:
+        print("t={zeitpunkt:>4} neu={neue_auftraege:>2} latenz={latenz:7.3f}s aufträge={anz_auftraege} "
+              "unerledigt={anz_unerledigt}".format(**zeile) + ("" if zeile["geloest"] else " (Ersatzplan)"))
+    latenzen = [zeile["latenz"] for zeile in protokoll[1:]]
+    if latenzen:
+        print("Replanning-Latenz: Median {:.3f}s, Maximum {:.3f}s".format(float(np.median(latenzen)),
+                                                                          max(latenzen)))
+
+    if argumente.ausgabe:
+        with open(argumente.ausgabe, 'w', newline='', encoding='utf-8') as datei:
+            schreiber = csv.DictWriter(datei, fieldnames=["zeitpunkt", "neue_auftraege", "latenz", "anz_auftraege",
+                                                          "geloest", "zielfunktion", "anz_unerledigt"])
+            schreiber.writeheader()
+            schreiber.writerows(protokoll)
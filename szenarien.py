@@ -0,0 +1,158 @@
+"""Batchlauf über viele Szenarien
+
+Löst alle Kombinationen aus einem Raster von daten_generieren-Parametern und einer Liste von Seeds parallel in einem
+ProcessPoolExecutor und schreibt pro Szenario eine Zeile mit Zielfunktion, KPI-Werten, Gap, Aufbau- und Lösungszeit
+sowie den unerledigten Aufträgen. Ausgabe als CSV, bei Dateiendung .parquet als Parquet (benötigt pandas).
+
+zielfunktion und die KPI-Spalten werden für alle Engines einheitlich aus dem Plan berechnet (siehe
+RoutingProblem.kpi_werte), zielfunktion_solver und gap gibt es nur beim MIP.
+
+Beispiel::
+
+    python szenarien.py --raster '{"anz_techniker": [2, 3], "anz_auftraege": [4, 6], "anz_skills": [2],
+        "tageslaenge": [400], "max_tageslaenge": [500]}' --seeds 1-50 --engine mip --timeout 60 --ausgabe lauf.csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+import heuristik
+import routingproblem
+
+SPALTEN = ["seed", "engine", "status", "zielfunktion", "zielfunktion_solver"] + \
+          ["kpi_" + name for name in routingproblem.RoutingProblem.KPI_NAMEN] + \
+          ["gap", "zeit_aufbau", "zeit_loesen", "anz_unerledigt", "unerledigte_auftraege", "fehler"]
+
+
+def szenarien_bilden(raster: Dict[str, List], seeds: List[int]) -> List[dict]:
+    """Bildet alle Kombinationen aus dem Raster, jeweils mit jedem Seed
+
+    :param raster: Dict[str, List] (Parametername von daten_generieren -> zu testende Werte)
+    :param seeds: List[int]
+    :return: List[dict] (Parameter für daten_generieren, einschließlich seed)
+    """
+    namen = sorted(raster)
+    return [dict(zip(namen, werte), seed=seed)
+            for werte in itertools.product(*(raster[name] for name in namen)) for seed in seeds]
+
+
+def szenario_loesen(parameter: dict, engine: str = "mip", timeout: int = 60) -> dict:
+    """Generiert und löst ein Szenario, läuft in einem Worker-Prozess
+
+    Fehler werden nicht weitergereicht, sondern in der Zeile vermerkt, damit ein langer Lauf nicht abbricht.
+
+    :param parameter: dict (Parameter für daten_generieren, einschließlich seed)
+    :param engine: str (siehe RoutingProblem.ENGINES)
+    :param timeout: int (Zeitbudget in s pro Szenario)
+    :return: dict (Zeile mit den Parametern und den Spalten aus SPALTEN)
+    """
+    zeile = dict(parameter, engine=engine)
+    try:
+        problem = routingproblem.RoutingProblem()
+        problem.daten_generieren(**parameter)
+
+        start = time.perf_counter()
+        if engine == "mip":
+            problem.modell_aus_daten_aufstellen()
+            # Die Szenarien laufen bereits parallel, CPLEX soll nicht zusätzlich alle Kerne belegen
+            problem.mdl.context.cplex_parameters.threads = 1
+        zeile["zeit_aufbau"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        problem.solve_model(timeout=timeout, engine=engine)
+        zeile["zeit_loesen"] = time.perf_counter() - start
+
+        if not problem.geloest:
+            zeile["status"] = "ungeloest"
+            return zeile
+
+        zeile["status"] = "geloest"
+        zeile["zielfunktion"] = heuristik.Bewertung(problem).gesamtkosten(problem.routen_ohne_depots())
+        for name, wert in problem.kpi_werte().items():
+            zeile["kpi_" + name] = wert
+        if problem.solution:
+            zeile["zielfunktion_solver"] = problem.solution.objective_value
+            zeile["gap"] = problem.mdl.solve_details.mip_relative_gap
+        zeile["anz_unerledigt"] = len(problem.unerledigte_auftraege)
+        zeile["unerledigte_auftraege"] = " ".join(str(k) for k in sorted(problem.unerledigte_auftraege))
+    except Exception:
+        zeile["status"] = "fehler"
+        zeile["fehler"] = traceback.format_exc(limit=3)
+    return zeile
+
+
+def ausfuehren(raster: Dict[str, List], seeds: List[int], ausgabe: str, engine: str = "mip", timeout: int = 60,
+               max_prozesse: int = None) -> List[dict]:
+    """Löst alle Szenarien parallel und schreibt die Ergebnisse
+
+    CSV-Zeilen werden geschrieben, sobald ein Szenario fertig ist, damit bei einem Abbruch nichts verloren geht.
+
+    :param raster: Dict[str, List] (siehe szenarien_bilden)
+    :param seeds: List[int]
+    :param ausgabe: str (Pfad der Ergebnisdatei, .csv oder .parquet)
+    :param engine: str (siehe RoutingProblem.ENGINES)
+    :param timeout: int (Zeitbudget in s pro Szenario)
+    :param max_prozesse: int (Anzahl paralleler Prozesse, Standard ist die Anzahl der Kerne)
+    :return: List[dict] (alle Zeilen)
+    """
+    if engine not in routingproblem.RoutingProblem.ENGINES:
+        raise ValueError("Unbekannte Engine '{}', erlaubt sind {}".format(engine, routingproblem.RoutingProblem.ENGINES))
+    parquet = ausgabe.endswith(".parquet")
+    if parquet:
+        import pandas  # Nur für Parquet nötig, vor dem Lauf prüfen statt erst am Ende
+
+    szenarien = szenarien_bilden(raster, seeds)
+    spalten = sorted(raster) + SPALTEN
+    zeilen = []
+    with ProcessPoolExecutor(max_workers=max_prozesse) as pool:
+        laeufe = [pool.submit(szenario_loesen, parameter, engine, timeout) for parameter in szenarien]
+
+        if parquet:
+            for lauf in as_completed(laeufe):
+                zeilen.append(lauf.result())
+            pandas.DataFrame(zeilen, columns=spalten).to_parquet(ausgabe, index=False)
+        else:
+            with open(ausgabe, 'w', newline='', encoding='utf-8') as datei:
+                schreiber = csv.DictWriter(datei, fieldnames=spalten)
+                schreiber.writeheader()
+                for lauf in as_completed(laeufe):
+                    zeilen.append(lauf.result())
+                    schreiber.writerow(zeilen[-1])
+                    datei.flush()
+                    print("{}/{} Szenarien gelöst".format(len(zeilen), len(laeufe)))
+    return zeilen
+
+
+def seeds_lesen(angaben: List[str]) -> List[int]:
+    """Liest Seeds als einzelne Zahlen oder Bereiche wie 1-100"""
+    seeds = []
+    for angabe in angaben:
+        von, _, bis = angabe.partition("-")
+        seeds.extend(range(int(von), int(bis) + 1) if bis else [int(von)])
+    return seeds
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Löst ein Raster von Szenarien parallel")
+    parser.add_argument("--raster", required=True,
+                        help="JSON-Objekt oder Pfad zu einer JSON-Datei: Parameter von daten_generieren -> Werteliste")
+    parser.add_argument("--seeds", nargs="+", default=["1"], help="Seeds, z.B. 1 2 3 oder 1-100")
+    parser.add_argument("--engine", default="mip", choices=routingproblem.RoutingProblem.ENGINES)
+    parser.add_argument("--timeout", type=int, default=60, help="Zeitbudget in s pro Szenario")
+    parser.add_argument("--prozesse", type=int, default=None, help="Anzahl paralleler Prozesse")
+    parser.add_argument("--ausgabe", default="szenarien.csv", help="Ergebnisdatei (.csv oder .parquet)")
+    argumente = parser.parse_args()
+
+    if argumente.raster.lstrip().startswith("{"):
+        raster = json.loads(argumente.raster)
+    else:
+        with open(argumente.raster, encoding='utf-8') as datei:
+            raster = json.load(datei)
+
+    ausfuehren(raster, seeds_lesen(argumente.seeds), argumente.ausgabe, argumente.engine, argumente.timeout,
+               argumente.prozesse)
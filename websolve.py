@@ -1,11 +1,39 @@
+import gzip
+import json
+import os
+import queue
+import threading
+from typing import Callable, List
+
 import numpy
 from flask import Flask, request, send_from_directory, redirect
 from flask_cors import CORS
+import cache
+import jobs
+import metriken
 import routingproblem
 
 app = Flask(__name__, static_url_path='')
 CORS(app)
 
+GZIP_AB = 1024  # Antworten ab dieser Größe in Bytes werden komprimiert, wenn der Client gzip akzeptiert
+JOB_TIMEOUT = 120  # Standardzeitbudget in s für Jobs, sie sind nicht an HTTP-Timeouts gebunden
+STREAM_TIMEOUT = 120  # Standardzeitbudget in s für /solve/stream, die Ereignisse halten die Verbindung offen
+STREAM_HEARTBEAT = 5  # Sekunden ohne Ereignis, nach denen ein Kommentar gesendet wird (erkennt getrennte Clients)
+
+# Die Worker-Prozesse werden erst beim ersten Job gestartet, Größe über Umgebungsvariablen einstellbar
+job_verwaltung = jobs.JobVerwaltung(
+    max_prozesse=int(os.environ['TDP_WORKER']) if os.environ.get('TDP_WORKER') else None,
+    max_jobs=int(os.environ['TDP_MAX_JOBS']) if os.environ.get('TDP_MAX_JOBS') else None
+)
+
+# Kennzahlen aller Anfragen für /metrics
+metrik_sammler = metriken.Metriken()
+
+# Ergebnisse von Anfragen mit Seed, optional auf der Festplatte gespeichert
+ergebnis_cache = cache.ErgebnisCache(max_eintraege=int(os.environ.get('TDP_CACHE_GROESSE', 128)),
+                                     verzeichnis=os.environ.get('TDP_CACHE_VERZEICHNIS'))
+
 
 @app.route('/app/<path:path>')
 def serve_app(path):
@@ -28,6 +56,183 @@ def redirect_user():
     return redirect('/app/index.html')
 
 
+def parameter_lesen(args) -> dict:
+    """Liest und prüft die Parameter einer Anfrage
+
+    Das Ergebnis enthält nur einfache Datentypen, damit es an einen Worker-Prozess übergeben werden kann.
+    Ungültige oder fehlende Parameter führen zu einer Exception.
+
+    :param args: MultiDict (Query-Parameter bzw. Formulardaten der Anfrage)
+    :return: dict (geprüfte Parameter für berechnen)
+    """
+    parameter = {
+        'techniker': int(args.get('techniker')),
+        'auftraege': int(args.get('auftraege')),
+        'skills': int(args.get('skills')),
+        'tageslaenge': int(args.get('tageslaenge')),
+        'max_tageslaenge': int(args.get('maxTageslaenge')),
+
+        # Seed is optional
+        'seed': int(args.get('seed')) if args.get('seed') else None,
+        'min_distanz': int(args.get('minDistanz')),
+        'max_distanz': int(args.get('maxDistanz')),
+        'min_start': int(args.get('minStart')),
+        'max_start': int(args.get('maxStart')),
+        'max_dauer': int(args.get('maxDauer')),
+        'e_dauer': int(args.get('eDauer')),
+        'max_ende': int(args.get('maxEnde')),
+        'e_ende': int(args.get('eEnde')),
+        'max_strafe_auftrag': int(args.get('maxStrafeAuftrag')),
+        'e_strafe_auftrag': int(args.get('eStrafeAuftrag')),
+        'max_strafe_techniker': int(args.get('maxStrafeTechniker')),
+        'e_strafe_techniker': int(args.get('eStrafeTechniker')),
+
+        'engine': args.get('engine', 'mip'),
+        'formulierung': args.get('formulierung', 'dreiindex'),
+        'portfolio': args.get('portfolio') == "true",
+        'metriken': args.get('metriken') == "true",
+        'felder': sorted({feld for feld in args.get('felder', '').split(',') if feld}),
+        'advanced': args.get('advanced') == "true",
+        'replanning': None
+    }
+    if parameter['engine'] not in routingproblem.RoutingProblem.ENGINES:
+        raise ValueError(parameter['engine'])
+    if parameter['formulierung'] not in routingproblem.RoutingProblem.FORMULIERUNGEN:
+        raise ValueError(parameter['formulierung'])
+    if not set(parameter['felder']) <= set(routingproblem.RoutingProblem.JSON_FELDER):
+        raise ValueError(parameter['felder'])
+
+    # Mehrere neue Aufträge werden in den re*-Parametern durch ";" getrennt und gemeinsam eingeplant
+    if parameter['advanced'] and args.get('replanning') == "true":
+        spalten = {
+            'fruester_start': args.get('reFruesterStart').split(';'),
+            'spaetestes_ende': args.get('reSpaetestesEnde').split(';'),
+            'dauer': args.get('reDauer').split(';'),
+            'strafe': args.get('reStrafe').split(';'),
+            'skills': args.get('reSkills').split(';')
+        }
+        anz_neu = len(spalten['skills'])
+        if any(len(werte) != anz_neu for werte in spalten.values()):
+            raise ValueError("Unterschiedlich viele Werte in den Replanning-Parametern")
+        parameter['replanning'] = {
+            'zeitpunkt': int(args.get('reZeitpunkt')),
+            'auftraege': [{
+                'fruester_start': int(spalten['fruester_start'][i]),
+                'spaetestes_ende': int(spalten['spaetestes_ende'][i]),
+                'dauer': int(spalten['dauer'][i]),
+                'strafe': int(spalten['strafe'][i]),
+                'skills': [int(skill) for skill in spalten['skills'][i].split(',')]
+            } for i in range(anz_neu)]
+        }
+        if any(len(a['skills']) != parameter['skills'] for a in parameter['replanning']['auftraege']):
+            raise ValueError("Skillvektoren der Replanning-Aufträge passen nicht zu skills")
+    return parameter
+
+
+def berechnen(parameter: dict, timeout: int = 29, zwischenstand: Callable = None, abbruch: threading.Event = None):
+    """Generiert das Problem, löst es und gibt das Ergebnis als JSON zurück
+
+    Wird sowohl direkt von /solve als auch in den Worker-Prozessen der Job-API ausgeführt. Beim Replanning wird das
+    Zeitbudget auf beide Lösungsläufe aufgeteilt, zwischenstand und abbruch gelten dann nur für den zweiten Lauf, da
+    Zwischenlösungen des ersten die neuen Aufträge noch nicht enthalten.
+
+    :param parameter: dict (aus parameter_lesen)
+    :param timeout: int (Zeitbudget in s für alle Lösungsläufe zusammen)
+    :param zwischenstand: Callable (optional, Rückmeldung für Zwischenlösungen des MIP, siehe RoutingProblem.solve_model)
+    :param abbruch: threading.Event (optional, beendet laufende MIP-Suchen vorzeitig)
+    :return: tuple (JSON aus RoutingProblem.json_ausgabe, Messung für Metriken.erfassen)
+    """
+    p = parameter
+    engine = p['engine']
+    replanning_auftraege: List[routingproblem.Auftrag] = []
+
+    problem = routingproblem.RoutingProblem()
+    if p['advanced']:
+        with problem.zeitmessung("daten_generieren"):
+            problem.daten_generieren(p['techniker'], p['auftraege'], p['skills'], p['tageslaenge'],
+                                     p['max_tageslaenge'], p['seed'], p['min_distanz'], p['max_distanz'],
+                                     p['min_start'], p['max_start'], p['max_dauer'], p['e_dauer'], p['max_ende'],
+                                     p['e_ende'], p['max_strafe_auftrag'], p['e_strafe_auftrag'],
+                                     p['max_strafe_techniker'], p['e_strafe_techniker'])
+
+        if p['replanning']:
+            for re in p['replanning']['auftraege']:
+                replanning_auftrag = routingproblem.Auftrag(re['fruester_start'], re['dauer'], re['spaetestes_ende'],
+                                                            re['strafe'], numpy.array(re['skills'], dtype=int))
+                replanning_auftraege.append(replanning_auftrag)
+    else:
+        with problem.zeitmessung("daten_generieren"):
+            problem.daten_generieren(p['techniker'], p['auftraege'], p['skills'], p['tageslaenge'],
+                                     p['max_tageslaenge'])
+
+    if engine == 'mip' and not p['portfolio']:
+        problem.modell_aus_daten_aufstellen(formulierung=p['formulierung'])  # Modell aus generierten Daten herstellen
+
+    if p['portfolio']:
+        # Alle Lösungsverfahren parallel, das Zeitbudget ist die Deadline des Rennens
+        if replanning_auftraege:
+            problem.portfolio_loesen(timeout=timeout // 2)
+            replanning_daten = problem.parameter_zum_zeitpunkt(p['replanning']['zeitpunkt'])
+            problem.portfolio_loesen(timeout=timeout // 2, replanning_daten=replanning_daten,
+                                     neue_auftraege=replanning_auftraege)
+        else:
+            problem.portfolio_loesen(timeout=timeout)
+    elif replanning_auftraege:
+        problem.solve_model(timeout=timeout // 2, engine=engine)
+
+        replanning_daten = problem.parameter_zum_zeitpunkt(p['replanning']['zeitpunkt'])
+        if engine == 'mip':
+            problem.modell_aus_daten_aufstellen(replanning_daten=replanning_daten,
+                                                neue_auftraege=replanning_auftraege, inkrementell=True)
+        else:
+            problem.replanning_vorbereiten(replanning_daten, neue_auftraege=replanning_auftraege)
+
+        problem.solve_model(timeout=timeout // 2, engine=engine, zwischenstand=zwischenstand,
+                            abbruch=abbruch)
+    else:
+        problem.solve_model(timeout=timeout, engine=engine, zwischenstand=zwischenstand,
+                            abbruch=abbruch)
+
+    ergebnis = problem.json_ausgabe(metriken=p['metriken'], felder=p['felder'])  # JSON Daten für den Webclient
+    return ergebnis, {"zeiten": problem.zeiten, "solver": problem.solver_details()}
+
+
+def json_antwort(daten: str, status: int = 200):
+    """Erzeugt eine JSON-Antwort, bei ausreichender Größe gzip-komprimiert, wenn der Client es akzeptiert
+
+    :param daten: str (JSON)
+    :param status: int (HTTP-Status)
+    :return: response_class
+    """
+    antwort = app.response_class(
+        response=daten,
+        status=status,
+        mimetype='application/json'
+    )
+    antwort.headers['Vary'] = 'Accept-Encoding'
+    if len(antwort.get_data()) >= GZIP_AB and 'gzip' in request.accept_encodings:
+        antwort.set_data(gzip.compress(antwort.get_data(), compresslevel=6))
+        antwort.headers['Content-Encoding'] = 'gzip'
+    return antwort
+
+
+def cache_schluessel(parameter: dict, timeout: int):
+    """Schlüssel für den Ergebniscache oder None, wenn die Anfrage nicht deterministisch ist
+
+    Nur mit Seed (im advanced-Modus) wird bei gleichen Parametern dasselbe Problem generiert. Die Version des
+    Generators ist Teil des Schlüssels, damit gespeicherte Ergebnisse nach einer Änderung nicht mehr greifen. Im
+    Portfolio-Modus hängt der Plan davon ab, welche Strategie bis zur Deadline am weitesten kommt, er wird daher nicht
+    gecacht.
+
+    :param parameter: dict (aus parameter_lesen)
+    :param timeout: int (Zeitbudget, beeinflusst das Ergebnis)
+    :return: str oder None
+    """
+    if not (parameter['advanced'] and parameter['seed'] is not None) or parameter['portfolio']:
+        return None
+    return ergebnis_cache.schluessel(parameter, timeout, routingproblem.RoutingProblem.GENERATOR_VERSION)
+
+
 @app.route("/solve", methods=["GET"])
 def solve():
     """Route zur JSON-API des Solvers, erwartet einen parametrisierten GET-Request
@@ -36,90 +241,185 @@ def solve():
 
     Beispiel: http://localhost:5000/solve?techniker=2&auftraege=4&skills=2&seed=1234&tageslaenge=500&max_tageslaenge=600
 
+    Über den optionalen Parameter engine (siehe RoutingProblem.ENGINES) kann statt des MIP die Heuristik gewählt
+    werden, über formulierung die Modellformulierung des MIP (siehe RoutingProblem.FORMULIERUNGEN). Mit
+    portfolio=true laufen MIP-Varianten, ALNS und CP parallel und der beste Plan nach Ablauf des Zeitbudgets wird
+    zurückgegeben (siehe portfolio.py), mit metriken=true enthält die Antwort die Phasenzeiten und Solverdetails. Große
+    Felder sind nur enthalten, wenn sie über felder angefordert werden, z.B. felder=distanzmatrix,skills,solution (siehe RoutingProblem.JSON_FELDER).
+
     :return: response_class
     """
-    problem: routingproblem.RoutingProblem = None
-    replanning_auftrag: routingproblem.Auftrag = None
-    replanning_zeitpunkt: int = None
-
     try:
-        print(request.args)
-        techniker = int(request.args.get('techniker'))
-        auftraege = int(request.args.get('auftraege'))
-        skills = int(request.args.get('skills'))
-        tageslaenge = int(request.args.get('tageslaenge'))
-        max_tageslaenge = int(request.args.get('maxTageslaenge'))
+        parameter = parameter_lesen(request.args)
+    except:
+        return app.response_class(
+            response="Inputs invalid",
+            status=500
+        )
 
-        # Seed is optional
-        seed = int(request.args.get('seed')) if request.args.get('seed') else None
-        min_distanz = int(request.args.get('minDistanz'))
-        max_distanz = int(request.args.get('maxDistanz'))
-        min_start = int(request.args.get('minStart'))
-        max_start = int(request.args.get('maxStart'))
-        max_dauer = int(request.args.get('maxDauer'))
-        e_dauer = int(request.args.get('eDauer'))
-        max_ende = int(request.args.get('maxEnde'))
-        e_ende = int(request.args.get('eEnde'))
-        max_strafe_auftrag = int(request.args.get('maxStrafeAuftrag'))
-        e_strafe_auftrag = int(request.args.get('eStrafeAuftrag'))
-        max_strafe_techniker = int(request.args.get('maxStrafeTechniker'))
-        e_strafe_techniker = int(request.args.get('eStrafeTechniker'))
-
-        if request.args.get('advanced') == "true":
-            problem = routingproblem.RoutingProblem()
-            problem.daten_generieren(techniker, auftraege, skills, tageslaenge, max_tageslaenge, seed,
-                                     min_distanz, max_distanz, min_start, max_start, max_dauer, e_dauer, max_ende,
-                                     e_ende,
-                                     max_strafe_auftrag, e_strafe_auftrag, max_strafe_techniker, e_strafe_techniker)
-
-            if request.args.get('replanning') == "true":
-                replanning_zeitpunkt = int(request.args.get('reZeitpunkt'))
-                re_fruester_start = int(request.args.get('reFruesterStart'))
-                re_spaetestes_ende = int(request.args.get('reSpaetestesEnde'))
-                re_dauer = int(request.args.get('reDauer'))
-                re_strafe = int(request.args.get('reStrafe'))
-                re_skills = numpy.array(request.args.get('reSkills').split(',')).astype(dtype=int)
-                replanning_auftrag = routingproblem.Auftrag(re_fruester_start, re_dauer, re_spaetestes_ende, re_strafe,
-                                                            re_skills)
+    timeout = 29  # Typischer maximaler HTTP Request Timeout liegt bei 30s
+    schluessel = cache_schluessel(parameter, timeout)
+    ergebnis = ergebnis_cache.holen(schluessel) if schluessel else None
+    if ergebnis is None:
+        ergebnis, messung = berechnen(parameter, timeout=timeout)
+        metrik_sammler.erfassen(messung)
+        if schluessel:
+            ergebnis_cache.ablegen(schluessel, ergebnis)
+    else:
+        metrik_sammler.cache_treffer_zaehlen()
 
+    return json_antwort(ergebnis)
 
-        else:
-            problem = routingproblem.RoutingProblem(anz_techniker=techniker, anz_auftraege=auftraege, anz_skills=skills,
-                                                    tageslaenge=tageslaenge, max_tageslaenge=max_tageslaenge)
+
+@app.route("/solve/stream", methods=["GET"])
+def solve_stream():
+    """Wie /solve, liefert aber Server-Sent Events, sobald CPLEX eine bessere Zwischenlösung findet
+
+    Ereignisse:
+
+    * zwischenstand: {"zielfunktion", "gap", "plan"}, plan im Format von /solve
+    * ergebnis: das Endergebnis im Format von /solve
+    * fehler: Beschreibung des Fehlers
+
+    Beim Replanning werden nur Zwischenlösungen des Laufs mit den neuen Aufträgen gemeldet. Schließt der Client die
+    Verbindung (z.B. weil ihm der Plan gut genug ist), wird die Suche beendet. Das Zeitbudget kann über timeout in s
+    angegeben werden (Standard STREAM_TIMEOUT). Ergebnisse werden weder aus dem Cache gelesen noch dort abgelegt, da
+    ein abgebrochener Lauf kein vollständiges Ergebnis hat.
+
+    :return: response_class (text/event-stream)
+    """
+    try:
+        parameter = parameter_lesen(request.args)
+        timeout = int(request.args.get('timeout', STREAM_TIMEOUT))
     except:
         return app.response_class(
             response="Inputs invalid",
             status=500
         )
 
-    problem.modell_aus_daten_aufstellen()  # Modell aus generierten Daten herstellen
+    ereignisse = queue.Queue()
+    abbrechen = threading.Event()
+
+    def zwischenstand(problem, zielfunktion, gap):
+        plan = json.loads(problem.json_erzeugen(False, parameter['felder']))
+        ereignisse.put(("zwischenstand", json.dumps({"zielfunktion": zielfunktion, "gap": gap, "plan": plan},
+                                                     separators=(',', ':'))))
+
+    def rechnen():
+        try:
+            ergebnis, messung = berechnen(parameter, timeout=timeout, zwischenstand=zwischenstand,
+                                          abbruch=abbrechen)
+            metrik_sammler.erfassen(messung)
+            ereignisse.put(("ergebnis", ergebnis))
+        except Exception as fehler:
+            ereignisse.put(("fehler", json.dumps(str(fehler))))
+
+    threading.Thread(target=rechnen, daemon=True).start()
 
-    if replanning_auftrag:
-        problem.solve_model(timeout=14)  # Typischer maximaler HTTP Request Timeout liegt bei 30s
+    def strom():
+        try:
+            while True:
+                try:
+                    art, daten = ereignisse.get(timeout=STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield "event: {}\ndata: {}\n\n".format(art, daten)
+                if art != "zwischenstand":
+                    return
+        finally:
+            # Wird auch ausgeführt, wenn der Client die Verbindung trennt
+            abbrechen.set()
 
-        erstes_ergebnis = problem.json_ausgabe()
+    return app.response_class(
+        response=strom(),
+        status=200,
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
-        problem.modell_aus_daten_aufstellen(replanning_daten=problem.parameter_zum_zeitpunkt(replanning_zeitpunkt),
-                                            neuer_auftrag=replanning_auftrag)
 
-        problem.solve_model(timeout=14)
+@app.route("/jobs", methods=["POST"])
+def job_anlegen():
+    """Legt einen Job für eine Berechnung an und kehrt sofort zurück
 
+    Erwartet dieselben Parameter wie /solve (als Query-Parameter oder Formulardaten), zusätzlich optional timeout in s.
+    Die Berechnung läuft in einem Worker-Prozess, das Ergebnis wird über /jobs/<id> abgefragt.
+
+    :return: response_class (202 mit der Job-ID, 503 wenn die Warteschlange voll ist)
+    """
+    try:
+        parameter = parameter_lesen(request.values)
+        timeout = int(request.values.get('timeout', JOB_TIMEOUT))
+    except:
         return app.response_class(
-            response=problem.json_ausgabe(),
-            status=200,
-            mimetype='application/json'
+            response="Inputs invalid",
+            status=500
         )
 
+    schluessel = cache_schluessel(parameter, timeout)
+    ergebnis = ergebnis_cache.holen(schluessel) if schluessel else None
+    if ergebnis is not None:
+        metrik_sammler.cache_treffer_zaehlen()
+        job_id = job_verwaltung.ergebnis_eintragen((ergebnis, None))
     else:
-        problem.solve_model(timeout=29)  # Typischer maximaler HTTP Request Timeout liegt bei 30s
-        json = problem.json_ausgabe()  # JSON Daten für den Webclient und Debugdaten in der Konsole
-        if json:
-            return app.response_class(
-                response=json,
-                status=200,
-                mimetype='application/json'
-            )
-        else:
-            return app.response_class(
-                status=500
-            )
+        job_id = job_verwaltung.einreichen(berechnen, parameter, timeout)
+        if job_id is not None:
+            job_verwaltung.bei_erfolg(job_id, lambda ergebnis: job_abgeschlossen(schluessel, *ergebnis))
+    if job_id is None:
+        return app.response_class(
+            response="Queue full",
+            status=503
+        )
+    return app.response_class(
+        response=json.dumps(ergebnis_aufloesen(job_verwaltung.status(job_id)), separators=(',', ':')),
+        status=202,
+        mimetype='application/json'
+    )
+
+
+def ergebnis_aufloesen(status: dict) -> dict:
+    """Ersetzt im Status eines fertigen Jobs das Ergebnis (JSON-Text und Messung) durch die Antwort von /solve
+
+    :param status: dict (aus JobVerwaltung.status)
+    :return: dict
+    """
+    if status.get("ergebnis"):
+        status["ergebnis"] = json.loads(status["ergebnis"][0])
+    return status
+
+
+def job_abgeschlossen(schluessel, ergebnis: str, messung: dict):
+    """Übernimmt das Ergebnis eines Jobs im Webserver-Prozess in Cache und Metriken"""
+    metrik_sammler.erfassen(messung)
+    if schluessel:
+        ergebnis_cache.ablegen(schluessel, ergebnis)
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_abfragen(job_id):
+    """Liefert den Status eines Jobs und, sobald er fertig ist, das Ergebnis im Format von /solve
+
+    :param job_id: str (ID aus /jobs)
+    :return: response_class (404 für unbekannte oder abgelaufene Jobs)
+    """
+    status = job_verwaltung.status(job_id)
+    if status is None:
+        return app.response_class(
+            response="Unknown job",
+            status=404
+        )
+    return json_antwort(json.dumps(ergebnis_aufloesen(status), separators=(',', ':')))
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Kennzahlen aller bisherigen Anfragen im Textformat von Prometheus
+
+    :return: response_class
+    """
+    return app.response_class(
+        response=metrik_sammler.prometheus(),
+        status=200,
+        mimetype='text/plain; version=0.0.4'
+    )
@@ -0,0 +1,184 @@
+"""Geografische Zerlegung des Technician Dispatch Problems
+
+Große Tage werden in Teilprobleme zerlegt, die in eigenen Prozessen gelöst werden:
+
+1. Die Techniker werden anhand der Distanzen zwischen ihren Depots in Gruppen eingeteilt.
+2. Jeder Auftrag wird der Gruppe zugeordnet, deren nächstes passendes Depot am nächsten liegt. Dabei zählen nur
+   Techniker mit den nötigen Skills, und jede Gruppe nimmt ungefähr so viele Aufträge auf, wie es ihrem Anteil an
+   den Technikern entspricht.
+3. Die Teilprobleme werden mit RoutingProblem.teilproblem erzeugt und in einem ProcessPoolExecutor gelöst.
+4. Die Routen werden zusammengeführt. Aufträge, die in ihrem Teilproblem unerledigt blieben oder deren Teilproblem
+   mit einem Fehler abbrach (z.B. DOcplexLimitsExceeded bei einem großen Cluster) oder bis zur Deadline kein Ergebnis
+   lieferte, werden über alle Techniker neu eingefügt, anschließend verbessert die lokale Suche aus heuristik.py den
+   Plan über die Clustergrenzen hinweg. Fehlgeschlagene Teilprobleme werden als Warnung ausgegeben und in den Details
+   von loesen aufgeführt.
+"""
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import heuristik
+
+ANTEIL_REPARATUR = 0.2  # Anteil des Zeitbudgets für die Reparatur nach dem Zusammenführen
+AUFTRAEGE_PRO_CLUSTER = 25  # Richtwert, bis zu dem ein Teil-MIP schnell gelöst wird
+KAPAZITAETS_PUFFER = 1.2  # Spielraum der Clustergrößen gegenüber einer Verteilung nach Technikeranteil
+
+
+def anzahl_cluster(problem) -> int:
+    """Standardanzahl der Teilprobleme: etwa AUFTRAEGE_PRO_CLUSTER Aufträge pro Cluster, höchstens ein Cluster pro
+    Techniker
+
+    :param problem: RoutingProblem
+    :return: int
+    """
+    return max(1, min(problem.ANZ_TECHNIKER, round(problem.ANZ_AUFTRAEGE / AUFTRAEGE_PRO_CLUSTER)))
+
+
+def techniker_gruppieren(problem, anz_cluster: int) -> List[List[int]]:
+    """Teilt die Techniker nach der Lage ihrer Depots in Gruppen ein
+
+    Als Zentren werden nacheinander die Depots gewählt, die von den bisherigen Zentren am weitesten entfernt sind.
+    Jeder Techniker kommt zum nächsten Zentrum.
+
+    :param problem: RoutingProblem
+    :param anz_cluster: int
+    :return: List[List[int]] (Techniker pro Gruppe, keine Gruppe ist leer)
+    """
+    depots = problem.ANZ_AUFTRAEGE + np.arange(problem.ANZ_TECHNIKER)
+    d = problem.DISTANZMATRIX[np.ix_(depots, depots)]
+
+    zentren = [int(np.argmax(d.sum(axis=1)))]
+    while len(zentren) < anz_cluster:
+        zentren.append(int(np.argmax(d[zentren].min(axis=0))))
+
+    zugehoerigkeit = np.argmin(d[zentren], axis=0)
+    zugehoerigkeit[zentren] = np.arange(len(zentren))  # Zentren gehören immer zu ihrer eigenen Gruppe
+    return [np.flatnonzero(zugehoerigkeit == c).tolist() for c in range(len(zentren))]
+
+
+def auftraege_zuordnen(problem, gruppen: List[List[int]]) -> List[List[int]]:
+    """Ordnet jeden Auftrag einer Technikergruppe zu
+
+    Aufträge mit dem größten Nachteil bei einer anderen Gruppe werden zuerst verteilt. Ist die Wunschgruppe voll,
+    wird die nächste passende Gruppe mit freier Kapazität gewählt. Aufträge, die kein Techniker ausführen kann, werden
+    keiner Gruppe zugeordnet.
+
+    :param problem: RoutingProblem
+    :param gruppen: List[List[int]] (Techniker pro Gruppe)
+    :return: List[List[int]] (Aufträge pro Gruppe)
+    """
+    anz_auftraege = problem.ANZ_AUFTRAEGE
+    depot_distanz = problem.DISTANZMATRIX[anz_auftraege:anz_auftraege + problem.ANZ_TECHNIKER, :anz_auftraege]
+    erreichbar = np.where(problem.KOMPATIBEL, depot_distanz, np.inf)
+
+    # Entfernung jedes Auftrags zum nächsten passenden Depot jeder Gruppe, Form Gruppen x Aufträge
+    kosten = np.stack([erreichbar[g].min(axis=0) for g in gruppen])
+    kapazitaet = [math.ceil(KAPAZITAETS_PUFFER * anz_auftraege * len(g) / problem.ANZ_TECHNIKER) for g in gruppen]
+
+    sortiert = np.sort(kosten, axis=0)
+    if len(gruppen) > 1:
+        # Nur eine passende Gruppe ergibt inf (zuerst verteilen), gar keine ergibt nan (wird übersprungen)
+        with np.errstate(invalid="ignore"):
+            nachteil = sortiert[1] - sortiert[0]
+        nachteil = np.where(np.isnan(nachteil), 0.0, nachteil)
+    else:
+        nachteil = np.zeros(anz_auftraege)
+
+    zuordnung = [[] for _ in gruppen]
+    for k in np.argsort(-nachteil, kind="mergesort").tolist():
+        passend = [c for c in np.argsort(kosten[:, k], kind="mergesort").tolist() if np.isfinite(kosten[c, k])]
+        if not passend:
+            continue
+        frei = [c for c in passend if len(zuordnung[c]) < kapazitaet[c]]
+        zuordnung[(frei or passend)[0]].append(k)
+    return [sorted(a) for a in zuordnung]
+
+
+def teilproblem_loesen(teil, engine: str, timeout: float):
+    """Löst ein Teilproblem, läuft in einem eigenen Prozess
+
+    :param teil: RoutingProblem (aus RoutingProblem.teilproblem)
+    :param engine: str (siehe RoutingProblem.ENGINES)
+    :param timeout: float (Zeitbudget in s)
+    :return: Dict[int, List[int]] (Aufträge pro Techniker des Teilproblems, ohne Depot; nur erledigte Aufträge)
+    """
+    if engine == "mip":
+        teil.modell_aus_daten_aufstellen()
+    teil.solve_model(timeout=timeout, engine=engine)
+    if not teil.geloest:
+        return {}
+    return {m: [k for k in route if k < teil.ANZ_AUFTRAEGE and k not in teil.unerledigte_auftraege]
+            for m, route in teil.fahrten_pro_techniker_sortiert.items()}
+
+
+def teilergebnis(lauf, ende: float) -> Tuple[Dict[int, List[int]], str]:
+    """Ergebnis eines Teilproblems, bei einem Fehler oder nach Ablauf der Deadline leere Routen
+
+    Ein fehlgeschlagenes Teilproblem bricht nicht die ganze Zerlegung ab, seine Aufträge bleiben uneingeplant und
+    werden bei der Reparatur in loesen eingefügt.
+
+    :param lauf: Future (von teilproblem_loesen)
+    :param ende: float (Deadline als time.perf_counter())
+    :return: Tuple[Dict[int, List[int]], str] (Routen und Fehlerbeschreibung, None wenn erfolgreich)
+    """
+    try:
+        return lauf.result(timeout=max(0.0, ende - time.perf_counter())), None
+    except TimeoutError:
+        lauf.cancel()
+        return {}, "Zeitüberschreitung"
+    except Exception as fehler:
+        return {}, "{}: {}".format(type(fehler).__name__, fehler)
+
+
+def loesen(problem, timeout: float, engine: str = "mip", anz_cluster: int = None,
+           max_prozesse: int = None) -> Tuple[Dict[int, List[int]], dict]:
+    """Zerlegt das Problem, löst die Teilprobleme parallel und führt die Routen zusammen
+
+    :param problem: RoutingProblem
+    :param timeout: float (Zeitbudget in s für Teilprobleme und Reparatur zusammen)
+    :param engine: str (Lösungsverfahren der Teilprobleme, siehe RoutingProblem.ENGINES)
+    :param anz_cluster: int (Anzahl der Teilprobleme, Standard siehe anzahl_cluster)
+    :param max_prozesse: int (Anzahl paralleler Prozesse, Standard ist die Anzahl der Kerne)
+    :return: Tuple[Dict[int, List[int]], dict] (Aufträge pro Techniker im Gesamtproblem, ohne Depot, und Details mit
+        der Anzahl der Teilprobleme und den fehlgeschlagenen Teilproblemen)
+    """
+    ende = time.perf_counter() + timeout
+    gruppen = techniker_gruppieren(problem, min(anz_cluster or anzahl_cluster(problem), problem.ANZ_TECHNIKER))
+    zuordnung = auftraege_zuordnen(problem, gruppen)
+
+    teile = [(g, a) for g, a in zip(gruppen, zuordnung) if a]
+
+    # Bei mehr Teilproblemen als Prozessen laufen sie in mehreren Wellen, das Budget wird entsprechend aufgeteilt
+    max_prozesse = max_prozesse or os.cpu_count() or 1
+    wellen = math.ceil(len(teile) / max_prozesse) if teile else 1
+    zeit_teilproblem = timeout * (1 - ANTEIL_REPARATUR) / wellen
+    pool = ProcessPoolExecutor(max_workers=max_prozesse)
+    try:
+        laeufe = [pool.submit(teilproblem_loesen, problem.teilproblem(a, g), engine, zeit_teilproblem)
+                  for g, a in teile]
+        ergebnisse = [teilergebnis(lauf, ende) for lauf in laeufe]
+    finally:
+        # Nicht auf Teilprobleme warten, die die Deadline überschritten haben, sie enden mit ihrem eigenen Zeitlimit
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    # Indizes der Teilprobleme auf das Gesamtproblem zurückführen
+    routen = {m: [] for m in range(problem.ANZ_TECHNIKER)}
+    fehlgeschlagen = []
+    for (techniker, auftraege), (teil_routen, fehler) in zip(teile, ergebnisse):
+        if fehler:
+            print("Warnung - Teilproblem mit {} Technikern und {} Aufträgen fehlgeschlagen ({}), die Aufträge werden "
+                  "bei der Reparatur eingefügt".format(len(techniker), len(auftraege), fehler))
+            fehlgeschlagen.append({"techniker": techniker, "auftraege": len(auftraege), "fehler": fehler})
+        for m, teil_route in teil_routen.items():
+            routen[techniker[m]] = [auftraege[k] for k in teil_route]
+
+    # Randeffekte reparieren: unerledigte Aufträge clusterübergreifend einfügen, dann lokale Suche über alle Routen
+    bewertung = heuristik.Bewertung(problem)
+    heuristik.konstruieren(problem, bewertung, routen)
+    suche = heuristik.ALNS(problem, bewertung, seed=problem.SEED)
+    routen = suche.lokale_suche(routen, zeitlimit=max(0.0, ende - time.perf_counter()))
+    return routen, {"teilprobleme": len(teile), "fehlgeschlagen": fehlgeschlagen}